@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the classical and the Strassen-Winograd multiplication
+kernels of matrix.py across sizes and fields, or the pivot strategies
+of its Gauss elimination.
+
+    $ python3 benchmark.py [size ...]
+    $ python3 benchmark.py pivot [size ...]
+"""
+
+__author__ = 'Clarence Zhuo'
+
+import random
+import sys
+import time
+
+import matrix
+import rational
+
+def random_entry(field):
+    """
+    Returns a random element of 'int', 'bigint', 'float' or 'Rat'.
+    """
+    if field == 'int':
+        return random.randint(-99, 99)
+    elif field == 'bigint':
+        return random.randint(-10**50, 10**50)
+    elif field == 'float':
+        return random.random()
+    else:
+        return rational.Rat(random.randint(-99, 99), random.randint(1, 99))
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_mul(sizes, fields, cutoff=64):
+    """
+    Prints the seconds taken by both kernels to multiply two random
+    square matrices of each size and field.
+    """
+    print('%8s %6s %10s %10s' % ('field', 'size', 'classical', 'strassen'))
+    for field in fields:
+        for n in sizes:
+            a = [[random_entry(field) for j in range(n)] for i in range(n)]
+            b = [[random_entry(field) for j in range(n)] for i in range(n)]
+            if field == 'Rat':
+                # what Mat.__mul__ does with Rats
+                a = matrix._scale_rat(a)[0]
+                b = matrix._scale_rat(b)[0]
+            cols = [list(col) for col in zip(*b)]
+            classical = timed(matrix._mul_tiled, a, cols)
+            strassen = timed(matrix._strassen, a, b, cutoff)
+            print('%8s %6d %10.3f %10.3f' % (field, n, classical, strassen))
+
+
+def bench_pivot(sizes, density=0.1):
+    """
+    Prints the seconds taken by the Gauss elimination of random
+    square matrices of each size with every pivot strategy, and:
+    for floats the largest residual of the solution of a system,
+    for Rats the most bits of a pivot row entry, for sparse floats
+    the entries left nonzero by the elimination (the fill-in).
+    """
+    print('%8s %6s %10s %10s %12s' % ('field', 'size', 'pivot', 'seconds',
+                                      'quality'))
+    for field in ('float', 'Rat', 'sparse'):
+        for n in sizes:
+            if field == 'sparse':
+                a = [[random.random() if i == j or random.random() < density
+                      else 0.0 for j in range(n)] for i in range(n)]
+            else:
+                a = [[random_entry(field) for j in range(n)]
+                     for i in range(n)]
+            b = [random_entry('float' if field == 'sparse' else field)
+                 for i in range(n)]
+            for pivot in matrix._PIVOTS:
+                m = matrix.Mat([row + [x] for row, x in zip(a, b)])
+                if field == 'float':
+                    start = time.perf_counter()
+                    x = m.solve(pivot=pivot)
+                    seconds = time.perf_counter() - start
+                    quality = max(abs(sum(p * x[j][0] for j, p in
+                                          enumerate(row)) - y)
+                                  for row, y in zip(a, b))
+                    quality = '%.2e' % quality
+                else:
+                    m = matrix.Mat([row.copy() for row in a])
+                    start = time.perf_counter()
+                    m._simplify(det=[m.field(1)], pivot=pivot)
+                    seconds = time.perf_counter() - start
+                    if field == 'Rat':
+                        quality = max(matrix._bits(y) for row in m
+                                      for y in row)
+                    else:
+                        quality = sum(y != 0 for row in m for y in row)
+                print('%8s %6d %10s %10.3f %12s' % (field, n, pivot,
+                                                    seconds, quality))
+
+if __name__ == '__main__':
+    random.seed(0)
+    if sys.argv[1:2] == ['pivot']:
+        sizes = [int(arg) for arg in sys.argv[2:]] or [16, 32]
+        bench_pivot(sizes)
+    else:
+        sizes = [int(arg) for arg in sys.argv[1:]] or [64, 128, 256]
+        bench_mul(sizes, ['int', 'bigint', 'float', 'Rat'])
@@ -224,7 +224,7 @@ def cube_spline_1(x, y, p0, pn):
     n = len(x)-1
     if n < 2:
         raise ValueError('number of points must >= 3')
-    mat = matrix.diag(2, rows=n+1, field=rational.Rat)
+    mat = matrix.tridiag(0, 2, 0, n+1, field=rational.Rat)
     d = []
     mat[0][1] = 1
     h = x[1]-x[0]
@@ -236,10 +236,41 @@ def cube_spline_1(x, y, p0, pn):
     mat[n][n-1] = 1
     h = x[n]-x[n-1]
     d.append((pn - (y[n]-y[n-1])/h)/h*6)
-    mat.insert(d, col=n+1)
-    print(mat)
+    if n < 10:
+        # the augmented matrix is dense, only print it while small
+        aug = matrix.Mat(mat)
+        aug.insert(d, col=n+1)
+        print(aug)
     print('solution:')
-    print(mat.solve())
+    print(matrix.Mat([[m] for m in mat.solve(d)], field=rational.Rat,
+                     title=('X0',)))
+
+def cube_spline_periodic(x, y):
+    """
+    x, y are lists of points with y[0] == y[-1]
+    Returns the second derivatives M_0..M_(n-1) of the periodic cubic
+    spline (M_n = M_0), from a cyclic tridiagonal system solved in
+    linear time.
+    >>> from rational import Rat
+    >>> cube_spline_periodic([Rat(i) for i in range(5)], [0, 1, 0, -1, 0])
+    [0, -3, 0, 3]
+    """
+    import matrix
+    n = len(x)-1
+    if n < 3:
+        raise ValueError('number of points must >= 4')
+    if y[0] != y[n]:
+        raise ValueError('a periodic spline needs y[0] == y[-1]')
+    h = [x[i+1]-x[i] for i in range(n)]
+    sub, sup, d = [], [], []
+    for i in range(n):
+        # the point before x[0] is x[n-1], one period earlier
+        hl, hr = h[i-1], h[i]
+        yl = y[i-1] if i > 0 else y[n-1]
+        sub.append(hl/(hl+hr))
+        sup.append(hr/(hl+hr))
+        d.append(((y[i+1]-y[i])/hr - (y[i]-yl)/hl)/(hl+hr)*6)
+    return matrix.tridiag(sub, 2, sup, n, cyclic=True).solve(d)
 
 if __name__ == '__main__':
     import doctest
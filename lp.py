@@ -98,9 +98,11 @@ class LP(object):
 
         * NOTE *
         1. LP changes mat and base;
-        2. LP does maximization by default.
+        2. LP does maximization by default;
+        3. a sparse.SparseMat is copied into a dense Mat, since the
+           simplex tableau fills up anyway.
         """
-        self.mat = mat
+        self.mat = mat if isinstance(mat, matrix.Mat) else matrix.Mat(mat)
         self.base = base
         self.artificial = artificial if artificial != None\
                 else self.mat.cols()-1
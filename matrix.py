@@ -5,7 +5,15 @@
 
 __author__ = 'Clarence Zhuo'
 
+import array
+import atexit
 import rational
+import modular
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
 
 class Mat(object):
     """
@@ -163,18 +171,47 @@ class Mat(object):
      -8.0  29.0 -11.0
      -5.0  18.0  -7.0
       1.0  -3.0   1.0
+
+    >>> a = Mat(lambda i,j: i+j/2, 2, 3, storage='array')
+    >>> a
+    0.0 0.5 1.0
+    1.0 1.5 2.0
+    >>> a[1][2] = 7
+    >>> a.pr(row=0, row2=1)
+    1.0 1.5 7.0
+    0.0 0.5 1.0
+    >>> v = a.memoryview()
+    >>> v.shape, v[0, 2]
+    ((2, 3), 7.0)
+    >>> a.to_list() == a
+    True
+    >>> v.release()
+    >>> b = Mat([[2, 1], [1, 3]], storage='array')
+    >>> b[0][1] = rational.Rat(1, 2)
+    >>> b
+      2 1/2
+      1   3
     """
-    def __init__(self, arg, rows=0, cols=0, field=None, title=()):
+    def __init__(self, arg, rows=0, cols=0, field=None, title=(),
+                 storage=None):
 
         self._data = []
         self._title = title
         self._field = field
+        self._cache = {}
+        self._version = 0
+        if storage not in (None, 'list', 'array'):
+            raise ValueError("storage must be 'list' or 'array', "
+                             "%s given." % storage)
 
         from collections import Iterable
         if isinstance(arg, Mat):
             self._title = arg._title
             self._field = arg._field
-            self._data = [r.copy() for r in arg]
+            if isinstance(arg._data, ArrayStorage):
+                self._data = arg._data.copy()
+            else:
+                self._data = [r.copy() for r in arg]
 
         elif isinstance(arg, str):
 
@@ -219,18 +256,45 @@ class Mat(object):
                     self._data[r].append(b[r])
                 cols += 1
 
+        elif _np != None and isinstance(arg, _np.ndarray):
+            if arg.ndim != 2:
+                raise TypeError('Expecting a 2-dimensional ndarray.')
+            self._data = arg.tolist()
+
+        elif hasattr(arg, 'to_rows'):
+            # a sparse.SparseMat
+            if self._field == None:
+                self._field = arg._field
+            self._data = arg.to_rows()
+
         elif isinstance(arg, Iterable):
             if len(arg) > 0 and isinstance(arg[0], Iterable):
                 self._data = arg
+                if any(isinstance(row, _Row) for row in arg):
+                    # rows of another Mat are copied, they tell it of writes
+                    self._data = [list(row) if isinstance(row, _Row) else row
+                                  for row in arg]
             else:
                 raise TypeError("If arg is an Iterable and is not a Mat or str, "
                                 "it has to be an Iterable of Iterable.")
 
         elif callable(arg):
-            self._data = [[self.field(arg(i, j)) for j in range(cols)]\
-                    for i in range(rows)]
+            if storage == 'array':
+                self._data = ArrayStorage.from_values(
+                        [self.field(arg(i, j)) for i in range(rows)
+                            for j in range(cols)], rows, cols, self._field)
+            else:
+                self._data = [[self.field(arg(i, j)) for j in range(cols)]\
+                        for i in range(rows)]
 
+        if isinstance(self._data, ArrayStorage):
+            self._data.owner = self
         self.resize(rows, cols)
+        if storage == 'array' and not isinstance(self._data, ArrayStorage):
+            self._data = ArrayStorage.from_rows(self._data, self._field)
+            self._data.owner = self
+        elif storage == 'list' and isinstance(self._data, ArrayStorage):
+            self._data = [r.copy() for r in self._data]
 
     # specials-------------------------------------------------
 
@@ -251,11 +315,26 @@ class Mat(object):
     __repr__ = __str__
 
     def __getitem__(self, index):
-        return self._data[index]
+        row = self._data[index]
+        if type(row) is not list:
+            return row
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self._data))[index]]
+        # handed out once as a _Row, which tells self of writes
+        row = self._data[index] = _Row(self, row)
+        return row
 
     def __setitem__(self, index, value):
+        self._modified()
+        if isinstance(value, _Row) and value._mat is not self:
+            # m[0], m[1] = m[1], m[0] moves the rows themselves, but a
+            # row of another Mat would tell it of writes, not self
+            value = list(value)
         self._data[index] = value
 
+    def __iter__(self):
+        return (self[i] for i in range(len(self._data)))
+
     def __call__(self, *args):
         """
         It's a bit like __getitem__, but index starts from 1.
@@ -285,7 +364,7 @@ class Mat(object):
             return False
 
         for i in range(self.rows()):
-            if self[i] != other[i]:
+            if self._data[i] != other[i]:
                 return False
         return True
 
@@ -297,26 +376,53 @@ class Mat(object):
         return Mat(self)
 
     def __neg__(self, other):
-        return Mat(lambda i,j: -self[i][j], self.rows(), self.cols())
+        return Mat(lambda i,j: -self._data[i][j], self.rows(), self.cols())
 
     def __add__(self, other):
+        if isinstance(other, Expr):
+            return NotImplemented
         if self.size() != other.size():
             raise ValueError('Matrixes for adding must have same size.')
 
-        return Mat(lambda i,j: self[i][j] + other[i][j], self.rows(), self.cols())
+        if _use_numpy(self, other):
+            return _from_numpy(self.to_numpy() + other.to_numpy(),
+                               self._field)
+        rows = other._data if isinstance(other, Mat) else other
+        return Mat(lambda i,j: self._data[i][j] + rows[i][j], self.rows(), self.cols())
 
     def __sub__(self, other):
+        if isinstance(other, Expr):
+            return NotImplemented
         if self.size() != other.size():
             raise ValueError('Matrixes for subtracting must have same size.')
 
-        return Mat(lambda i,j: self[i][j] - other[i][j], self.rows(), self.cols())
+        if _use_numpy(self, other):
+            return _from_numpy(self.to_numpy() - other.to_numpy(),
+                               self._field)
+        rows = other._data if isinstance(other, Mat) else other
+        return Mat(lambda i,j: self._data[i][j] - rows[i][j], self.rows(), self.cols())
     def __mul__(self, other):
+        if not isinstance(other, Mat):
+            # a sparse.SparseMat or an Expr does it by __rmul__
+            return NotImplemented
         if self.cols() != other.rows():
             raise ValueError('cols of the first Mat must '
                              'equals to rows of the second '
                              'Mat when doing mul.')
 
-        return Mat(lambda i,j: sum(self[i][k] * other[k][j] for k in range(self.cols())), self.rows(), other.cols())
+        field = self._field if self._field == other._field else None
+        if self.is_empty() or other.is_empty():
+            return Mat(lambda i,j: 0, self.rows(), other.cols(), field=field)
+        if _use_numpy(self, other):
+            return _from_numpy(self.to_numpy() @ other.to_numpy(), field)
+        data = _matmul(self, other)
+        storage = None
+        if isinstance(self._data, ArrayStorage) and\
+                isinstance(other._data, ArrayStorage) and\
+                _array_code(x for row in data for x in row) != None:
+            # ints beyond 64 bits stay in lists
+            storage = 'array'
+        return Mat(data, field=field, storage=storage)
 
     def __floordiv__(self, other):
         """
@@ -330,37 +436,53 @@ class Mat(object):
         """
         return self._mul_inv(other, left=False)
 
-    def __pow__(self, other):
+    def __pow__(self, other, modulo=None):
         """
         Returns self**other, calculates inverse of matrix if
-        other < 0
+        other < 0. pow(self, other, modulo) takes the entries
+        modulo an int after every product.
         """
-        if not self.is_square():
-            raise ValueError('Expecting a square matrix.')
-        if not isinstance(other, int):
-            raise NotImplementedError
+        return self.power(other, modulo=modulo)
 
-        ret = E(self.rows())
-        if other == 0:
-            return ret
-        elif other == 1:
-            return self
-        elif other == -1:
-            return ret // self
-        elif other < 0:
-            m = ret // self
-            other = -other
-        elif other > 0:
-            m = Mat(self)
+# Other Methods------------------------------------------------
+    
+    def _modified(self):
+        """
+        Forget everything cached about self, called by the methods
+        that change self and by writes through its rows.
+        """
+        self._version += 1
+        self._cache.clear()
 
-        while other != 0:
-            ret *= m
-            other -= 1
+    def _cached(self, key, compute):
+        """
+        Returns compute(), kept in self._cache until self is changed.
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
 
-        return ret
+    def version(self):
+        """
+        -> int
+
+        Returns a number that every change of self increases, so what
+        is computed from self can tell if it is still up to date. det,
+        rank, trace, inv, solve and the factorizations are kept until
+        then, writes through the rows of self count as changes.
+
+        >>> m = rMat('2 1\\n1 3')
+        >>> v = m.version()
+        >>> m.det()
+        5
+        >>> m[0][0] += 2
+        >>> m.det(), m.version() > v
+        (11, True)
+        >>> m[1] * 2, isinstance(m[1], list)
+        ([1, 3, 1, 3], True)
+        """
+        return self._version
 
-# Other Methods------------------------------------------------
-    
     def field(self, x):
         return self._field(x) if self._field != None else x
 
@@ -370,7 +492,8 @@ class Mat(object):
 
         Returns True if self is empty.
         """
-        return self._data == [] or self._data == [[]]
+        return len(self._data) == 0 or\
+                (len(self._data) == 1 and len(self._data[0]) == 0)
 
     def size(self, index = None):
         """
@@ -423,6 +546,10 @@ class Mat(object):
             cols = self.cols()
         if fill == None:
             fill = self.field(0)
+        self._modified()
+        if isinstance(self._data, ArrayStorage):
+            self._data.resize(rows, cols, trunc, fill)
+            return
         while self.rows() < rows:
             self._data.append([])
 
@@ -445,13 +572,177 @@ class Mat(object):
         """
         return Mat(self)
 
-    def trans(self):
+    def to_array(self):
+        """
+        -> Mat
+
+        Returns a copy of self stored in one contiguous row-major
+        buffer. Only int and float elements can be stored this way.
+        """
+        return Mat(self, storage='array')
+
+    def to_list(self):
         """
         -> Mat
 
-        Returns the transpose of self.
+        Returns a copy of self stored as a list of lists.
+        """
+        return Mat(self, storage='list')
+
+    def save(self, path):
+        """
+        -> None
+
+        Write self to a binary file: a header with the size, field and
+        title of self, then the entries as float64, int64 (or wider
+        ints), or blocks of numerators and denominators for Rat.
+        A Mat mixing ints and floats is saved as floats.
+        """
+        _save(self, path)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        -> Mat
+
+        Read a Mat written by save(). If mmap == True the file is
+        memory-mapped: the Mat opens at once and its entries are
+        read from the file when they are used. Float and int entries
+        are then kept in array storage on the mapping, Rats in a
+        MatView building them on demand. Changes of the Mat never go
+        back to the file. The mapping, and the file descriptor it
+        holds, stays open while entries are read from it: until array
+        storage is copied into memory (rows inserted, popped or
+        swapped, a resize, memoryview()) or until the Mat and its
+        views are gone. copy() or mmap=False release it at once.
+        Big-endian hosts always read the file into memory, mmap is
+        ignored there.
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'm.mat')
+        >>> rMat('1/2 -3\\n4 5/6').save(path)
+        >>> Mat.load(path)
+        1/2  -3
+          4 5/6
+        >>> Mat('1.5 2\\n3 4', title=('a', 'b')).save(path)
+        >>> m = Mat.load(path)
+        >>> m
+          a   b
+        1.5 2.0
+        3.0 4.0
+        >>> m.memoryview().format, Mat.load(path, mmap=False) == m
+        ('d', True)
+        """
+        return _load(path, mmap)
+
+    @staticmethod
+    def from_lines(lines, rows=0, cols=0, field=None, title=(),
+                   storage=None):
+        """
+        -> Mat
+
+        Same as Mat(str) for the lines of the string, but the lines
+        are parsed one at a time, so any iterable of str works: a
+        file object, a generator. Each column is read as the
+        narrowest of int, float, Rat and complex holding all its
+        entries, short rows are padded with zeros of that type, and
+        a column having a Rat makes the field Rat.
+
+        >>> Mat.from_lines(['1 2.5; 1', '', '3 1/2 7'])
+          1 5/2   0   1
+          0   0   0   0
+          3 1/2   7   0
+        >>> Mat.from_lines(['1 2', '3.5'])
+        1.0   2
+        3.5   0
+        """
+        data, field = _read_lines(lines, rows, cols, field)
+        if data == []:
+            return Mat('', rows, cols, field, title, storage)
+        return Mat(data, field=field, title=title, storage=storage)
+
+    @staticmethod
+    def from_file(file, rows=0, cols=0, field=None, title=(),
+                  storage=None):
+        """
+        -> Mat
+
+        Read a text matrix from a file object or a path, line by
+        line, see from_lines().
+        """
+        if isinstance(file, str):
+            with open(file) as f:
+                return Mat.from_lines(f, rows, cols, field, title, storage)
+        return Mat.from_lines(file, rows, cols, field, title, storage)
+
+    def memoryview(self):
+        """
+        -> memoryview
+
+        Returns a 2-d memoryview on the buffer of an array-backed
+        matrix, no copies are made, but the entries of a mapped file
+        (see load()) are first read into memory. Writes through the
+        view and the matrix are seen by both. While the view is
+        alive, changes needing a new buffer raise BufferError:
+        resizing, inserting or popping columns, writing a float to an
+        int matrix or a value an array cannot hold.
+        """
+        if not isinstance(self._data, ArrayStorage):
+            raise TypeError('Only array-backed Mat supports memoryview, '
+                            'use to_array() first.')
+        return self._data.memoryview()
+
+    def __buffer__(self, flags):
+        # memoryview(m) and NumPy only use it from Python 3.12 on,
+        # call m.memoryview() before
+        return self.memoryview()
+
+    def trans(self, copy=True):
+        """
+        -> Mat
+
+        Returns the transpose of self. If copy == False, returns a
+        MatView sharing the entries of self.
+        """
+        if not copy:
+            return self.view()._transposed()
+        if _use_numpy(self):
+            return _from_numpy(self.to_numpy().T, self._field)
+        return Mat(lambda i,j: self._data[j][i], self.cols(), self.rows())
+
+    def view(self, rows=None, cols=None):
+        """
+        -> MatView
+
+        Returns the submatrix of self on rows and cols, without copying
+        it. rows and cols are slices or ranges (None for all of them),
+        so they can have a step.
         """
-        return Mat(lambda i,j: self[j][i], self.cols(), self.rows())
+        rows = _view_range(rows, self.rows())
+        cols = _view_range(cols, self.cols())
+        title = tuple(self._title[c] for c in cols)\
+                if len(self._title) == self.cols() else ()
+        data = self._data
+        if isinstance(data, _ViewStorage):
+            if data.trans:
+                rows, cols = _compose(data.rows, cols),\
+                        _compose(data.cols, rows)
+            else:
+                rows, cols = _compose(data.rows, rows),\
+                        _compose(data.cols, cols)
+            return MatView(_ViewStorage(data.base, rows, cols, data.trans),
+                           self._field, title)
+        return MatView(_ViewStorage(data, rows, cols), self._field, title)
+
+    def lazy(self):
+        """
+        -> Expr
+
+        Returns self as a lazy expression: +, -, * and trans() on it
+        build an Expr, which is only worked out when it is indexed,
+        printed or forced.
+        """
+        return Expr('leaf', (self,), self.size(), self._field)
 
     def trace(self):
         """
@@ -462,19 +753,62 @@ class Mat(object):
         if not self.is_square():
             raise ValueError('Expecting a square matrix.')
 
-        return sum(self[i][i] for i in range(self.rows()))
+        return self._cached('trace', lambda:
+                            sum(self._data[i][i] for i in range(self.rows())))
 
-    def det(self):
+    def det(self, method=None, workers=None, pivot=None):
         """
         -> self._field
 
         Returns determinant of self, self should be square.
+        method is one of 'gauss', 'lu', 'bareiss', 'modular' and
+        'numpy', by default it is chosen from the field of self. The
+        'modular' method can spread its primes over a pool of workers
+        processes. pivot picks the pivots of 'gauss', see PIVOT, and
+        implies it.
+
+        >>> Mat('2 1 0\\n1 3 1\\n0 1 4').det(pivot='complete')
+        18.0
+        >>> rMat('1/3 2\\n5 1/7').det(pivot='bitsize')
+        -209/21
         """
+        return self._cached(('det', method, pivot),
+                            lambda: self._det(method, workers, pivot))
+
+    def _det(self, method, workers, pivot):
         if not self.is_square():
             raise ValueError('Expecting a square matrix.')
 
-        # det can be changed by _simplify
-        return Mat(self)._simplify( det = [self.field(1)] )
+        if method == None:
+            if pivot != None:
+                method = 'gauss'
+            elif self._use_lu():
+                # exact either way, a cached LU saves the elimination
+                method = 'lu' if 'lu' in self._cache else 'bareiss'
+            elif self._is_exact():
+                method = 'bareiss'
+            else:
+                method = 'numpy' if _use_numpy(self) else 'gauss'
+        if self.is_empty() and method in ('bareiss', 'modular'):
+            return self.field(1)
+
+        if method == 'lu':
+            return self.lu().det()
+        elif method == 'bareiss':
+            a, scale = _integer_rows(self)
+            pivots, sign = _bareiss(a, self.cols())
+            if len(pivots) < self.rows():
+                return self.field(0)
+            det = sign * a[-1][-1]
+            return self.field(det if scale == 1 else _rat(det, scale))
+        elif method == 'modular':
+            return self.field(_modular_det(self, workers))
+        elif method == 'numpy':
+            return self.field(float(_np.linalg.det(self.to_numpy())))
+        elif method == 'gauss':
+            # det can be changed by _simplify
+            return Mat(self)._simplify( det = [self.field(1)], pivot=pivot)
+        raise ValueError('Unknown method %s.' % method)
 
     def inv(self):
         """
@@ -482,8 +816,332 @@ class Mat(object):
 
         Returns inverse of self, self should be square.
         """
+        return Mat(self._cached('inv', self._inv))
+
+    def _inv(self):
+        if self._use_lu():
+            return self.lu().inv()
+        if _use_numpy(self):
+            try:
+                return _from_numpy(_np.linalg.inv(self.to_numpy()),
+                                   self._field)
+            except _np.linalg.LinAlgError:
+                raise ValueError("This matrix is irreversible!")
         return E(self.rows()) // self
 
+    def lu(self):
+        """
+        -> LU
+
+        Returns the LU factorization of self, self should be square.
+        The factorization is kept until self is changed, so solving
+        many systems with the same matrix only factorizes it once.
+        """
+        return self._cached('lu', lambda: LU(self))
+
+    def qr(self, pivoting=False):
+        """
+        -> QR
+
+        Returns the Householder QR factorization of self, in floats,
+        kept until self is changed. With pivoting the columns are
+        reordered to reveal the rank, see QR.
+        """
+        return self._cached('qrp' if pivoting else 'qr',
+                            lambda: QR(self, pivoting))
+
+    def lstsq(self, b, pivoting=False):
+        """
+        -> list
+
+        Returns x minimizing norm(self * x - b), by QR, so the system
+        may be overdetermined. Rank deficient matrices need pivoting.
+        For more rows than fit in memory, see StreamQR.
+        """
+        return self.qr(pivoting).solve(b)
+
+    def cholesky(self):
+        """
+        -> Cholesky
+
+        Returns the Cholesky factorization of self, which should be
+        symmetric positive definite, kept until self is changed.
+        Only the lower triangle of self is read.
+        """
+        return self._cached('cholesky', lambda: Cholesky(self))
+
+    def ldl(self):
+        """
+        -> LDL
+
+        Returns the pivoted LDL^T factorization of self, which should
+        be symmetric, kept until self is changed. Only the lower
+        triangle of self is read.
+        """
+        return self._cached('ldl', lambda: LDL(self))
+
+    def _is_symmetric(self):
+        return self.is_square() and all(
+            self._data[i][j] == self._data[j][i] for i in range(self.rows())
+            for j in range(i))
+
+    def eigvals(self, symmetric=None, k=None):
+        """
+        -> list
+
+        Returns the eigenvalues of self, floats or complex, by
+        decreasing real part. self is reduced to Hessenberg form and
+        the implicit double-shift QR iteration finds them; symmetric
+        matrices (checked if symmetric is None) are made tridiagonal
+        and go through the implicit QL iteration. With k, only the
+        k largest ones of a symmetric self are computed, see lanczos().
+
+        >>> [round(x, 10) for x in Mat('2 1\\n1 2').eigvals()]
+        [3.0, 1.0]
+        >>> Mat('0 -1\\n1 0').eigvals()
+        [1j, -1j]
+        """
+        if k != None:
+            return self.eig(symmetric, k)[0]
+        if symmetric == None:
+            symmetric = self._is_symmetric()
+        if symmetric:
+            return _symmetric_eig(self, False)
+        a = _float_rows(self)
+        _balance(a)
+        _hessenberg(a)
+        return _sorted_pairs(_hqr(a))
+
+    def eig(self, symmetric=None, k=None):
+        """
+        -> (list, Mat)
+
+        Returns the eigenvalues of self as eigvals() does, and a Mat
+        whose columns are eigenvectors of norm 1, their largest entry
+        positive. The vectors of a symmetric self are orthonormal,
+        those of other matrices come from inverse iteration and may
+        coincide for repeated eigenvalues.
+
+        >>> values, vectors = Mat('2 0 0\\n0 3 4\\n0 4 9').eig()
+        >>> [round(x, 10) for x in values]
+        [11.0, 2.0, 1.0]
+        >>> vectors
+                        0.0                 1.0                 0.0
+         0.4472135954999579                 0.0  0.8944271909999159
+         0.8944271909999159                 0.0 -0.4472135954999579
+        """
+        if k != None:
+            if symmetric == False or\
+                    symmetric == None and not self._is_symmetric():
+                raise ValueError('Lanczos needs a symmetric matrix.')
+            return lanczos(self, k)
+        if symmetric == None:
+            symmetric = self._is_symmetric()
+        if symmetric:
+            return _symmetric_eig(self, True)
+        values = self.eigvals(symmetric=False)
+        a = _float_rows(self)
+        vectors = [_inverse_iteration(a, v) for v in values]
+        return values, Mat([list(row) for row in zip(*vectors)])
+
+    def _use_lu(self):
+        """
+        Only Rat matrices go through their LU: it is exact, so det(),
+        inv() and division give the same result whether lu() was
+        asked for before or not. Floats always take the path of
+        their method, whatever is cached.
+        """
+        return self._field == rational.Rat
+
+    def _is_exact(self):
+        """
+        Returns True if self holds ints or Rats, these go through the
+        fraction-free Bareiss elimination.
+        """
+        return self._field == int or self._field == rational.Rat
+
+    def _is_float(self):
+        """
+        Returns True if self holds nothing but floats, these can go
+        to NumPy.
+        """
+        if self._field != None:
+            return self._field == float
+        return all(isinstance(x, float) for row in self._data for x in row)
+
+    def to_numpy(self):
+        """
+        -> numpy.ndarray
+
+        Returns a float ndarray holding a copy of self.
+        """
+        if _np == None:
+            raise ImportError('to_numpy() needs NumPy.')
+        if isinstance(self._data, ArrayStorage):
+            return _np.array(self._data._view(), dtype=float)
+        return _np.array(self._data, dtype=float).reshape(self.size())
+
+    def matvec(self, x):
+        """
+        -> list
+
+        Returns self * x, x is a sequence of self.cols() numbers.
+        Like SparseMat and BandMat, a Mat can so be given to the
+        iterative solvers.
+        """
+        if len(x) != self.cols():
+            raise ValueError('Expecting a vector of length %d.'
+                             % self.cols())
+        return [sum(p * q for p, q in zip(row, x)) for row in self]
+
+    def power(self, k, method='binary', modulo=None):
+        """
+        -> Mat
+
+        Returns self**k, self should be square. If k < 0, the inverse
+        of self is computed once and raised to -k.
+
+        method 'binary' squares and multiplies, about 2*log2(k)
+        products. method 'charpoly' first takes x**k modulo the
+        characteristic polynomial of self with poly.Poly, then
+        evaluates the remainder at self with n products.
+
+        If modulo is an int, the entries (of an int matrix) are taken
+        modulo it after every product.
+
+        >>> m = Mat('''
+        ... 1 1
+        ... 1 0''')
+        >>> m**10
+        89 55
+        55 34
+        >>> m.power(10, method='charpoly')
+        89 55
+        55 34
+        >>> pow(m, 10**18, 1000)
+        501 875
+        875 626
+        >>> m.power(10**18, method='charpoly', modulo=1000)
+        501 875
+        875 626
+        >>> rMat('2 0\\n0 4') ** -2
+         1/4    0
+           0 1/16
+        """
+        if not self.is_square():
+            raise ValueError('Expecting a square matrix.')
+        if not isinstance(k, int):
+            raise NotImplementedError
+
+        if k == 0:
+            return E(self.rows())
+        elif k == 1 and modulo == None:
+            return self
+        m = self
+        if k < 0:
+            m = self.inv()
+            k = -k
+
+        if method == 'charpoly':
+            return m._power_charpoly(k, modulo)
+        elif method != 'binary':
+            raise ValueError('Unknown method %s.' % method)
+
+        ret = None
+        while True:
+            if k & 1:
+                ret = m if ret == None else _mod_entries(ret * m, modulo)
+            k >>= 1
+            if k == 0:
+                break
+            m = _mod_entries(m * m, modulo)
+        return _mod_entries(Mat(ret), modulo)
+
+    def charpoly(self, method=None):
+        """
+        -> poly.Poly
+
+        Returns the characteristic polynomial det(x*E - self), self
+        should be square. method is one of
+        'berkowitz'  division-free, O(n**4) ring operations, for any
+                     entries with +, - and *: ints, Rats, GF(p)...
+        'faddeev'    Faddeev-LeVerrier, n products, divides by 1..n.
+        'hessenberg' reduces self to Hessenberg form first by
+                     orthogonal transforms, O(n**3), in floats.
+        By default floats go through 'hessenberg', the others
+        through 'berkowitz'. The coefficients are kept until self is
+        changed; power(method='charpoly') shares them.
+
+        >>> Mat('1 2\\n3 4').charpoly()
+        x^2 - 5x - 2
+        >>> rMat('1/2 1 0\\n0 1/2 1\\n0 0 2').charpoly()
+        x^3 - 3x^2 + 9/4x - 1/2
+        >>> a = Mat('2.0 1\\n1 2')
+        >>> p = a.charpoly()
+        >>> [abs(p(v)) < 1e-12 for v in a.eigvals()]
+        [True, True]
+        """
+        return _poly(self._charpoly(method))
+
+    def _charpoly(self, method=None):
+        """
+        Returns the coefficients [1, c1, ..., cn] of the
+        characteristic polynomial, from the highest degree down.
+        """
+        if not self.is_square():
+            raise ValueError('Expecting a square matrix.')
+        if method == None:
+            method = 'hessenberg' if self._is_float() and\
+                    not self.is_empty() else 'berkowitz'
+        if method not in ('berkowitz', 'faddeev', 'hessenberg'):
+            raise ValueError('Unknown method %s.' % method)
+
+        def compute():
+            if method == 'hessenberg':
+                a = _float_rows(self)
+                _hessenberg(a)
+                return _hessenberg_charpoly(a)
+            a = [[self.field(v) for v in row] for row in self]
+            return _berkowitz(a) if method == 'berkowitz' else _faddeev(a)
+        return list(self._cached(('charpoly', method), compute))
+
+    def _power_charpoly(self, k, modulo):
+        """
+        Help power() to compute self**k by reducing x**k modulo the
+        characteristic polynomial first (Cayley-Hamilton).
+        """
+        from poly import Poly, x
+        n = self.rows()
+        a = [[self.field(v) for v in row] for row in self]
+        coefs = self._charpoly('berkowitz')
+        if modulo != None:
+            coefs = [c % modulo for c in coefs]
+        # a monic Rat divisor keeps the remainders exact
+        one = 1.0 if any(isinstance(v, float) for row in a for v in row)\
+                else rational.Rat(1)
+        p = _poly([one] + coefs[1:])
+
+        def reduce(r):
+            if modulo == None:
+                return r
+            return _poly([int(c) % modulo for c in reversed(_coefs(r, n))])
+
+        r = Poly(1)
+        for bit in bin(k)[2:]:
+            r = reduce((r * r) % p)
+            if bit == '1':
+                r = reduce((r * x) % p)
+        c = [_exact_int(v) for v in _coefs(r, n)]
+
+        # Horner's rule: (..(c[n-1] * A + c[n-2]) * A + ...) + c[0]
+        ret = diag(c[n-1], rows=n, field=self._field)
+        for i in range(n-2, -1, -1):
+            ret = ret * self
+            for d in range(n):
+                ret[d][d] += c[i]
+            ret = _mod_entries(ret, modulo)
+        return _mod_entries(ret, modulo)
+
     def check(self, func, r_range=None, c_range=None):
         """
         -> bool
@@ -497,7 +1155,7 @@ class Mat(object):
             c_range = range(self.cols())
         for r in r_range:
             for c in c_range:
-                if self[r][c] != func(r, c):
+                if self._data[r][c] != func(r, c):
                     return False
         return True
 
@@ -508,22 +1166,26 @@ class Mat(object):
         Primary row transform on self. The form of transform
         depends on the arguments given. Indices are 0-based.
         """
+        self._modified()
         if row2 == None and k == None:
             raise ValueError("At least one of 'row2' and 'k' is required.")
 
         # pr1: row *= k
         elif row2 == None: # k != None
-            self[row] = [elem * k for elem in self[row]]
+            self[row] = [elem * k for elem in self._data[row]]
 
         # pr3: swap row, row2
         elif k == None: # row2 != None
             if row != row2:
-                self[row], self[row2] = self[row2], self[row]
+                if isinstance(self._data, ArrayStorage):
+                    self._data.swap(row, row2)
+                else:
+                    self[row], self[row2] = self._data[row2], self._data[row]
 
         # pr2: row += row2 * k
         else: # row2, k != None
             for col in range(self.cols()):
-                self[row][col] += self[row2][col] * k
+                self._data[row][col] += self._data[row2][col] * k
 
         # print(self, '\n')
         return self
@@ -535,6 +1197,7 @@ class Mat(object):
         Primary column transform on self. The form of transform
         depends on the arguments given. col and col2 start from 0.
         """
+        self._modified()
         if col2 == None and k == None:
             raise ValueError("At least one of 'col2' and 'k' "
                              "is required.")
@@ -542,19 +1205,19 @@ class Mat(object):
         # pc1: col *= k
         elif col2 == None: # k != None
             for row in range(self.rows()):
-                self[row][col] *= k
+                self._data[row][col] *= k
 
         # pc3: swap col, col2
         elif k == None: # col2 != None
             if col != col2:
                 for row in range(self.rows()):
-                    self[row][col], self[row][col2]\
-                            = self[row][col2], self[row][col]
+                    self._data[row][col], self._data[row][col2]\
+                            = self._data[row][col2], self._data[row][col]
 
         # pc2: col += col2 * k
         else: # col2, k != None
             for row in range(self.rows()):
-                self[row][col] += self[row][col2] * k
+                self._data[row][col] += self._data[row][col2] * k
 
         # print(self, '\n')
         return self
@@ -576,9 +1239,11 @@ class Mat(object):
 
         Use self[row][col] as pivot to do Gauss Elimination.
         The pivot is changed to 1, the other elements on col is changed to
-        0. Raise ValueError if pivot == 0.
+        0. Raise ValueError if pivot == 0. With WORKERS set, the rows
+        of a large _range are updated by a process pool.
         """
-        if self[row][col] == 0:
+        self._modified()
+        if self._data[row][col] == 0:
             raise ValueError("The pivot of eliminate() cannot be zero.")
         elif _range == None:
             _range = range(row+1, self.rows())
@@ -586,22 +1251,32 @@ class Mat(object):
             raise ValueError("The _range of eliminate() cannot contain row.")
 
         # rewrite this row
-        if self[row][col] != 1:
-            rate = -1 if self[row][col] == -1 else self.field(1) / self[row][col]
-            self[row][col] = self.field(1)
+        if self._data[row][col] != 1:
+            rate = -1 if self._data[row][col] == -1 else self.field(1) / self._data[row][col]
+            self._data[row][col] = self.field(1)
             for c in range(col):
-                self[row][c] *= rate
+                self._data[row][c] *= rate
             for c in range(col+1, self.cols()):
-                self[row][c] *= rate
+                self._data[row][c] *= rate
 
         # process others
+        if _parallel(len(_range)) and isinstance(self._data, list):
+            todo = [r for r in _range if self._data[r][col] != 0]
+            rows = _eliminate_parallel([self._data[r] for r in todo],
+                                       self._data[row], col)
+            if rows != None:
+                for r, new_row in zip(todo, rows):
+                    new_row[col] = self.field(0)
+                    self._data[r] = new_row
+                return
+
         for r in _range:
-            if self[r][col] != 0:
+            if self._data[r][col] != 0:
                 for c in range(col):
-                    self[r][c] -= self[r][col] * self[row][c]
+                    self._data[r][c] -= self._data[r][col] * self._data[row][c]
                 for c in range(col+1, self.cols()):
-                    self[r][c] -= self[r][col] * self[row][c]
-                self[r][col] = self.field(0)
+                    self._data[r][c] -= self._data[r][col] * self._data[row][c]
+                self._data[r][col] = self.field(0)
 
 
     def _target(self, col):
@@ -611,7 +1286,7 @@ class Mat(object):
         target = col
         while target != 0:
             for c in range(0, col):
-                if self[target-1][c] != 0:
+                if self._data[target-1][c] != 0:
                     return target
             target -= 1
         return target
@@ -623,14 +1298,14 @@ class Mat(object):
         """
         for row in range(target, self.rows()):
 
-            if self[row][col] == 1:
+            if self._data[row][col] == 1:
                 if row != target:
                     self.pr(row = row, row2 = target)
                     if det != None:
                         det[0] = -det[0]
                 return True
 
-            elif self[row][col] == -1:
+            elif self._data[row][col] == -1:
                 self.pr(row = row, k = -1)
                 self.pr(row = row, row2 = target)
                 if det != None and row == target:
@@ -649,7 +1324,7 @@ class Mat(object):
                 if find == row:
                     continue
                 for k in (1, -1):
-                    if abs(self[row][col] + k * self[find][col]) == 1:
+                    if abs(self._data[row][col] + k * self._data[find][col]) == 1:
                         self.pr(row = row, row2 = find, k = k)
                         return True
         return False
@@ -660,7 +1335,7 @@ class Mat(object):
         Returns True if success.
         """
         for row in range(target, self.rows()):
-            tmp = self[row][col]
+            tmp = self._data[row][col]
             if tmp != 0:
                 self.pr(row = row, k = 1 / tmp)
                 if det != None:
@@ -676,7 +1351,7 @@ class Mat(object):
         """
         for c in range(self.cols()-2, col, -1):
             for r in range(target, self.rows()):
-                if self[r][c] != 0:
+                if self._data[r][c] != 0:
                     # we don't care that this changes det
                     self.pc(col = col, col2 = c)
                     # but this matters when solving system
@@ -685,21 +1360,69 @@ class Mat(object):
                     return True
         return False
 
-    def _simplify(self, *, det=None, rowsimp=False, vars=None, inv=False):
+    def _pivot(self, pivot, col, det, target, vars, last):
+        """
+        Pick a pivot with the strategy pivot among the rows from
+        target and the columns from col to last, and move it to
+        (target, col). Returns True if success.
+        """
+        found = _choose_pivot(self, pivot, col, target, last)
+        if found == None:
+            return False
+        row, c = found
+        if c != col:
+            self.pc(col = col, col2 = c)
+            if vars != None:
+                vars[col], vars[c] = vars[c], vars[col]
+            if det != None:
+                det[0] = -det[0]
+        if row != target:
+            self.pr(row = row, row2 = target)
+            if det != None:
+                det[0] = -det[0]
+        # eliminate() divides the row by its pivot
+        if det != None:
+            det[0] *= self._data[target][col]
+        return True
+
+    def _simplify(self, *, det=None, rowsimp=False, vars=None, inv=False,
+                  pivot=None):
         """
         Help to simplify the matrix (what great help!).
+        pivot is one of the strategies of PIVOT. Those searching other
+        columns than the current one only do so when the swaps are
+        tracked: for det, and for the coefficients of a system with
+        vars. Otherwise they pivot in the current column.
         """
+        if pivot == None:
+            pivot = PIVOT
+        if pivot not in _PIVOTS:
+            raise ValueError('Unknown pivot %s.' % pivot)
+        if vars != None:
+            last = self.cols() - 1
+        elif det != None:
+            last = self.cols()
+        else:
+            last = None
+
         col = 0
         while col != self.rows() and col != self.cols():
             target = self._target(col)
 
-            if self._p3(col, det, target):
+            found = True
+            if pivot != 'ones':
+                found = self._pivot(pivot, col, det, target, vars, last)
+            elif self._p3(col, det, target):
                 pass
             elif self._p2(col, target):
                 self._p3(col, det, target)
             elif self._p1(col, det, target):
                 self._p3(col, det, target)
+            else:
+                found = False
 
+            if found:
+                pass
             # so there are only 0 below target in this column!
             elif det != None:
                 return self.field(0)
@@ -716,38 +1439,107 @@ class Mat(object):
         if rowsimp:
             # reverse iter:
             for col in range(min(self.cols(), self.rows())-1, -1, -1):
-                if self[col][col] != 0:
+                if self._data[col][col] != 0:
                     self.eliminate(col, col, range(col))
 
         if det != None:
             return det[0]
 
-    def to_stair(self):
+    def to_stair(self, pivot=None):
         """
         -> self
 
-        Transfrom self to a stair-like matrix.
+        Transfrom self to a stair-like matrix. pivot picks the pivots
+        of the Gauss elimination, see PIVOT. pivot='bareiss' runs the
+        fraction-free elimination instead, faster on int and Rat
+        matrices, but its pivots, and so the stair form, may differ
+        from PIVOT's. An int field then becomes Rat, since the pivots
+        divide the rows.
+
+        >>> m = Mat('2 8\\n1 3', field=rational.Rat)
+        >>> m.copy().to_stair()
+        1 3
+        0 1
+        >>> m.to_stair(pivot='bareiss')
+        1 4
+        0 1
+        >>> m = Mat([[2, 1], [1, 3]], field=int)
+        >>> m.to_stair(pivot='bareiss')
+          1 1/2
+          0   1
+        >>> m.field(1) / 4
+        1/4
         """
-        self._simplify()
+        if pivot == 'bareiss':
+            if not self._is_exact():
+                raise ValueError("pivot='bareiss' needs an int or Rat "
+                                 "matrix.")
+            if self.is_empty():
+                return self
+            if self._field == int:
+                self._field = rational.Rat
+            a, scale = _integer_rows(self)
+            pivots, sign = _bareiss(a, self.cols(), swap=True)
+            for k, col in enumerate(pivots):
+                piv = a[k][col]
+                self[k] = [_rat(x, piv) for x in a[k]]
+            for k in range(len(pivots), self.rows()):
+                self[k] = [self.field(0)] * self.cols()
+            return self
+        self._simplify(pivot=pivot)
         return self
 
 
-    def to_rowsimp(self):
+    def to_rowsimp(self, pivot=None):
         """
         -> self
 
-        Transfrom self to a row-simplified stair-like matrix.
+        Transfrom self to a row-simplified stair-like matrix. pivot
+        picks the pivots, see PIVOT.
         """
-        self._simplify(rowsimp=True)
+        self._simplify(rowsimp=True, pivot=pivot)
         return self
 
-    def rank(self, simplified=False, with_last_col=True):
+    def rank(self, simplified=False, with_last_col=True, method=None,
+             workers=None):
         """
         -> int
 
         Returns rank of self. Skip self.to_stair() if
         simplified == True. Returns rank of self without last column if with_last_col == False.
+        method is one of 'gauss', 'bareiss', 'modular', 'numpy' and
+        'random', see det(). 'random' eliminates modulo random primes
+        and may return less than the rank, with a chance below
+        RANDOM_ERROR; see is_full_rank().
         """
+        return self._cached(('rank', simplified, with_last_col, method),
+                lambda: self._rank(simplified, with_last_col, method, workers))
+
+    def _rank(self, simplified, with_last_col, method, workers):
+        if method == None:
+            if simplified:
+                method = 'gauss'
+            elif self._is_exact():
+                method = 'bareiss'
+            else:
+                method = 'numpy' if _use_numpy(self) else 'gauss'
+        if method != 'gauss' and self.is_empty():
+            return 0
+
+        cols = self.cols() - (not with_last_col)
+        if method == 'bareiss':
+            a, scale = _integer_rows(self)
+            pivots, sign = _bareiss(a, cols)
+            return len(pivots)
+        elif method == 'modular':
+            return _modular_rank(self, cols, workers)
+        elif method == 'random':
+            return _random_rank(self, cols, RANDOM_ERROR)
+        elif method == 'numpy':
+            return int(_np.linalg.matrix_rank(self.to_numpy()[:, :cols]))
+        elif method != 'gauss':
+            raise ValueError('Unknown method %s.' % method)
+
         m = Mat(self) if simplified else Mat(self).to_stair()
         col = m.cols()
         if not with_last_col:
@@ -764,37 +1556,144 @@ class Mat(object):
                 return r
         return r+1
 
-    def solve(self):
+    def is_full_rank(self, error=None):
+        """
+        -> bool
+
+        Returns True if rank of self is min(self.size()). Int and Rat
+        matrices are reduced modulo random primes, stopping as soon as
+        the answer is known: True is always right, False is wrong with
+        a chance below error, RANDOM_ERROR by default. error == 0
+        takes the exact Bareiss elimination, other fields rank().
+
+        >>> Mat('2 1 0\\n1 3 1\\n0 1 4').is_full_rank()
+        True
+        >>> Mat('1 2 3\\n4 5 6\\n7 8 9').is_full_rank(error=1e-20)
+        False
+        """
+        if error == None:
+            error = RANDOM_ERROR
+        full = min(self.size())
+        if not self._is_exact() and (self._field != None or not all(
+                isinstance(x, (int, rational.Rat))
+                for row in self._data for x in row)):
+            return self.rank() == full
+        if error > 0 and not self.is_empty():
+            return _random_rank(self, self.cols(), error, full) == full
+        return self.rank(method='bareiss') == full
+
+    def is_singular(self, error=None):
+        """
+        -> bool
+
+        Returns True if self, which should be square, is singular,
+        without computing det. See is_full_rank() for error.
+
+        >>> rMat('1/2 1\\n1 2').is_singular()
+        True
+        """
+        if not self.is_square():
+            raise ValueError('Expecting a square matrix.')
+        return not self.is_full_rank(error)
+
+    def solve(self, method=None, workers=None, pivot=None):
         """
         -> Mat or str
 
         Solve the system, save the result k1T1 +...+ knTn + X0
         as Mat, where T1, ..., Tn, X0 are the columns, return
         a str if the system can't be solved.
+        method is one of 'gauss', 'bareiss', 'modular' and 'numpy', see
+        det(). 'numpy' only solves square systems with one solution,
+        the others go through 'gauss'. See lstsq() for the best fit
+        of a system without solution.
         """
-        m = Mat(self)
-        vars = [x for x in range(m.cols()-1)]
-        m._simplify(rowsimp=True, vars=vars)
+        ret = self._cached(('solve', method, pivot),
+                           lambda: self._solve(method, workers, pivot))
+        return Mat(ret) if isinstance(ret, Mat) else ret
+
+    def _solve(self, method, workers, pivot):
+        if method == None:
+            if pivot != None:
+                method = 'gauss'
+            elif self._is_exact():
+                method = 'bareiss'
+            else:
+                method = 'numpy' if _use_numpy(self) else 'gauss'
+        if method not in ('gauss', 'bareiss', 'modular', 'numpy'):
+            raise ValueError('Unknown method %s.' % method)
+
+        if method == 'numpy':
+            x = _numpy_solve(self)
+            if x != None:
+                return x
+            method = 'gauss'
+
+        cols = self.cols()
+        vars = [x for x in range(cols-1)]
+        if method != 'gauss' and not self.is_empty():
+            if method == 'bareiss':
+                ret = self._bareiss_rowsimp(vars)
+            else:
+                ret = _modular_rowsimp(self, vars, workers)
+            if ret == None:
+                return 'No solution!'
+            m, r = ret
+        else:
+            m = Mat(self)
+            m._simplify(rowsimp=True, vars=vars, pivot=pivot)
 
-        if m.rank(simplified=True, with_last_col=False) != m.rank(simplified=True, with_last_col=True):
-            return 'No solution!'
+            if m.rank(simplified=True, with_last_col=False) != m.rank(simplified=True, with_last_col=True):
+                return 'No solution!'
 
-        r = 0
-        while r != min(m.rows(), m.cols()):
-            if m[r][r] == 0:
-                break
-            r += 1
+            r = 0
+            while r != min(m.rows(), m.cols()):
+                if m[r][r] == 0:
+                    break
+                r += 1
+
+        # vars holds the variable of each column, find the column of
+        # each variable
+        where = [None] * len(vars)
+        for c, x in enumerate(vars):
+            where[x] = c
 
         def _solve_func(i, j):
-            if vars[i] < r:
-                if r + j < m.cols():
-                    ret = m[vars[i]][r+j]
-                    return ret if r + j == m.cols()-1 else -ret
+            if where[i] < r:
+                if r + j < cols:
+                    ret = m[where[i]][r+j]
+                    return ret if r + j == cols-1 else -ret
             else:
-                return 1 if vars[i] == r+j and r+j != m.cols()-1 else 0
+                return 1 if where[i] == r+j and r+j != cols-1 else 0
 
-        title = tuple( 'T%d' % x for x in range(1, m.cols()-r) ) + ('X0',)
-        return Mat(_solve_func, m.cols()-1, m.cols()-r, title=title)
+        title = tuple( 'T%d' % x for x in range(1, cols-r) ) + ('X0',)
+        return Mat(_solve_func, cols-1, cols-r, title=title)
+
+    def _bareiss_rowsimp(self, vars):
+        """
+        Help solve() with the Bareiss elimination. Columns are picked
+        the way _simplify() picks them, so the result looks the same.
+        Returns (rows, rank), where rows[i][j] for j >= rank is the
+        row-simplified matrix, or None if the system can't be solved.
+        """
+        cols = self.cols()
+        a, scale = _integer_rows(self)
+        pivots, sign = _bareiss(a, cols-1, swap=True, vars=vars)
+        r = len(pivots)
+        for i in range(r, len(a)):
+            if a[i][-1] != 0:
+                return None
+
+        # back substitution, y = d * x stays integral by Cramer's rule
+        d = a[r-1][r-1] if r > 0 else 1
+        y = [None] * r
+        for i in range(r-1, -1, -1):
+            row = a[i]
+            y[i] = [None] * r + [(d * row[j] - sum(row[l] * y[l][j]
+                                                   for l in range(i+1, r)))
+                                 // row[i] for j in range(r, cols)]
+        return [[_rat(x, d) if x != None else None for x in row]
+                for row in y], r
 
     def _mul_inv(self, other, left=True):
         """
@@ -803,24 +1702,43 @@ class Mat(object):
         Help to do mat division. Returns other**(-1) * self if
         left == True; else returns self * other**(-1).
         """
-        if not other.is_square:
+        if not other.is_square():
             raise ValueError('The second Matrix must be '
                              'square.')
         if left:
             if self.rows() != other.rows():
                 raise ValueError('They should have the same rows.')
-            ret = Mat(lambda i,j: other[i][j] if j < other.cols() else self[i][j-other.cols()], other.rows(), other.cols()+self.cols())
         else:
             if self.cols() != other.cols():
                 raise ValueError('They should have the same cols.')
-            ret = Mat(lambda j,i: other[i][j] if i < other.rows() else self[i-other.rows()][j], other.cols(), other.rows()+self.rows())
 
-        ret._simplify(rowsimp=True, inv=True)
+        if other._use_lu():
+            lu = other.lu()
+            if left:
+                return lu.solve_many(self)
+            # x * other = row  <=>  other^T * x^T = row^T
+            return Mat([lu.solve(row, trans=True) for row in self],
+                       field=lu.field_type)
+
+        if _use_numpy(self, other):
+            a, b = other.to_numpy(), self.to_numpy()
+            try:
+                if left:
+                    return _from_numpy(_np.linalg.solve(a, b), self._field)
+                return _from_numpy(_np.linalg.solve(a.T, b.T).T, self._field)
+            except _np.linalg.LinAlgError:
+                raise ValueError("This matrix is irreversible!")
 
         if left:
-            return Mat(lambda i,j: ret[i][j+other.cols()], self.rows(), self.cols())
+            aug = augment(other, self)
         else:
-            return Mat(lambda j,i: ret[i][j+other.rows()], self.rows(), self.cols())
+            aug = augment(other.trans(copy=False), self.trans(copy=False))
+        ret = Mat([row.copy() for row in aug])
+
+        ret._simplify(rowsimp=True, inv=True)
+
+        solution = ret.view(cols=slice(other.cols(), None))
+        return Mat(solution) if left else solution.trans()
 
     def insert(self, iterable, *, row=None, col=None):
         """
@@ -829,6 +1747,7 @@ class Mat(object):
         Insert a copy of the iterable as a row or a column of self.
         iterable is truncated if too long, padded with zeros if too short.
         """
+        self._modified()
         if row != None and col == None:
             L = list(iterable)
             resize(L, self.cols())
@@ -836,7 +1755,10 @@ class Mat(object):
         elif col != None and row == None:
             L = list(iterable)
             resize(L, self.rows())
-            for i, row in enumerate(self):
+            if isinstance(self._data, ArrayStorage):
+                self._data.insert_col(col, L)
+                return
+            for i, row in enumerate(self._data):
                 row.insert(col, L[i])
         else:
             raise ValueError("One and only one of 'row' and 'col' is "
@@ -848,10 +1770,14 @@ class Mat(object):
 
         Remove a row/column of self.
         """
+        self._modified()
         if row != None and col == None:
             self._data.pop(row)
         elif col != None and row == None:
-            for row in self:
+            if isinstance(self._data, ArrayStorage):
+                self._data.pop_col(col)
+                return
+            for row in self._data:
                 row.pop(col)
         else:
             raise ValueError("One and only one of 'row' and 'col' is "
@@ -859,89 +1785,4582 @@ class Mat(object):
 
 # class ends---------------------------------------------------
 
-def diag(*values, rows=None, cols=None, loop=True, fill=0, field=None):
-    """
-    -> Mat
+# rows--------------------------------------------------------
 
-    Returns a diagonal matrix with its main diagonal filled
-    with 'values'. The values loop if loop == True, otherwise
-    fill them with 'fill', which by default is 0.
+class _Row(list):
     """
-    sz = len(values)
-    if rows == None:
-        rows = sz
-    if cols == None:
-        cols = rows
+    A list row of a Mat, m[i] or the rows iterating m give. The
+    plain list row is replaced by a _Row the first time it is handed
+    out, so m[i] is a list and reads at list speed, while writes
+    through it, m[i][j] = x or m[i].append(x), tell m that it changed
+    and nothing stale is kept in its cache.
+    """
+    __slots__ = ('_mat',)
 
-    if loop:
-        return Mat(lambda i,j: values[i % sz] if i == j else fill, rows,\
-                cols, field=field)
-    else:
-        return Mat(lambda i,j: values[i] if i == j and i<sz else fill,\
-                rows, cols, field=field)
+    def __init__(self, mat, row):
+        list.__init__(self, row)
+        self._mat = mat
 
-def O(rows, cols=None, fill=0, field=None):
-    """
-    -> Mat
+    def __setitem__(self, index, value):
+        self._mat._modified()
+        list.__setitem__(self, index, value)
 
-    Returns a matrix filled with 'fill', which by default is 0.
-    """
-    if cols == None:
-        cols = rows
-    return Mat(lambda i,j: 0, rows, cols, field=field)
+    def copy(self):
+        """
+        Returns the row as a plain list.
+        """
+        return list(self)
 
-def E(size, field=None):
-    """
-    -> Mat
+    def __reduce__(self):
+        # pickled and deep copied as the plain list
+        return list, (list(self),)
 
-    Returns a unit matrix.
-    """
-    return diag(1, rows=size, field=field)
+def _row_mutator(name):
+    method = getattr(list, name)
+    def mutate(self, *args, **kwargs):
+        self._mat._modified()
+        return method(self, *args, **kwargs)
+    mutate.__name__ = name
+    mutate.__doc__ = method.__doc__
+    return mutate
 
-def Kronecker(i, j, field=None):
-    """
-    -> int
+for _name in ('__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(_Row, _name, _row_mutator(_name))
+del _name
 
-    Kronecker delta = 1, if i == j
-                      0, if i != j
-    """
-    if field == None:
-        return 1 if i == j else 0
-    return field(1) if i == j else field(0)
+# array storage------------------------------------------------
 
-def e(size, i, field=None):
+def _array_code(values, code='q'):
     """
-    -> list of self._field
-
-    Returns a list, which is the ith column of E.
+    Returns the typecode of an array holding values next to entries
+    of typecode code: code, 'd' once a float comes, or None if a
+    value is neither a float nor an int an array keeps exactly.
     """
-    return [Kronecker(i, j, field=field) for j in range(size)]
-
-def trans(mat):
+    big = False
+    for x in values:
+        if type(x) is float:
+            code = 'd'
+        elif type(x) is not int or x.bit_length() > 1023:
+            return None
+        elif not -2**63 <= x < 2**63:
+            big = True
+    return None if big and code == 'q' else code
+
+def _typecode(values, field=None):
     """
-    -> Mat
-
-    Returns the transpose of mat.
+    Choose the array typecode for values: 'q' if they are all
+    ints, 'd' if there is a float among them.
     """
-    return mat.trans()
-
-def trace(mat):
+    if field == float:
+        return 'd'
+    if field not in (None, int):
+        raise TypeError('Array storage only holds int or float, '
+                        'field %s given.' % field)
+    code = _array_code(values)
+    if code == None:
+        raise TypeError('Array storage only holds floats and ints of '
+                        '64 bits.')
+    return code
+
+class ArrayStorage(object):
     """
-    -> self._field
-
-    Returns trace of mat, mat should be square.
+    Keeps the elements of a Mat in one contiguous row-major
+    array.array. Indexing gives _ArrayRow views, so m[i][j] reads
+    and writes the buffer directly. An int buffer is turned into a
+    float one when a float is written to it. Values an array cannot
+    keep exactly, Rats or ints beyond 64 bits, turn the owner Mat
+    back into list rows. The buffer can also be a memoryview, of a
+    mapped file for instance, it is turned into an array.array when
+    rows are inserted, popped or swapped, and the mapping is then
+    closed.
     """
-    return mat.trace()
+    def __init__(self, rows, cols, buf, mapping=None):
+        if len(buf) != rows * cols:
+            raise ValueError('Buffer of size %d cannot hold %dx%d '
+                             'elements.' % (len(buf), rows, cols))
+        self._rows = rows
+        self._cols = cols
+        self._buf = buf
+        self._map = mapping
+        self.owner = None
+
+    @classmethod
+    def from_values(cls, values, rows, cols, field=None):
+        """
+        Build from a flat row-major sequence of values.
+        """
+        return cls(rows, cols, array.array(_typecode(values, field), values))
 
-def det(mat):
-    """
-    -> self._field
+    @classmethod
+    def from_rows(cls, rows, field=None):
+        """
+        Build from a list of equally long rows.
+        """
+        cols = len(rows[0]) if len(rows) > 0 else 0
+        values = [x for row in rows for x in row]
+        return cls.from_values(values, len(rows), cols, field)
 
-    Returns determinant of mat, mat should be square.
-    """
-    return mat.det()
+    @property
+    def typecode(self):
+        if isinstance(self._buf, memoryview):
+            return self._buf.format
+        return self._buf.typecode
 
-def inv(mat):
+    def _own(self):
+        """
+        Copy a memoryview buffer into an array.array.
+        """
+        if isinstance(self._buf, memoryview):
+            self._replace(array.array(self.typecode, self._buf))
+
+    def _replace(self, buf):
+        """
+        Make buf the buffer, and close the file the old one was
+        mapped from.
+        """
+        old, self._buf = self._buf, buf
+        if self._map != None:
+            old.release()
+            try:
+                self._map.close()
+            except BufferError:
+                # still exported elsewhere, closed once collected
+                pass
+            self._map = None
+
+    def copy(self):
+        return ArrayStorage(self._rows, self._cols, array.array(self.typecode,
+                                                                self._buf))
+
+    def memoryview(self):
+        # only an array.array tells when it is exported, so a mapped
+        # file is copied first, see _check_exports()
+        self._own()
+        return self._view()
+
+    def _view(self):
+        return memoryview(self._buf).cast('B').cast(self.typecode,
+                                                   (self._rows, self._cols))
+
+    def _check_exports(self):
+        """
+        Raise BufferError if a memoryview() of self is alive, before
+        the buffer is replaced: the view would keep the old one.
+        """
+        if isinstance(self._buf, array.array):
+            try:
+                # an array refuses to resize while it is exported
+                self._buf.append(0)
+            except BufferError:
+                raise BufferError('A memoryview of the matrix is alive, '
+                                  'release it first.') from None
+            self._buf.pop()
+
+    def _fits(self, values):
+        """
+        Whether the buffer can take values, once it is turned into a
+        float one if needed.
+        """
+        code = _array_code(values, self.typecode)
+        if code == None:
+            return False
+        if code != self.typecode:
+            self._promote()
+        return True
+
+    def _to_lists(self, rows=None):
+        """
+        Give the owner Mat list rows, the entries of self by default,
+        in place of self. Returns the rows.
+        """
+        if self.owner is None:
+            raise TypeError('Array storage only holds floats and ints of '
+                            '64 bits.')
+        self._check_exports()
+        if rows == None:
+            rows = [row.copy() for row in self]
+        self.owner._data = rows
+        return rows
+
+    def _index(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError('Row index out of range.')
+        return index
+
+    def _promote(self):
+        """
+        Turn an int buffer into a float one.
+        """
+        self._check_exports()
+        self._replace(array.array('d', self._buf))
+
+    def _store(self, start, values):
+        """
+        Write a row of values at start, False if they do not fit.
+        """
+        if len(values) != self._cols:
+            raise ValueError('Row of length %d expected, %d given.'
+                             % (self._cols, len(values)))
+        if not self._fits(values):
+            return False
+        self._buf[start:start+self._cols] = array.array(self.typecode,
+                                                        values)
+        return True
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_ArrayRow(self, i) for i in range(self._rows)[index]]
+        return _ArrayRow(self, self._index(index))
+
+    def __setitem__(self, index, values):
+        index = self._index(index)
+        values = list(values)
+        if not self._store(index * self._cols, values):
+            self._to_lists()[index] = values
+
+    def __iter__(self):
+        return (_ArrayRow(self, i) for i in range(self._rows))
+
+    def swap(self, i, j):
+        self._own()
+        i, j = self._index(i), self._index(j)
+        c = self._cols
+        a, b = i * c, j * c
+        self._buf[a:a+c], self._buf[b:b+c] = self._buf[b:b+c], self._buf[a:a+c]
+
+    def append(self, values):
+        self.insert(self._rows, values)
+
+    def insert(self, index, values):
+        if index < 0:
+            index += self._rows
+        index = min(max(index, 0), self._rows)
+        values = list(values)
+        if len(values) != self._cols:
+            raise ValueError('Row of length %d expected, %d given.'
+                             % (self._cols, len(values)))
+        if not self._fits(values):
+            self._to_lists().insert(index, values)
+            return
+        self._own()
+        self._check_exports()
+        start = index * self._cols
+        self._buf[start:start] = array.array(self.typecode, values)
+        self._rows += 1
+
+    def pop(self, index=-1):
+        index = self._index(index)
+        self._own()
+        self._check_exports()
+        start = index * self._cols
+        row = self._buf[start:start+self._cols].tolist()
+        del self._buf[start:start+self._cols]
+        self._rows -= 1
+        return row
+
+    def insert_col(self, index, values):
+        rows = [row.copy() for row in self]
+        for row, x in zip(rows, values):
+            row.insert(index, x)
+        self._rebuild(rows)
+
+    def pop_col(self, index=-1):
+        rows = [row.copy() for row in self]
+        for row in rows:
+            row.pop(index)
+        self._rebuild(rows)
+
+    def resize(self, rows, cols, trunc=False, fill=0):
+        """
+        Same as Mat.resize(), but done in one pass over the buffer.
+        """
+        if not trunc:
+            rows = max(rows, self._rows)
+            cols = max(cols, self._cols)
+        if (rows, cols) == (self._rows, self._cols):
+            return
+        keep = min(cols, self._cols)
+        new = [fill] * (rows * cols)
+        for i in range(min(rows, self._rows)):
+            start = i * self._cols
+            new[i*cols:i*cols+keep] = self._buf[start:start+keep]
+        self._rebuild_flat(new, rows, cols)
+
+    def _rebuild(self, rows):
+        self._rebuild_flat([x for row in rows for x in row], len(rows),
+                           len(rows[0]) if rows else 0)
+
+    def _rebuild_flat(self, values, rows, cols):
+        self._check_exports()
+        code = _array_code(values, self.typecode)
+        if code == None:
+            self._to_lists([values[k:k+cols]
+                            for k in range(0, rows * cols, cols)])
+            return
+        self._rows, self._cols = rows, cols
+        self._replace(array.array(code, values))
+
+class _ArrayRow(object):
+    """
+    A view on one row of an ArrayStorage. It behaves like the list
+    rows of a plain Mat, but never owns any data.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def _own_row(self):
+        # the list row of the owner, once the storage gave way to lists
+        owner = self._store.owner
+        if owner is not None and owner._data is not self._store:
+            return owner._data[self._row]
+        return None
+
+    def _index(self, index):
+        cols = self._store._cols
+        if index < 0:
+            index += cols
+        if not 0 <= index < cols:
+            raise IndexError('Column index out of range.')
+        return self._row * cols + index
+
+    def __len__(self):
+        row = self._own_row()
+        return len(row) if row != None else self._store._cols
+
+    def __getitem__(self, index):
+        store = self._store
+        if type(index) is int and (store.owner is None or
+                                   store.owner._data is store):
+            cols = store._cols
+            if 0 <= index < cols:
+                return store._buf[self._row * cols + index]
+        row = self._own_row()
+        if row != None or isinstance(index, slice):
+            return (row if row != None else self.copy())[index]
+        return store._buf[self._index(index)]
+
+    def __setitem__(self, index, value):
+        row = self._own_row()
+        if row != None:
+            row[index] = value
+            return
+        i = self._index(index)
+        if self._store.owner is not None:
+            self._store.owner._modified()
+        if type(value) is int and -2**63 <= value < 2**63 or\
+                self._store._fits((value,)):
+            self._store._buf[i] = value
+        else:
+            self._store._to_lists()[self._row][index] = value
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __contains__(self, key):
+        return key in self.copy()
+
+    def __eq__(self, other):
+        try:
+            return self.copy() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        """
+        Returns the row as a list.
+        """
+        row = self._own_row()
+        if row != None:
+            return list(row)
+        start = self._row * self._store._cols
+        return self._store._buf[start:start+self._store._cols].tolist()
+
+    def __str__(self):
+        return str(self.copy())
+
+    __repr__ = __str__
+
+# views-------------------------------------------------------
+
+class MatView(Mat):
+    """
+    A Mat showing entries of other Mats without copying them, from
+    Mat.view(), Mat.trans(copy=False) and augment(). A view reads the
+    entries of its parents, so it sees their changes. The first change
+    of the view itself copies the entries it shows: parents are never
+    changed through a view.
+
+    >>> m = Mat(lambda i,j: 10*i+j, 4, 5)
+    >>> v = m.view(rows=slice(1, 3), cols=slice(0, 5, 2))
+    >>> v
+    10 12 14
+    20 22 24
+    >>> v.trans(copy=False)
+    10 20
+    12 22
+    14 24
+    >>> m[1][2] = -1
+    >>> v[0]
+    [10, -1, 14]
+    >>> v[0][0] = 99
+    >>> v[0], m[1][0], v.is_view()
+    ([99, -1, 14], 10, False)
+    >>> augment(E(2), m.view(rows=range(2), cols=range(3)))
+     1  0  0  1  2
+     0  1 10 11 -1
+    """
+    def __init__(self, storage, field=None, title=()):
+        storage.owner = self
+        self._data = storage
+        self._field = field
+        self._title = title
+        self._cache = {}
+        self._version = 0
+
+    def _modified(self):
+        if self.is_view():
+            # copy on write
+            self._data = [self._data.row(i) for i in range(len(self._data))]
+        Mat._modified(self)
+
+    def _cached(self, key, compute):
+        # the parents change under a view without telling it
+        if self.is_view():
+            return compute()
+        return Mat._cached(self, key, compute)
+
+    def is_view(self):
+        """
+        -> bool
+
+        Returns True until self gets its own copy of the entries.
+        """
+        return isinstance(self._data, (_ViewStorage, _AugStorage,
+                                       _FileStorage))
+
+    def _transposed(self):
+        data = self._data
+        return MatView(_ViewStorage(data.base, data.rows, data.cols,
+                                    not data.trans), self._field)
+
+def _view_range(index, size):
+    """
+    Returns index, a slice, a range or None, as a range in range(size).
+    """
+    if index == None:
+        return range(size)
+    if isinstance(index, slice):
+        return range(size)[index]
+    if isinstance(index, range):
+        if len(index) > 0 and not (0 <= min(index[0], index[-1]) and
+                                   max(index[0], index[-1]) < size):
+            raise IndexError('View range out of the matrix.')
+        return index
+    raise TypeError('Expecting a slice or a range, %s given.' % type(index))
+
+def _compose(outer, inner):
+    """
+    Returns the range [outer[i] for i in inner].
+    """
+    return range(outer.start + inner.start * outer.step,
+                 outer.start + inner.stop * outer.step,
+                 outer.step * inner.step)
+
+class _ViewStorage(object):
+    """
+    Entry (i, j) of a view is base[rows[i]][cols[j]], or
+    base[rows[j]][cols[i]] if trans. base is the storage of the Mat
+    viewed, rows and cols are ranges.
+    """
+    __slots__ = ('base', 'rows', 'cols', 'trans', 'owner')
+
+    def __init__(self, base, rows, cols, trans=False):
+        self.base = base
+        self.rows = rows
+        self.cols = cols
+        self.trans = trans
+        self.owner = None
+
+    def __len__(self):
+        return len(self.cols) if self.trans else len(self.rows)
+
+    def width(self):
+        return len(self.rows) if self.trans else len(self.cols)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Row index out of range.')
+        return _ViewRow(self, index)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def get(self, i, j):
+        if self.trans:
+            return self.base[self.rows[j]][self.cols[i]]
+        return self.base[self.rows[i]][self.cols[j]]
+
+    def row(self, i):
+        """
+        Returns row i as a list.
+        """
+        if self.trans:
+            c = self.cols[i]
+            return [self.base[r][c] for r in self.rows]
+        base_row = self.base[self.rows[i]]
+        if isinstance(base_row, list) and len(self.cols) > 0:
+            cols = self.cols
+            stop = cols[-1] + (1 if cols.step > 0 else -1)
+            return base_row[cols[0]:stop if stop >= 0 else None:cols.step]
+        return [base_row[c] for c in self.cols]
+
+class _AugStorage(object):
+    """
+    The rows of Mats side by side, [A | B | ...].
+    """
+    __slots__ = ('mats', 'owner')
+
+    def __init__(self, mats):
+        self.mats = mats
+        self.owner = None
+
+    def __len__(self):
+        return self.mats[0].rows()
+
+    def width(self):
+        return sum(m.cols() for m in self.mats)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Row index out of range.')
+        return _ViewRow(self, index)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def get(self, i, j):
+        for m in self.mats:
+            if j < m.cols():
+                return m[i][j]
+            j -= m.cols()
+        raise IndexError('Column index out of range.')
+
+    def row(self, i):
+        ret = []
+        for m in self.mats:
+            ret.extend(m[i])
+        return ret
+
+class _ViewRow(object):
+    """
+    A row of a view. Writing it makes the view copy its entries.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def _own_row(self):
+        # the row of the copy, once the view got one
+        owner = self._store.owner
+        if owner != None and owner._data is not self._store:
+            return owner._data[self._row]
+        return None
+
+    def __len__(self):
+        return self._store.width()
+
+    def __getitem__(self, index):
+        row = self._own_row()
+        if row != None or isinstance(index, slice):
+            return (row if row != None else self.copy())[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Column index out of range.')
+        return self._store.get(self._row, index)
+
+    def __setitem__(self, index, value):
+        self._store.owner._modified()
+        self._store.owner._data[self._row][index] = value
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __contains__(self, key):
+        return key in self.copy()
+
+    def __eq__(self, other):
+        try:
+            return self.copy() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        """
+        Returns the row as a list.
+        """
+        row = self._own_row()
+        return list(row) if row != None else self._store.row(self._row)
+
+    def __str__(self):
+        return str(self.copy())
+
+    __repr__ = __str__
+
+# binary files------------------------------------------------
+
+_MAGIC = b'MATB'
+_VERSION = 1
+# field codes of the header
+_FIELDS = [None, int, float, rational.Rat]
+
+def _int_block(values):
+    """
+    Returns (code, width, bytes) of ints: int64, or the fewest bytes
+    that hold them all.
+    """
+    width = max((x.bit_length() for x in values), default=0) // 8 + 1
+    if width <= 8:
+        return b'q', 8, _little(array.array('q', values)).tobytes()
+    return b'w', width, b''.join(x.to_bytes(width, 'little', signed=True)
+                                 for x in values)
+
+def _little(a):
+    import sys
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+def _value_blocks(values):
+    """
+    Returns the blocks of (code, width, bytes) saving the values.
+    """
+    if all(type(x) in (int, float) for x in values) and\
+            any(type(x) is float for x in values):
+        return [(b'd', 8, _little(array.array('d', values)).tobytes())]
+    if all(type(x) is int for x in values):
+        return [_int_block(values)]
+    if all(type(x) is int or type(x) is rational.Rat and
+           type(x.num) is int for x in values):
+        # a den of 0 marks an int
+        return [_int_block([x if type(x) is int else x.num
+                            for x in values]),
+                _int_block([0 if type(x) is int else x.den
+                            for x in values])]
+    raise TypeError('Only int, float and Rat matrices can be saved.')
+
+def _save(mat, path):
+    import struct
+    rows, cols = mat.size()
+    if isinstance(mat._data, ArrayStorage):
+        code = mat._data.typecode
+        blocks = [(code.encode(), 8,
+                   _little(array.array(code, mat._data._buf)).tobytes())]
+    else:
+        blocks = _value_blocks([x for row in mat for x in row])
+
+    field = _FIELDS.index(mat._field) if mat._field in _FIELDS else 0
+    title = '\x1f'.join(mat._title).encode()
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sHHqqq', _MAGIC, _VERSION, field, rows, cols,
+                            len(title)))
+        f.write(title + bytes(-len(title) % 8))
+        for code, width, data in blocks:
+            # blocks start on 8 bytes, so they can be cast in place
+            f.write(struct.pack('<c7xq', code, width))
+            f.write(data + bytes(-len(data) % 8))
+
+def _load(path, mmap=True):
+    import struct, sys
+    with open(path, 'rb') as f:
+        if mmap and sys.byteorder == 'little':
+            from mmap import mmap as map_file, ACCESS_COPY
+            try:
+                mapped = map_file(f.fileno(), 0, access=ACCESS_COPY)
+                buf = memoryview(mapped)
+            except ValueError:
+                # an empty file cannot be mapped
+                mapped = None
+                buf = memoryview(f.read())
+        else:
+            # read into memory, big-endian hosts swap the bytes of a copy
+            mapped = None
+            buf = memoryview(f.read())
+            mmap = False
+
+    magic, version, field, rows, cols, size = struct.unpack_from('<4sHHqqq',
+                                                                 buf, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('%s is not a matrix file.' % path)
+    offset = 32
+    title = bytes(buf[offset:offset+size]).decode()
+    title = tuple(title.split('\x1f')) if title else ()
+    offset += size + (-size % 8)
+    field = _FIELDS[field]
+
+    count = rows * cols
+    blocks = []
+    while offset < len(buf):
+        code, width = struct.unpack_from('<c7xq', buf, offset)
+        offset += 16
+        data = buf[offset:offset+count*width]
+        offset += count*width + (-count*width % 8)
+        if code == b'w':
+            blocks.append(_WideInts(data, width))
+        else:
+            data = data.cast(code.decode())
+            if not mmap:
+                data = _little(array.array(code.decode(), data))
+            blocks.append(data)
+
+    if rows == 0 or cols == 0:
+        return Mat('')
+    if len(blocks) == 1 and not isinstance(blocks[0], _WideInts):
+        if mmap:
+            return Mat(ArrayStorage(rows, cols, blocks[0], mapped),
+                       field=field, title=title)
+        flat = blocks[0].tolist()
+        return Mat([flat[k:k+cols] for k in range(0, count, cols)],
+                   field=field, title=title)
+    ret = MatView(_FileStorage(rows, cols, *blocks), field, title)
+    if not mmap:
+        ret._modified()
+    return ret
+
+class _WideInts(object):
+    """
+    The ints of a block too wide for int64, read on demand.
+    """
+    __slots__ = ('_data', '_width')
+
+    def __init__(self, data, width):
+        self._data = data
+        self._width = width
+
+    def __len__(self):
+        return len(self._data) // self._width
+
+    def __getitem__(self, index):
+        w = self._width
+        return int.from_bytes(self._data[index*w:(index+1)*w], 'little',
+                              signed=True)
+
+class _FileStorage(object):
+    """
+    Entries of a MatView read from blocks of a file, ints or
+    Rats built from numerators and denominators when they are read.
+    """
+    __slots__ = ('_rows', '_cols', '_nums', '_dens', 'owner')
+
+    def __init__(self, rows, cols, nums, dens=None):
+        self._rows = rows
+        self._cols = cols
+        self._nums = nums
+        self._dens = dens
+        self.owner = None
+
+    def __len__(self):
+        return self._rows
+
+    def width(self):
+        return self._cols
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError('Row index out of range.')
+        return _ViewRow(self, index)
+
+    def __iter__(self):
+        return (self[i] for i in range(self._rows))
+
+    def get(self, i, j):
+        k = i * self._cols + j
+        num = self._nums[k]
+        if self._dens == None:
+            return num
+        den = self._dens[k]
+        return num if den == 0 else rational.Rat(num, den)
+
+    def row(self, i):
+        return [self.get(i, j) for j in range(self._cols)]
+
+# text files--------------------------------------------------
+
+# the types a column of text is read as, from the narrowest
+_PARSERS = (int, float, rational.Rat, complex)
+
+def _widen(kind, text):
+    """
+    Returns the first kind after kind whose parser reads text, and
+    the value read.
+    """
+    for k in range(kind + 1, len(_PARSERS) - 1):
+        try:
+            return k, _PARSERS[k](text)
+        except ValueError:
+            pass
+    return len(_PARSERS) - 1, complex(text)
+
+def _read_lines(lines, rows=0, cols=0, field=None):
+    """
+    -> (list of list, field)
+
+    Parse the lines of a matrix written as for Mat(str). With no field
+    every column is read as the narrowest of int, float, Rat and
+    complex holding all its entries: a line is parsed with the types
+    of its columns so far, and a column is converted once when an
+    entry needs a wider type. The field becomes Rat if a column does.
+    """
+    data, b = [], []
+    kinds, bkind = [], 0
+    parse = field
+    blank = 0
+    append_b = False
+    for line in lines:
+        coef = line.rsplit(';', 1)
+        tokens = coef[0].split()
+        if tokens == [] and len(coef) == 1:
+            # blank lines only count between rows, as in Mat(str)
+            if data:
+                blank += 1
+            continue
+        if blank:
+            data.extend([] for i in range(blank))
+            b.extend([None] * blank)
+            blank = 0
+
+        if field != None:
+            row = list(map(field, tokens))
+        else:
+            if len(tokens) > len(kinds):
+                kinds.extend([0] * (len(tokens) - len(kinds)))
+                parse = _PARSERS[kinds[0]] if len(set(kinds)) == 1 else None
+            try:
+                if parse != None:
+                    row = list(map(parse, tokens))
+                else:
+                    row = [_PARSERS[k](t) for k, t in zip(kinds, tokens)]
+            except ValueError:
+                row = []
+                for j, t in enumerate(tokens):
+                    try:
+                        row.append(_PARSERS[kinds[j]](t))
+                    except ValueError:
+                        kinds[j], value = _widen(kinds[j], t)
+                        conv = _PARSERS[kinds[j]]
+                        for r in data:
+                            if j < len(r):
+                                r[j] = conv(r[j])
+                        row.append(value)
+                parse = _PARSERS[kinds[0]] if len(set(kinds)) == 1 else None
+        data.append(row)
+
+        if len(coef) == 2:
+            append_b = True
+            if field != None:
+                b.append(field(coef[1]))
+                continue
+            try:
+                b.append(_PARSERS[bkind](coef[1]))
+            except ValueError:
+                bkind, value = _widen(bkind, coef[1])
+                b = [x if x == None else _PARSERS[bkind](x) for x in b]
+                b.append(value)
+        else:
+            b.append(None)
+
+    cols = max([cols] + [len(r) for r in data])
+    if field == None:
+        zeros = [_PARSERS[k](0) for k in kinds]
+        zeros.extend([0] * (cols - len(zeros)))
+        bzero = _PARSERS[bkind](0)
+        if rational.Rat in (_PARSERS[k] for k in kinds + [bkind]):
+            field = rational.Rat
+    else:
+        zeros = [field(0)] * cols
+        bzero = field(0)
+    if len(data) < rows:
+        data.extend([] for i in range(rows - len(data)))
+        b.extend([None] * (rows - len(b)))
+    for r, x in zip(data, b):
+        r.extend(zeros[len(r):])
+        if append_b:
+            r.append(bzero if x == None else x)
+    return data, field
+
+# pivoting----------------------------------------------------
+
+# the pivots _simplify() picks, used by the 'gauss' methods:
+#   'ones'      1 or -1 when there is one or two rows make it, else
+#               the first nonzero entry. The printed outputs of
+#               to_stair() and solve() are written in this way.
+#   'partial'   the largest entry of the column.
+#   'complete'  the largest entry left.
+#   'rook'      an entry largest in its row and its column, found by
+#               searching them in turn.
+#   'bitsize'   the Rat of the column with the fewest bits, which
+#               keeps the sizes of exact entries down.
+#   'markowitz' the entry making the least fill-in on sparse input,
+#               (row count - 1) * (column count - 1), among the entries
+#               within a factor 10 of their column's largest for
+#               floats.
+# see benchmark.py for how they compare.
+PIVOT = 'ones'
+
+_PIVOTS = ('ones', 'partial', 'complete', 'rook', 'bitsize', 'markowitz')
+
+def _bits(x):
+    if isinstance(x, rational.Rat):
+        return x.num.bit_length() + x.den.bit_length()
+    if isinstance(x, int):
+        return abs(x).bit_length()
+    return 0
+
+def _largest(values):
+    """
+    Returns the index of the largest abs of values if it isn't 0.
+    """
+    best, big = None, 0
+    for i, x in enumerate(values):
+        if abs(x) > big:
+            best, big = i, abs(x)
+    return best
+
+def _choose_pivot(mat, pivot, col, target, last):
+    """
+    -> (row, col) or None
+
+    Returns the pivot of mat chosen by the strategy pivot among the
+    rows from target and the columns from col to last (only col if
+    last == None), or None if they are all zero.
+    """
+    rows = range(target, mat.rows())
+    if last == None or col >= last or pivot in ('partial', 'bitsize'):
+        cols = range(col, col+1)
+    else:
+        cols = range(col, last)
+
+    if pivot == 'partial':
+        r = _largest(mat[r][col] for r in rows)
+        return None if r == None else (target + r, col)
+
+    elif pivot == 'bitsize':
+        best = None
+        for r in rows:
+            x = mat[r][col]
+            if x != 0 and (best == None or _bits(x) < size):
+                best, size = r, _bits(x)
+        return None if best == None else (best, col)
+
+    elif pivot == 'complete':
+        best, big = None, 0
+        for r in rows:
+            row = mat[r]
+            for c in cols:
+                if abs(row[c]) > big:
+                    best, big = (r, c), abs(row[c])
+        return best
+
+    elif pivot == 'rook':
+        for c in cols:
+            r = _largest(mat[r][c] for r in rows)
+            if r != None:
+                break
+        else:
+            return None
+        r += target
+        while True:
+            c2 = col + _largest(mat[r][c] for c in cols)
+            if abs(mat[r][c2]) <= abs(mat[r][c]):
+                return r, c
+            c = c2
+            r2 = target + _largest(mat[r][c] for r in rows)
+            if abs(mat[r2][c]) <= abs(mat[r][c]):
+                return r, c
+            r = r2
+
+    elif pivot == 'markowitz':
+        nonzero = [(r, c) for r in rows for c in cols if mat[r][c] != 0]
+        if nonzero == []:
+            return None
+        row_count, col_count, col_max = {}, {}, {}
+        for r, c in nonzero:
+            row_count[r] = row_count.get(r, 0) + 1
+            col_count[c] = col_count.get(c, 0) + 1
+            col_max[c] = max(col_max.get(c, 0), abs(mat[r][c]))
+        exact = mat._is_exact()
+        best, cost = None, None
+        for r, c in nonzero:
+            if not exact and abs(mat[r][c]) < 0.1 * col_max[c]:
+                continue
+            k = (row_count[r] - 1) * (col_count[c] - 1)
+            if cost == None or k < cost:
+                best, cost = (r, c), k
+        return best
+
+# exact elimination-------------------------------------------
+
+def _rat(num, den):
+    """
+    Returns num/den as a reduced Rat, den is a non-zero int.
+    """
+    if den < 0:
+        num, den = -num, -den
+    return rational.Rat(num, den).reduce()
+
+def _integer_rows(mat):
+    """
+    Scale every row of an int/Rat matrix to integers by the lcm of
+    its denominators. Returns the rows and the product of scales.
+    """
+    from math import gcd
+    rows = []
+    scale = 1
+    for row in mat:
+        row = [x if isinstance(x, (int, rational.Rat)) else rational.Rat(x)
+               for x in row]
+        den = 1
+        for x in row:
+            if isinstance(x, rational.Rat):
+                den = den * x.den // gcd(den, x.den)
+        rows.append([x * den if isinstance(x, int) else x.num * (den // x.den)
+                     for x in row])
+        scale *= den
+    return rows, scale
+
+def _find_pivot(a, k, col, cols, swap, vars):
+    """
+    Help _bareiss() and _eliminate_mod() to find the next pivot in
+    a[k:], starting from col. Returns (row, col) or None.
+
+    If swap == True, a column with only 0 left is swapped with the
+    last usable one, like _simplify() does, and the swaps are done
+    on vars too.
+    """
+    n = len(a)
+    width = len(a[0]) if n > 0 else 0
+    while col < cols:
+        for p in range(k, n):
+            if a[p][col] != 0:
+                return p, col
+        c = None
+        if swap:
+            for c in range(min(width-2, cols-1), col, -1):
+                if any(a[r][c] != 0 for r in range(k, n)):
+                    break
+            else:
+                c = None
+        if c == None:
+            col += 1
+        else:
+            for row in a:
+                row[col], row[c] = row[c], row[col]
+            if vars != None:
+                vars[col], vars[c] = vars[c], vars[col]
+    return None
+
+def _bareiss(a, cols, swap=False, vars=None):
+    """
+    Fraction-free Gauss elimination on a list of int rows, in place.
+    Only the first cols columns are used as pivots. Every division
+    is exact, so the numbers never grow beyond the minors of a.
+    See _find_pivot() for swap and vars.
+
+    Returns the list of pivot columns and the sign of row swaps.
+    The last pivot is the leading minor of the row-swapped a.
+    """
+    n = len(a)
+    prev = 1
+    sign = 1
+    pivots = []
+    k = col = 0
+    while k < n:
+        found = _find_pivot(a, k, col, cols, swap, vars)
+        if found == None:
+            break
+        p, col = found
+
+        if p != k:
+            a[p], a[k] = a[k], a[p]
+            sign = -sign
+        pivot_row = a[k]
+        pivot = pivot_row[col]
+        rest = pivot_row[col+1:]
+        for r in range(k+1, n):
+            row = a[r]
+            f = row[col]
+            row[col+1:] = [(pivot * x - f * y) // prev
+                           for x, y in zip(row[col+1:], rest)]
+            row[col] = 0
+        prev = pivot
+        pivots.append(col)
+        k += 1
+        col += 1
+    return pivots, sign
+
+def _eliminate_mod(a, p, cols, swap=False, vars=None, reduce=False):
+    """
+    Gauss elimination of int rows modulo the prime p, in place.
+    Pivots are scaled to 1 and cleared below, and above too if
+    reduce == True. Pivots are found by _find_pivot().
+
+    Returns the list of pivot columns and the product of the pivots
+    times the sign of row swaps, which is det modulo p when a is
+    square and all its columns are pivots.
+    """
+    n = len(a)
+    det = 1
+    pivots = []
+    k = col = 0
+    while k < n:
+        found = _find_pivot(a, k, col, cols, swap, vars)
+        if found == None:
+            break
+        r, col = found
+        if r != k:
+            a[r], a[k] = a[k], a[r]
+            det = -det
+
+        pivot_row = a[k]
+        det = det * pivot_row[col] % p
+        inv = pow(pivot_row[col], p-2, p)
+        pivot_row[col:] = [x * inv % p for x in pivot_row[col:]]
+        rest = pivot_row[col:]
+        for r in (range(n) if reduce else range(k+1, n)):
+            row = a[r]
+            f = row[col]
+            if f != 0 and r != k:
+                row[col:] = [(x - f * y) % p for x, y in zip(row[col:], rest)]
+        pivots.append(col)
+        k += 1
+        col += 1
+    return pivots, det % p
+
+# the rows shared by the workers of _map_residues()
+_residue_rows = None
+
+def _residue_init(rows):
+    global _residue_rows
+    _residue_rows = rows
+
+def _residue(p, kind, cols, rows=None):
+    """
+    The work done for one prime of a multi-modular computation, on
+    the int rows given to _map_residues().
+    """
+    a = [[x % p for x in row] for row in (rows or _residue_rows)]
+    if kind == 'det':
+        pivots, det = _eliminate_mod(a, p, cols)
+        return det if len(pivots) == len(a) else 0
+    elif kind == 'rank':
+        return len(_eliminate_mod(a, p, cols)[0])
+    else: # kind == 'solve'
+        vars = list(range(cols))
+        pivots, det = _eliminate_mod(a, p, cols, swap=True, vars=vars,
+                                     reduce=True)
+        r = len(pivots)
+        consistent = all(row[-1] == 0 for row in a[r:])
+        return r, consistent, tuple(vars), [row[r:] for row in a[:r]]
+
+def _map_residues(rows, primes, kind, cols, workers=None):
+    """
+    Returns [_residue(p, kind, cols) for p in primes]. If workers is
+    given, the primes are shared by a pool of that many processes,
+    each one gets the rows only once.
+    """
+    if not workers:
+        return [_residue(p, kind, cols, rows) for p in primes]
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    with ProcessPoolExecutor(workers, initializer=_residue_init,
+                             initargs=(rows,)) as pool:
+        return list(pool.map(partial(_residue, kind=kind, cols=cols),
+                             primes))
+
+def _modular_det(mat, workers=None):
+    """
+    Returns det of mat, computed modulo enough primes to rebuild it
+    with the Chinese remainder theorem.
+    """
+    a, scale = _integer_rows(mat)
+    primes = modular.primes_above(2 * modular.hadamard_bound(a))
+    dets = _map_residues(a, primes, 'det', mat.cols(), workers)
+    det = modular.crt(dets, primes)
+    return det if scale == 1 else _rat(det, scale)
+
+def _modular_rank(mat, cols, workers=None):
+    """
+    Returns rank of the first cols columns of mat. A prime can only
+    give a smaller rank, so the largest one wins. There are enough
+    primes for one of them not to divide the minor that counts.
+    """
+    a, scale = _integer_rows(mat)
+    primes = modular.primes_above(modular.hadamard_bound(a))
+    return max(_map_residues(a, primes, 'rank', cols, workers))
+
+def _modular_rowsimp(mat, vars, workers=None):
+    """
+    Same as Mat._bareiss_rowsimp(), but the row-simplified matrix is
+    computed modulo primes, and rebuilt by rational reconstruction.
+    More primes are taken until the result checks out.
+    """
+    a, scale = _integer_rows(mat)
+    cols = mat.cols()
+    bound = modular.hadamard_bound(a)
+    count = len(modular.primes_above(bound))
+    while True:
+        primes = modular.primes(count)
+        results = _map_residues(a, primes, 'solve', cols-1, workers)
+        r = max(res[0] for res in results)
+        if not all(res[1] for res in results if res[0] == r):
+            return None
+
+        # unlucky primes give a smaller rank or other columns
+        good = [res[2] for res in results if res[0] == r]
+        order = max(set(good), key=good.count)
+        picked = [(p, res[3]) for p, res in zip(primes, results)
+                  if res[0] == r and res[2] == order]
+        m = 1
+        for p, block in picked:
+            m *= p
+
+        rows = []
+        for i in range(r):
+            row = [None] * r
+            for j in range(cols - r):
+                x = modular.crt([block[i][j] for p, block in picked],
+                                [p for p, block in picked])
+                q = modular.rational_reconstruction(x, m)
+                if q == None:
+                    break
+                row.append(_rat(*q))
+            else:
+                rows.append(row)
+                continue
+            break
+        else:
+            if _check_rowsimp(a, order, rows, r):
+                vars[:] = order
+                return rows, r
+        count *= 2
+
+def _check_rowsimp(a, order, rows, r):
+    """
+    Returns True if every column j >= r of a, with columns in the
+    given order, is rows[.][j] times the first r columns.
+    """
+    from math import gcd
+    for j in range(r, len(order) + 1):
+        column = [rows[i][j] for i in range(r)]
+        den = 1
+        for x in column:
+            den = den * x.den // gcd(den, x.den)
+        coef = [x.num * (den // x.den) for x in column]
+        c = order[j] if j < len(order) else j
+        for row in a:
+            if sum(row[order[i]] * coef[i] for i in range(r)) != row[c] * den:
+                return False
+    return True
+
+# randomized rank---------------------------------------------
+
+# the default chance of a wrong answer from rank(method='random') and
+# is_full_rank(), 0 asks for the exact answer
+RANDOM_ERROR = 2.0**-40
+
+# the random primes are drawn from [2**30, 2**31), there are more than
+# 5 * 10**7 of them
+_PRIME_BITS = 30
+_PRIME_COUNT = 5 * 10**7
+
+def _random_prime():
+    """
+    Returns a random prime from [2**30, 2**31).
+    """
+    import random
+    while True:
+        p = random.randrange(2**_PRIME_BITS + 1, 2**(_PRIME_BITS+1), 2)
+        if modular.is_prime(p):
+            return p
+
+def _random_trials(a, error):
+    """
+    Returns how many random primes make the chance below error that
+    every one of them divides a given nonzero minor of the int rows a.
+    """
+    from math import ceil, log
+    # the minor is below the Hadamard bound, so it has at most
+    # bits // 30 prime factors from the range
+    bits = modular.hadamard_bound(a).bit_length()
+    miss = (bits // _PRIME_BITS + 1) / _PRIME_COUNT
+    if miss >= 1:
+        raise ValueError('The entries are too large for random primes.')
+    return max(1, ceil(log(error) / log(miss)))
+
+def _rank_mod(a, p, cols, need=None):
+    """
+    Returns rank of the first cols columns of the int rows a modulo
+    the prime p, a is left untouched. If need is given, it stops as
+    soon as the rank is known to be below need, and returns less.
+    """
+    n = len(a)
+    if _np != None and NUMPY_CUTOFF != None and max(n, cols) >= NUMPY_CUTOFF:
+        return _rank_mod_numpy(a, p, cols, need)
+    a = [[x % p for x in row[:cols]] for row in a]
+    k = 0
+    for col in range(cols):
+        if k == n or need != None and k + cols - col < need:
+            break
+        for r in range(k, n):
+            if a[r][col] != 0:
+                break
+        else:
+            continue
+        a[r], a[k] = a[k], a[r]
+        pivot_row = a[k]
+        inv = pow(pivot_row[col], p-2, p)
+        rest = [x * inv % p for x in pivot_row[col+1:]]
+        for row in a[k+1:]:
+            f = row[col]
+            if f != 0:
+                row[col+1:] = [(x - f * y) % p
+                               for x, y in zip(row[col+1:], rest)]
+        k += 1
+    return k
+
+def _rank_mod_numpy(a, p, cols, need):
+    """
+    Same as _rank_mod(), by NumPy on int64: p < 2**31 keeps the
+    products below 2**62.
+    """
+    try:
+        m = _np.array([row[:cols] for row in a], dtype=_np.int64) % p
+    except OverflowError:
+        m = _np.array([[x % p for x in row[:cols]] for row in a],
+                      dtype=_np.int64)
+    n = len(a)
+    k = 0
+    for col in range(cols):
+        if k == n or need != None and k + cols - col < need:
+            break
+        nonzero = _np.flatnonzero(m[k:, col])
+        if len(nonzero) == 0:
+            continue
+        r = k + int(nonzero[0])
+        if r != k:
+            m[[k, r]] = m[[r, k]]
+        inv = pow(int(m[k, col]), p-2, p)
+        rest = m[k, col+1:] * inv % p
+        below = m[k+1:]
+        f = below[:, col].copy()
+        below[:, col+1:] -= _np.outer(f, rest)
+        below[:, col+1:] %= p
+        k += 1
+    return k
+
+def _random_rank(mat, cols, error, need=None):
+    """
+    Returns rank of the first cols columns of mat, or less with a
+    chance below error, from elimination modulo random primes. A
+    prime can only give a smaller rank, so the largest one wins and
+    the first one reaching min(rows, cols) is the last. need is
+    passed to _rank_mod().
+    """
+    a, scale = _integer_rows(mat)
+    full = min(len(a), cols)
+    rank = 0
+    for i in range(_random_trials(a, error)):
+        rank = max(rank, _rank_mod(a, _random_prime(), cols, need))
+        if rank == full:
+            break
+    return rank
+
+# polynomials--------------------------------------------------
+
+def _berkowitz(a):
+    """
+    Returns the coefficients [1, c1, ..., cn] of det(x*E - a), from
+    the highest degree down. Only +, - and * are done on the entries
+    (Berkowitz's algorithm), which takes O(n**4) of them.
+    """
+    from operator import mul
+    n = len(a)
+    p = [1]
+    for i in range(n):
+        # first column of the Toeplitz matrix of step i:
+        # 1, -a_ii, -R*C, -R*A*C, ..., -R*A**(i-1)*C
+        r = a[i][:i]
+        v = [a[j][i] for j in range(i)]
+        t = [1, -a[i][i]]
+        for k in range(i):
+            t.append(-sum(map(mul, r, v)))
+            if k < i-1:
+                v = [sum(map(mul, row[:i], v)) for row in a[:i]]
+        p = [sum(t[j-l] * p[l] for l in range(max(0, j-i-1), min(j, i)+1))
+             for j in range(i+2)]
+    return p
+
+def _hessenberg_charpoly(h):
+    """
+    Returns the coefficients [1, c1, ..., cn] of det(x*E - h) for
+    the upper Hessenberg h, from the highest degree down, by the
+    recurrence on its leading blocks: O(n**3).
+    """
+    # polys[k] is the polynomial of the leading k x k block, from
+    # the lowest degree up
+    polys = [[1]]
+    for k in range(len(h)):
+        new = [0] + polys[-1]
+        for t, c in enumerate(polys[-1]):
+            new[t] -= h[k][k] * c
+        prod = 1
+        for i in range(k-1, -1, -1):
+            prod *= h[i+1][i]
+            f = prod * h[i][k]
+            for t, c in enumerate(polys[i]):
+                new[t] -= f * c
+        polys.append(new)
+    return polys[-1][::-1]
+
+def _faddeev(a):
+    """
+    Returns the coefficients [1, c1, ..., cn] of det(x*E - a), from
+    the highest degree down, by the Faddeev-LeVerrier recurrence:
+    M = a * M + c * E, c = -trace(a * M) / k. It takes n products,
+    and divides by 1..n, exactly for ints.
+    """
+    n = len(a)
+    coefs = [1]
+    m = None
+    for k in range(1, n+1):
+        if m == None:
+            am = [list(row) for row in a]
+        else:
+            for i in range(n):
+                m[i][i] += coefs[-1]
+            am = _matmul(a, m)
+        t = sum(am[i][i] for i in range(n))
+        coefs.append(-t // k if isinstance(t, int) else -t / k)
+        m = am
+    return coefs
+
+def _poly(coefs):
+    """
+    Returns the poly.Poly with the coefficients coefs, from the
+    highest degree down.
+    """
+    from poly import Poly, Term
+    ret = Poly(0)
+    deg = len(coefs) - 1
+    for i, c in enumerate(coefs):
+        if c != 0:
+            ret = ret + Poly(Term(c, deg-i))
+    return ret
+
+def _coefs(p, n):
+    """
+    Returns the coefficients of x**0, ..., x**(n-1) in the Poly p.
+    """
+    ret = [0] * n
+    for t in p.terms():
+        if t.exp < n:
+            ret[t.exp] += t.coef
+    return ret
+
+def _exact_int(v):
+    """
+    Returns v as an int if it is a whole Rat, v itself otherwise.
+    """
+    if isinstance(v, rational.Rat):
+        v = v.reduce()
+        if v.den == 1 and isinstance(v.num, int):
+            return v.num
+    return v
+
+def _mod_entries(mat, modulo):
+    """
+    Returns mat with every entry taken modulo the int modulo, or mat
+    itself if modulo is None.
+    """
+    if modulo == None:
+        return mat
+    return Mat(lambda i,j: mat[i][j] % modulo, mat.rows(), mat.cols(),
+               field=mat._field)
+
+# multiplication----------------------------------------------
+
+# number of columns of the right operand kept hot at a time
+MUL_TILE = 64
+
+def _scale_rat(vectors):
+    """
+    Scale each vector of ints and Rats to ints by the lcm of its
+    denominators. Returns the int vectors, the scales, and which
+    vectors held a Rat; or None if something else is found.
+    """
+    from math import gcd
+    ints, dens, has_rat = [], [], []
+    for vec in vectors:
+        den = 1
+        rat = False
+        for x in vec:
+            if type(x) is rational.Rat and type(x.num) is int:
+                den = den * x.den // gcd(den, x.den)
+                rat = True
+            elif type(x) is not int:
+                return None
+        ints.append([x * den if type(x) is int else x.num * (den // x.den)
+                     for x in vec])
+        dens.append(den)
+        has_rat.append(rat)
+    return ints, dens, has_rat
+
+def _matmul(a, b):
+    """
+    Returns the rows of a * b. With WORKERS set, row blocks of large
+    products are shared by a process pool. Otherwise square products
+    of ints (or Rats) of at least STRASSEN_CUTOFF rows go through
+    _strassen(), the others through _mul_tiled().
+
+    Matrices of ints and Rats are scaled to ints first, so there is
+    only one Rat to build (and reduce) for each entry.
+    """
+    rows = [list(row) for row in a]
+    cols = [list(col) for col in zip(*b)]
+
+    scaled = False
+    if any(type(x) is rational.Rat for row in rows for x in row) or\
+            any(type(x) is rational.Rat for col in cols for x in col):
+        r, c = _scale_rat(rows), _scale_rat(cols)
+        if r != None and c != None:
+            scaled = True
+            (rows, row_dens, row_rat), (cols, col_dens, col_rat) = r, c
+
+    n = len(rows)
+    out = _mul_parallel(rows, cols) if _parallel(n) else None
+    if out == None:
+        if STRASSEN_CUTOFF != None and n >= STRASSEN_CUTOFF and\
+                n == len(cols) == len(cols[0]) and (scaled or
+                all(type(x) is int for vec in rows + cols for x in vec)):
+            out = _strassen(rows, [list(row) for row in zip(*cols)])
+        else:
+            out = _mul_tiled(rows, cols)
+
+    if scaled:
+        for i, out_row in enumerate(out):
+            for j in range(len(out_row)):
+                if row_rat[i] or col_rat[j]:
+                    out_row[j] = _rat(out_row[j], row_dens[i] * col_dens[j])
+    return out
+
+def _mul_tiled(rows, cols):
+    """
+    Classical kernel, returns the rows of a * b, given the rows of a
+    and the columns of b. The columns are taken MUL_TILE at a time so
+    that they stay in cache while every row of a goes over them. The
+    sum of each entry is done in the same order as
+    sum(a[i][k] * b[k][j] for k in ...).
+    """
+    from operator import mul
+    n, m = len(rows), len(cols)
+    out = [[None] * m for i in range(n)]
+    for start in range(0, m, MUL_TILE):
+        tile = range(start, min(start + MUL_TILE, m))
+        for i in range(n):
+            row = rows[i]
+            out_row = out[i]
+            for j in tile:
+                out_row[j] = sum(map(mul, row, cols[j]))
+    return out
+
+# square int/Rat products from this size on use Strassen-Winograd,
+# None turns it off. The saving comes from the big int products, for
+# floats the classical kernel is faster in Python, see benchmark.py.
+STRASSEN_CUTOFF = 128
+
+def _add(x, y):
+    from operator import add
+    return [list(map(add, p, q)) for p, q in zip(x, y)]
+
+def _sub(x, y):
+    from operator import sub
+    return [list(map(sub, p, q)) for p, q in zip(x, y)]
+
+def _strassen(a, b, cutoff=None):
+    """
+    Strassen-Winograd multiplication of the square row lists a and
+    b: 7 half-size products and 15 additions per level, down to
+    cutoff (STRASSEN_CUTOFF by default) where _mul_tiled() is used.
+    An odd size is padded with one row and column of zeros.
+    """
+    if cutoff == None:
+        cutoff = STRASSEN_CUTOFF
+    n = len(a)
+    if n < max(cutoff, 2):
+        return _mul_tiled(a, [list(col) for col in zip(*b)])
+    if n % 2 == 1:
+        a = [row + [0] for row in a] + [[0] * (n+1)]
+        b = [row + [0] for row in b] + [[0] * (n+1)]
+        return [row[:n] for row in _strassen(a, b, cutoff)[:n]]
+
+    h = n // 2
+    a11 = [row[:h] for row in a[:h]]
+    a12 = [row[h:] for row in a[:h]]
+    a21 = [row[:h] for row in a[h:]]
+    a22 = [row[h:] for row in a[h:]]
+    b11 = [row[:h] for row in b[:h]]
+    b12 = [row[h:] for row in b[:h]]
+    b21 = [row[:h] for row in b[h:]]
+    b22 = [row[h:] for row in b[h:]]
+
+    s1 = _add(a21, a22)
+    s2 = _sub(s1, a11)
+    s3 = _sub(a11, a21)
+    s4 = _sub(a12, s2)
+    t1 = _sub(b12, b11)
+    t2 = _sub(b22, t1)
+    t3 = _sub(b22, b12)
+    t4 = _sub(t2, b21)
+
+    m1 = _strassen(a11, b11, cutoff)
+    m2 = _strassen(a12, b21, cutoff)
+    m3 = _strassen(s4, b22, cutoff)
+    m4 = _strassen(a22, t4, cutoff)
+    m5 = _strassen(s1, t1, cutoff)
+    m6 = _strassen(s2, t2, cutoff)
+    m7 = _strassen(s3, t3, cutoff)
+
+    u2 = _add(m1, m6)
+    u3 = _add(u2, m7)
+    c11 = _add(m1, m2)
+    c12 = _add(_add(u2, m5), m3)
+    c21 = _sub(u3, m4)
+    c22 = _add(u3, m5)
+    return [p + q for p, q in zip(c11, c12)] +\
+            [p + q for p, q in zip(c21, c22)]
+
+# lazy expressions--------------------------------------------
+
+class Expr(object):
+    """
+    A lazy matrix expression, from Mat.lazy(). The operators build a
+    DAG of Expr instead of Mats, sizes are checked at once. When the
+    value is needed, the DAG is worked out in one pass: +, - and the
+    scalings are fused, so each entry is computed where it is needed
+    without any temporary Mat; a chain of products is done in the
+    order needing the fewest multiplications. The Mats are read when
+    the expression is worked out, and the value is kept.
+
+    >>> a = Mat(lambda i,j: i+j, 3, 3)
+    >>> b = Mat(lambda i,j: i*j, 3, 3)
+    >>> x = a.lazy() + b.lazy() * 2 - a
+    >>> x[1]
+    [0, 2, 4]
+    >>> x
+    0 0 0
+    0 2 4
+    0 4 8
+    >>> (-x.trans() + x).force() == O(3)
+    True
+    >>> y = a.lazy() + b.lazy() * 2 - b
+    >>> a[2][2] = 100
+    >>> y[2][2]
+    104
+    >>> u, v = Mat(lambda i,j: 1, 20, 1), Mat(lambda i,j: j, 1, 20)
+    >>> c = u.lazy() * v * u
+    >>> c.chain()
+    '(A1 (A2 A3))'
+    >>> c[0][0], c.size()
+    (190, (20, 1))
+    """
+    def __init__(self, op, args, size, field=None):
+        # op is 'leaf', 'add', 'sub', 'neg', 'scale', 'div', 'mul' or
+        # 'trans', args are Expr or scalars, args of a leaf is (Mat,)
+        self._op = op
+        self._args = args
+        self._size = size
+        self._field = field
+        self._value = None
+
+    def _wrap(self, other):
+        if isinstance(other, Expr):
+            return other
+        if isinstance(other, Mat):
+            return other.lazy()
+        return None
+
+    def _same_field(self, other):
+        return self._field if self._field == other._field else None
+
+    # specials-------------------------------------------------
+
+    def __str__(self):
+        return str(self.force())
+
+    __repr__ = __str__
+
+    def __getitem__(self, index):
+        return self.force()[index]
+
+    def __call__(self, *args):
+        return self.force()(*args)
+
+    def __iter__(self):
+        return iter(self.force())
+
+    def __eq__(self, other):
+        if isinstance(other, Expr):
+            other = other.force()
+        return self.force() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __neg__(self):
+        return Expr('neg', (self,), self._size, self._field)
+
+    def __pos__(self):
+        return self
+
+    def __add__(self, other):
+        other = self._wrap(other)
+        if other is None:
+            return NotImplemented
+        if self._size != other._size:
+            raise ValueError('Matrixes for adding must have same size.')
+        return Expr('add', (self, other), self._size,
+                    self._same_field(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other = self._wrap(other)
+        if other is None:
+            return NotImplemented
+        if self._size != other._size:
+            raise ValueError('Matrixes for subtracting must have same size.')
+        return Expr('sub', (self, other), self._size,
+                    self._same_field(other))
+
+    def __rsub__(self, other):
+        other = self._wrap(other)
+        if other is None:
+            return NotImplemented
+        return other - self
+
+    def __mul__(self, other):
+        wrapped = self._wrap(other)
+        if wrapped is None:
+            return Expr('scale', (self, other), self._size, self._field)
+        if self._size[1] != wrapped._size[0]:
+            raise ValueError('cols of the first Mat must '
+                             'equals to rows of the second '
+                             'Mat when doing mul.')
+        return Expr('mul', (self, wrapped), (self._size[0], wrapped._size[1]),
+                    self._same_field(wrapped))
+
+    def __rmul__(self, other):
+        wrapped = self._wrap(other)
+        if wrapped is None:
+            return Expr('scale', (self, other), self._size, self._field)
+        return wrapped * self
+
+    def __truediv__(self, other):
+        if self._wrap(other) is not None:
+            return NotImplemented
+        return Expr('div', (self, other), self._size, self._field)
+
+    # Other Methods--------------------------------------------
+
+    def size(self):
+        return self._size
+
+    def rows(self):
+        return self._size[0]
+
+    def cols(self):
+        return self._size[1]
+
+    def trans(self):
+        """
+        -> Expr
+
+        Returns the lazy transpose of self.
+        """
+        return Expr('trans', (self,), self._size[::-1], self._field)
+
+    def force(self):
+        """
+        -> Mat
+
+        Works out the expression, the value is kept.
+        """
+        if self._value is None:
+            self._value = self._eval({})
+        return self._value
+
+    def chain(self):
+        """
+        -> str
+
+        Returns the order in which the product chain at the top of
+        self is done, its factors are A1, A2...
+        """
+        factors = self._factors()
+        split = _chain_order([f._size[0] for f in factors] +
+                             [factors[-1]._size[1]])
+
+        def order(i, j):
+            if i == j:
+                return 'A%d' % (i+1)
+            k = split[i][j]
+            return '(%s %s)' % (order(i, k), order(k+1, j))
+        return order(0, len(factors)-1)
+
+    def _factors(self):
+        """
+        Returns the factors of the product chain at the top of self.
+        """
+        if self._op != 'mul':
+            return [self]
+        return self._args[0]._factors() + self._args[1]._factors()
+
+    def _eval(self, memo):
+        """
+        Returns the value of self as a Mat. memo keeps the values of
+        the nodes worked out in this pass, shared nodes are done once.
+        """
+        if self._value is not None:
+            return self._value
+        if id(self) in memo:
+            return memo[id(self)]
+
+        op = self._op
+        if op == 'leaf':
+            ret = self._args[0]
+        elif op == 'trans':
+            ret = self._args[0]._eval(memo).trans()
+        elif op == 'mul':
+            factors = self._factors()
+            values = [f._eval(memo) for f in factors]
+            split = _chain_order([f._size[0] for f in factors] +
+                                 [factors[-1]._size[1]])
+
+            def product(i, j):
+                if i == j:
+                    return values[i]
+                k = split[i][j]
+                return product(i, k) * product(k+1, j)
+            ret = product(0, len(values)-1)
+        else:
+            # fused pass over the elementwise part of the DAG, its
+            # inputs are worked out first
+            inputs = {}
+            self._inputs(memo, inputs)
+            rows, cols = self._size
+            if rows == 0 or cols == 0:
+                ret = O(rows, cols, field=self._field)
+            else:
+                ret = Mat([self._row(i, inputs) for i in range(rows)],
+                          field=self._field)
+        memo[id(self)] = ret
+        return ret
+
+    def _inputs(self, memo, inputs):
+        """
+        Works out the nodes under the elementwise part of the DAG.
+        """
+        if self._op in ('add', 'sub', 'neg', 'scale', 'div'):
+            for arg in self._args:
+                if isinstance(arg, Expr):
+                    arg._inputs(memo, inputs)
+        elif id(self) not in inputs:
+            inputs[id(self)] = self._eval(memo)
+
+    def _row(self, i, inputs):
+        """
+        Returns row i of an elementwise node.
+        """
+        op = self._op
+        if id(self) in inputs:
+            return inputs[id(self)][i]
+        if op == 'neg':
+            return [-x for x in self._args[0]._row(i, inputs)]
+        if op == 'scale':
+            k = self._args[1]
+            return [x * k for x in self._args[0]._row(i, inputs)]
+        if op == 'div':
+            k = self._args[1]
+            return [x / k for x in self._args[0]._row(i, inputs)]
+        left = self._args[0]._row(i, inputs)
+        right = self._args[1]._row(i, inputs)
+        if op == 'add':
+            return [x + y for x, y in zip(left, right)]
+        return [x - y for x, y in zip(left, right)]
+
+def _chain_order(dims):
+    """
+    Matrix-chain order: factor i is dims[i] x dims[i+1]. Returns split,
+    the product of factors i..j is best done as (i..k) * (k+1..j) with
+    k = split[i][j].
+    """
+    n = len(dims) - 1
+    cost = [[0] * n for i in range(n)]
+    split = [[None] * n for i in range(n)]
+    for length in range(2, n+1):
+        for i in range(n - length + 1):
+            j = i + length - 1
+            cost[i][j] = None
+            for k in range(i, j):
+                c = cost[i][k] + cost[k+1][j] + dims[i] * dims[k+1] * dims[j+1]
+                if cost[i][j] == None or c < cost[i][j]:
+                    cost[i][j], split[i][j] = c, k
+    return split
+
+# numpy backend-----------------------------------------------
+
+# float Mats from this size on go through NumPy when it is installed,
+# None forces pure Python. Below it, the Python code is as fast and
+# keeps its own rounding.
+NUMPY_CUTOFF = 16
+
+def _use_numpy(*mats):
+    """
+    Returns True if the operation on mats can be done by NumPy.
+    """
+    if _np == None or NUMPY_CUTOFF == None:
+        return False
+    return max(max(m.size()) for m in mats) >= NUMPY_CUTOFF and\
+            all(not m.is_empty() and m._is_float() for m in mats)
+
+def _from_numpy(a, field=None):
+    """
+    Returns a Mat of the Python floats in the ndarray a.
+    """
+    return Mat(a.tolist(), field=field if field == float else None)
+
+def _numpy_solve(mat):
+    """
+    Help solve() with NumPy. Returns the X0 column, or None if the
+    system is not square with one solution.
+    """
+    n = mat.rows()
+    if mat.cols() != n + 1:
+        return None
+    a = mat.to_numpy()
+    if _np.linalg.matrix_rank(a[:, :n]) < n:
+        return None
+    x = _np.linalg.solve(a[:, :n], a[:, n])
+    return Mat([[v] for v in x.tolist()], title=('X0',))
+
+# parallel----------------------------------------------------
+
+# number of processes sharing large products and eliminations, None
+# keeps everything in this process. Set it to the number of cores:
+# matrix.WORKERS = 32
+WORKERS = None
+
+# products and eliminations with fewer rows stay in this process
+PARALLEL_CUTOFF = 64
+
+# width of the column blocks of the parallel LU
+LU_BLOCK = 32
+
+# (size, ProcessPoolExecutor), kept between calls
+_pool = None
+
+def _shutdown():
+    """
+    Stop the worker processes, at exit or once WORKERS changed.
+    """
+    global _pool
+    if _pool != None:
+        _pool[1].shutdown()
+        _pool = None
+
+atexit.register(_shutdown)
+
+def _parallel(rows):
+    """
+    Returns True if work on that many rows goes to the process pool.
+    """
+    if _pool != None and _pool[0] != WORKERS:
+        _shutdown()
+    return WORKERS != None and WORKERS > 1 and rows >= PARALLEL_CUTOFF
+
+def _executor():
+    global _pool
+    if _pool == None or _pool[0] != WORKERS:
+        from concurrent.futures import ProcessPoolExecutor
+        _shutdown()
+        _pool = (WORKERS, ProcessPoolExecutor(WORKERS))
+    return _pool[1]
+
+def _pack(rows):
+    """
+    Returns the rows as bytes to send to a worker: floats as doubles,
+    ints in the fewest bytes that hold them all, ints and Rats as two
+    such blocks of numerators and denominators. Returns None for
+    anything else.
+
+    >>> _unpack(_pack([[1, -2], [3, 2**70]]))
+    [[1, -2], [3, 1180591620717411303424]]
+    >>> _unpack(_pack([[rational.Rat(1, 3), 2]]))
+    [[1/3, 2]]
+    """
+    cols = len(rows[0]) if rows else 0
+    flat = [x for row in rows for x in row]
+    if all(type(x) is float for x in flat):
+        return 'd', cols, array.array('d', flat).tobytes()
+    if all(type(x) is int for x in flat):
+        width = max((x.bit_length() for x in flat), default=0) // 8 + 1
+        if width <= 8:
+            return 'q', cols, array.array('q', flat).tobytes()
+        return width, cols, b''.join(x.to_bytes(width, 'little', signed=True)
+                                     for x in flat)
+    if all(type(x) is int or type(x) is rational.Rat and type(x.num) is int
+           for x in flat):
+        # a den of 0 marks an int
+        return 'r', cols, _pack([[x if type(x) is int else x.num
+                                  for x in flat]]),\
+                          _pack([[0 if type(x) is int else x.den
+                                  for x in flat]])
+    return None
+
+def _unpack(blob):
+    """
+    Returns the rows packed by _pack().
+    """
+    code, cols = blob[:2]
+    if code == 'r':
+        flat = [n if d == 0 else rational.Rat(n, d)
+                for n, d in zip(_unpack(blob[2])[0], _unpack(blob[3])[0])]
+    elif code in ('d', 'q'):
+        flat = array.array(code, blob[2]).tolist()
+    else:
+        data = blob[2]
+        flat = [int.from_bytes(data[k:k+code], 'little', signed=True)
+                for k in range(0, len(data), code)]
+    if cols == 0:
+        return []
+    return [flat[k:k+cols] for k in range(0, len(flat), cols)]
+
+def _row_blocks(rows):
+    """
+    Splits rows into two blocks per worker.
+    """
+    size = max(1, -(-len(rows) // (2 * WORKERS)))
+    return [rows[k:k+size] for k in range(0, len(rows), size)]
+
+def _mul_block(a, b):
+    return _pack(_mul_tiled(_unpack(a), _unpack(b)))
+
+def _mul_parallel(rows, cols):
+    """
+    Returns _mul_tiled(rows, cols), by blocks of rows shared by the
+    process pool, or None if the entries can't be packed.
+    """
+    b = _pack(cols)
+    parts = _row_blocks(rows)
+    blocks = [_pack(block) for block in parts]
+    if b == None or None in blocks:
+        return None
+    out = []
+    results = _executor().map(_mul_block, blocks, [b] * len(blocks))
+    for block, result in zip(parts, results):
+        # a product of floats and big ints may not pack, it is redone
+        # here
+        out.extend(_unpack(result) if result != None
+                   else _mul_tiled(block, cols))
+    return out
+
+def _eliminate_rows(rows, p, col):
+    """
+    Subtract row[col] times p from each of the rows, in place, but
+    for the entries on col. Returns the rows.
+    """
+    for row in rows:
+        f = row[col]
+        for c in range(len(row)):
+            if c != col:
+                row[c] -= f * p[c]
+    return rows
+
+def _eliminate_block(block, pivot_row, col):
+    return _pack(_eliminate_rows(_unpack(block), _unpack(pivot_row)[0], col))
+
+def _eliminate_parallel(rows, pivot_row, col):
+    """
+    Help Mat.eliminate(): returns the rows minus row[col] times
+    pivot_row, worked out by the process pool; or None if the entries
+    can't be packed. The entries on col are left to the caller. A
+    block the worker cannot pack back, once ints and floats mix in
+    its rows, is redone here.
+
+    >>> import sys
+    >>> here = sys.modules[Mat.__module__]
+    >>> a = Mat(lambda i, j: (3*i + 5*j) % 7 + 9*(i == j), 12, 13)
+    >>> x = a.copy().solve(method='gauss')
+    >>> here.WORKERS, here.PARALLEL_CUTOFF = 2, 4
+    >>> a.copy().solve(method='gauss') == x
+    True
+    >>> here.WORKERS, here.PARALLEL_CUTOFF = None, 64
+    >>> here._shutdown()
+    """
+    p = _pack([pivot_row])
+    parts = _row_blocks(rows)
+    blocks = [_pack(block) for block in parts]
+    if p == None or None in blocks:
+        return None
+    out = []
+    results = _executor().map(_eliminate_block, blocks, [p] * len(blocks),
+                              [col] * len(blocks))
+    for block, result in zip(parts, results):
+        out.extend(_unpack(result) if result != None
+                   else _eliminate_rows([list(row) for row in block],
+                                        pivot_row, col))
+    return out
+
+def _lu_blocked(a):
+    """
+    Help LU(): right-looking LU of the square list a, in place, by
+    blocks of LU_BLOCK columns. Each block is factorized alone, then
+    the trailing rows get A22 -= L21 * U12 in one product, which
+    _matmul() shares among the workers.
+    Returns (a, perm, sign, singular) as LU keeps them.
+    """
+    n = len(a)
+    perm = list(range(n))
+    sign = 1
+    singular = False
+    for k0 in range(0, n, LU_BLOCK):
+        k1 = min(k0 + LU_BLOCK, n)
+        for k in range(k0, k1):
+            p = max(range(k, n), key=lambda r: abs(a[r][k]))
+            if a[p][k] == 0:
+                singular = True
+                continue
+            if p != k:
+                a[p], a[k] = a[k], a[p]
+                perm[p], perm[k] = perm[k], perm[p]
+                sign = -sign
+            pivot_row = a[k]
+            pivot = pivot_row[k]
+            for r in range(k+1, n):
+                row = a[r]
+                if row[k] != 0:
+                    f = row[k] / pivot
+                    row[k] = f
+                    for c in range(k+1, k1):
+                        row[c] -= f * pivot_row[c]
+        if k1 == n:
+            break
+
+        # U12 = L11**(-1) * A12
+        for k in range(k0, k1):
+            for r in range(k+1, k1):
+                f = a[r][k]
+                if f != 0:
+                    row, pivot_row = a[r], a[k]
+                    for c in range(k1, n):
+                        row[c] -= f * pivot_row[c]
+
+        # A22 -= L21 * U12
+        prod = _matmul([row[k0:k1] for row in a[k1:]],
+                       [row[k1:] for row in a[k0:k1]])
+        for row, sub in zip(a[k1:], prod):
+            row[k1:] = [x - y for x, y in zip(row[k1:], sub)]
+    return a, perm, sign, singular
+
+# factorizations----------------------------------------------
+
+class LU(object):
+    """
+    LU factorization with partial pivoting, P * A = L * U, where L
+    is unit lower triangular. L and U are kept in one square list,
+    _perm[i] is the row of A that became row i. With WORKERS set,
+    large matrices are factorized by blocks of LU_BLOCK columns, and
+    the trailing updates are products shared by the process pool.
+
+    >>> a = rMat('''
+    ... 2 1 1
+    ... 4 -6 0
+    ... -2 7 2''')
+    >>> f = a.lu()
+    >>> f.det()
+    -16
+    >>> f.solve([5, -2, 9])
+    [1, 1, 2]
+    >>> f.solve_many(Mat('''
+    ... 5 4
+    ... -2 4
+    ... 9 -2'''))
+      1 5/2
+      1   1
+      2  -2
+    >>> f.inv() * a == E(3)
+    True
+    >>> a.lu() is f
+    True
+    >>> a.pr(row=0, k=2).lu() is f
+    False
+    """
+    def __init__(self, mat):
+        if not mat.is_square():
+            raise ValueError('Expecting a square matrix.')
+
+        self.field_type = mat._field
+        n = mat.rows()
+        a = [[mat.field(x) for x in row] for row in mat]
+        perm = list(range(n))
+        sign = 1
+        singular = False
+
+        if _parallel(n):
+            self._a, self._perm, self._sign, self.singular =\
+                    _lu_blocked(a)
+            return
+
+        for k in range(n):
+            # pick the largest pivot in this column
+            p = max(range(k, n), key=lambda r: abs(a[r][k]))
+            if a[p][k] == 0:
+                singular = True
+                continue
+            if p != k:
+                a[p], a[k] = a[k], a[p]
+                perm[p], perm[k] = perm[k], perm[p]
+                sign = -sign
+
+            pivot_row = a[k]
+            pivot = pivot_row[k]
+            for r in range(k+1, n):
+                row = a[r]
+                if row[k] != 0:
+                    f = row[k] / pivot
+                    row[k] = f
+                    for c in range(k+1, n):
+                        row[c] -= f * pivot_row[c]
+
+        self._a = a
+        self._perm = perm
+        self._sign = sign
+        self.singular = singular
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def size(self):
+        return len(self._a)
+
+    def det(self):
+        """
+        -> field
+
+        Returns determinant of the factorized matrix.
+        """
+        if self.singular:
+            return self._field(0)
+        ret = self._field(self._sign)
+        for i in range(len(self._a)):
+            ret *= self._a[i][i]
+        return ret
+
+    def solve(self, b, trans=False):
+        """
+        -> list
+
+        Returns x for which A * x == b, or A^T * x == b if trans is
+        True. b is a sequence of len(A) numbers.
+        """
+        if self.singular:
+            raise ValueError("This matrix is irreversible!")
+        a = self._a
+        n = len(a)
+        if len(b) != n:
+            raise ValueError('Expecting a vector of length %d.' % n)
+
+        if not trans:
+            # L * y = P * b, then U * x = y
+            y = [self._field(b[p]) for p in self._perm]
+            for i in range(n):
+                row = a[i]
+                y[i] -= sum(row[j] * y[j] for j in range(i))
+            for i in range(n-1, -1, -1):
+                row = a[i]
+                y[i] = (y[i] - sum(row[j] * y[j] for j in range(i+1, n)))\
+                        / row[i]
+            return y
+
+        # U^T * z = b, then L^T * w = z, x = P^T * w
+        z = [self._field(v) for v in b]
+        for i in range(n):
+            z[i] = (z[i] - sum(a[j][i] * z[j] for j in range(i))) / a[i][i]
+        for i in range(n-1, -1, -1):
+            z[i] -= sum(a[j][i] * z[j] for j in range(i+1, n))
+        x = [None] * n
+        for i, p in enumerate(self._perm):
+            x[p] = z[i]
+        return x
+
+    def solve_many(self, B, trans=False):
+        """
+        -> Mat
+
+        Returns X for which A * X == B, every column of B is solved
+        with the same factorization.
+        """
+        cols = [self.solve([row[j] for row in B], trans)
+                for j in range(B.cols())]
+        return Mat(lambda i,j: cols[j][i], len(self._a), B.cols(),
+                   field=self.field_type)
+
+    def inv(self):
+        """
+        -> Mat
+
+        Returns inverse of the factorized matrix.
+        """
+        return self.solve_many(E(len(self._a), field=self.field_type))
+
+    def update(self, u, v=None):
+        """
+        -> Woodbury
+
+        Returns the factorization of A + u * v^T, see Woodbury.
+        """
+        return Woodbury(self, u, v)
+
+# columns of a panel of the blocked Householder QR, the trailing
+# columns are updated once per panel by products
+QR_BLOCK = 16
+
+def _householder(x):
+    """
+    Returns (v, tau, beta) with (I - tau * v * v^T) * x == [beta, 0..],
+    v[0] == 1.
+    """
+    alpha = x[0]
+    sigma = sum(t * t for t in x[1:])
+    if sigma == 0:
+        return [1.0] + [0.0] * (len(x) - 1), 0.0, alpha
+    norm = (alpha * alpha + sigma) ** 0.5
+    beta = -norm if alpha >= 0 else norm
+    scale = 1 / (alpha - beta)
+    return [1.0] + [t * scale for t in x[1:]], (beta - alpha) / beta, beta
+
+def _reflect(rows, v, tau, lo, hi):
+    """
+    Apply I - tau * v * v^T to the columns lo..hi of rows.
+    """
+    if tau == 0:
+        return
+    w = [0.0] * (hi - lo)
+    for vi, row in zip(v, rows):
+        if vi != 0:
+            w = [p + vi * q for p, q in zip(w, row[lo:hi])]
+    for vi, row in zip(v, rows):
+        if vi != 0:
+            t = tau * vi
+            row[lo:hi] = [q - t * p for p, q in zip(w, row[lo:hi])]
+
+class QR(object):
+    """
+    Householder QR factorization, A * P = Q * R, with Q orthogonal
+    and R upper triangular, in floats. Q is kept as its reflectors
+    I - tau * v * v^T. Columns are processed by panels of QR_BLOCK,
+    the rest of the matrix being updated by one product per panel
+    (compact WY form). With pivoting, the column of largest norm is
+    taken at each step (P is perm), so the diagonal of R decreases
+    and reveals the rank; this goes column by column.
+
+    >>> a = Mat('''
+    ... 1 1
+    ... 1 2
+    ... 1 3''')
+    >>> f = a.qr()
+    >>> max(abs(x) for row in f.q() * f.r() - a for x in row) < 1e-12
+    True
+    >>> [round(x, 10) for x in a.lstsq([1, 2, 2])]
+    [0.6666666667, 0.5]
+    >>> f = Mat('1 2 3\\n2 4 6\\n1 0 1').qr(pivoting=True)
+    >>> f.rank, f.perm
+    (2, [2, 1, 0])
+    """
+    def __init__(self, mat, pivoting=False):
+        m, n = mat.size()
+        a = [[float(mat.field(x)) for x in row] for row in mat]
+        k_max = min(m, n)
+        self._m, self._n = m, n
+        self._v, self._tau = [], []
+        self.perm = list(range(n))
+        self.pivoting = pivoting
+
+        if pivoting:
+            norms = [sum(row[j] ** 2 for row in a) for j in range(n)]
+            first = list(norms)
+            for k in range(k_max):
+                p = max(range(k, n), key=lambda j: norms[j])
+                if p != k:
+                    for row in a:
+                        row[k], row[p] = row[p], row[k]
+                    norms[k], norms[p] = norms[p], norms[k]
+                    first[k], first[p] = first[p], first[k]
+                    self.perm[k], self.perm[p] = self.perm[p], self.perm[k]
+                self._step(a, k, n)
+                for j in range(k+1, n):
+                    norms[j] -= a[k][j] ** 2
+                    # recompute what cancellation has eaten
+                    if norms[j] <= 1e-8 * first[j]:
+                        norms[j] = first[j] = sum(row[j] ** 2
+                                                  for row in a[k+1:])
+        else:
+            for k0 in range(0, k_max, QR_BLOCK):
+                k1 = min(k0 + QR_BLOCK, k_max)
+                for k in range(k0, k1):
+                    self._step(a, k, k1)
+                if k1 < n:
+                    self._update(a, k0, k1)
+
+        self._r = [[0.0] * i + row[i:] for i, row in enumerate(a[:k_max])]
+        big = max((abs(self._r[i][i]) for i in range(k_max)), default=0)
+        tol = max(m, n) * 2.2e-16 * big
+        self.rank = sum(abs(self._r[i][i]) > tol for i in range(k_max))
+
+    def _step(self, a, k, hi):
+        """
+        Householder step k on the columns up to hi.
+        """
+        v, tau, beta = _householder([row[k] for row in a[k:]])
+        self._v.append(v)
+        self._tau.append(tau)
+        a[k][k] = beta
+        for row in a[k+1:]:
+            row[k] = 0.0
+        _reflect(a[k:], v, tau, k+1, hi)
+
+    def _update(self, a, k0, k1):
+        """
+        Apply the reflectors k0..k1 to the columns from k1 at once:
+        C -= V * T^T * (V^T * C), with the rows from k0.
+        """
+        nb = k1 - k0
+        m = self._m - k0
+        vs = [[0.0] * (k - k0) + self._v[k] for k in range(k0, k1)]
+        taus = self._tau[k0:k1]
+        # the triangular T of I - V * T * V^T
+        t = [[0.0] * nb for i in range(nb)]
+        for i in range(nb):
+            t[i][i] = taus[i]
+            if i:
+                z = [-taus[i] * _dot(vs[j], vs[i]) for j in range(i)]
+                for j in range(i):
+                    t[j][i] = sum(t[j][l] * z[l] for l in range(j, i))
+        c = [row[k1:] for row in a[k0:]]
+        w = _matmul(vs, c)
+        w = _matmul([list(col) for col in zip(*t)], w)
+        vw = _matmul([list(col) for col in zip(*vs)], w)
+        for row, d in zip(a[k0:], vw):
+            row[k1:] = [p - q for p, q in zip(row[k1:], d)]
+
+    def _qt(self, b):
+        """
+        Returns Q^T * b.
+        """
+        y = [float(x) for x in b]
+        for k, (v, tau) in enumerate(zip(self._v, self._tau)):
+            if tau:
+                s = tau * sum(p * q for p, q in zip(v, y[k:]))
+                y[k:] = [q - s * p for p, q in zip(v, y[k:])]
+        return y
+
+    def size(self):
+        return self._m, self._n
+
+    def r(self):
+        """
+        -> Mat
+
+        Returns R, min(m, n) x n.
+        """
+        return Mat([list(row) for row in self._r])
+
+    def q(self):
+        """
+        -> Mat
+
+        Returns the first min(m, n) columns of Q.
+        """
+        k_max = len(self._r)
+        cols = []
+        for j in range(k_max):
+            y = [0.0] * self._m
+            y[j] = 1.0
+            for k in range(len(self._v)-1, -1, -1):
+                v, tau = self._v[k], self._tau[k]
+                if tau:
+                    s = tau * sum(p * q for p, q in zip(v, y[k:]))
+                    y[k:] = [q - s * p for p, q in zip(v, y[k:])]
+            cols.append(y)
+        return Mat([list(row) for row in zip(*cols)])
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns the least-squares solution x of A * x == b, the one
+        minimizing norm(A * x - b). A rank deficient A needs
+        pivoting, the columns beyond the rank are then left 0.
+        """
+        if len(b) != self._m:
+            raise ValueError('Expecting a vector of length %d.' % self._m)
+        r = self.rank
+        if r < self._n and not self.pivoting:
+            raise ValueError('This matrix is rank deficient, use '
+                             'pivoting=True.')
+        y = self._qt(b)
+        z = [0.0] * self._n
+        for i in range(r-1, -1, -1):
+            row = self._r[i]
+            z[i] = (y[i] - sum(row[j] * z[j] for j in range(i+1, r)))\
+                    / row[i]
+        x = [0.0] * self._n
+        for j, p in enumerate(self.perm):
+            x[p] = z[j]
+        return x
+
+    def residual(self, b):
+        """
+        -> float
+
+        Returns norm(A * x - b) for x = self.solve(b).
+        """
+        y = self._qt(b)
+        return sum(t * t for t in y[self.rank:]) ** 0.5
+
+class StreamQR(object):
+    """
+    Least squares over rows that come a chunk at a time: only the
+    (n+1) x (n+1) triangle R of [A | b] is kept, each chunk is
+    folded into it by Householder reflections. A 10^6 x 20 fit thus
+    needs the memory of one chunk.
+
+    >>> s = StreamQR(2)
+    >>> s.update([[1, 1], [1, 2]], [1, 2])
+    >>> s.update([[1, 3]], [2])
+    >>> [round(x, 10) for x in s.solve()], round(s.residual(), 10)
+    ([0.6666666667, 0.5], 0.4082482905)
+    """
+    def __init__(self, cols):
+        self._n = cols
+        self._r = [[0.0] * (cols + 1) for i in range(cols)]
+        self._rss = 0.0
+        self.rows = 0
+
+    def update(self, rows, b=None):
+        """
+        -> None
+
+        Fold rows into R. b holds their right-hand sides, if b is
+        None the last entry of each row is taken, as in a system
+        given to Mat.solve().
+        """
+        from operator import mul
+        rows = [list(row) for row in rows]
+        if b != None:
+            if len(b) != len(rows):
+                raise ValueError('rows and b should have the same length.')
+            rows = [row + [y] for row, y in zip(rows, b)]
+        if rows == []:
+            return
+        n = self._n
+        if any(len(row) != n + 1 for row in rows):
+            raise ValueError('Expecting rows of %d entries and b.' % n)
+        self.rows += len(rows)
+        # the chunk by columns, the zeros below R stay implicit
+        cols = [[float(x) for x in col] for col in zip(*rows)]
+        r = self._r
+        for j in range(n):
+            v, tau, beta = _householder([r[j][j]] + cols[j])
+            if tau == 0:
+                continue
+            r[j][j] = beta
+            v = v[1:]
+            for k in range(j+1, n+1):
+                s = tau * (r[j][k] + sum(map(mul, v, cols[k])))
+                r[j][k] -= s
+                cols[k] = [p - s * q for p, q in zip(cols[k], v)]
+        self._rss += sum(t * t for t in cols[n])
+
+    def r(self):
+        """
+        -> Mat
+
+        Returns R of the rows so far, n x n.
+        """
+        return Mat([row[:self._n] for row in self._r])
+
+    def solve(self):
+        """
+        -> list
+
+        Returns the least-squares solution of the rows so far.
+        """
+        n = self._n
+        r = self._r
+        big = max((abs(r[i][i]) for i in range(n)), default=0)
+        x = [0.0] * n
+        for i in range(n-1, -1, -1):
+            if abs(r[i][i]) <= max(self.rows, n) * 2.2e-16 * big:
+                raise ValueError('The rows so far are rank deficient.')
+            x[i] = (r[i][n] - sum(r[i][j] * x[j] for j in range(i+1, n)))\
+                    / r[i][i]
+        return x
+
+    def residual(self):
+        """
+        -> float
+
+        Returns norm(A * x - b) for x = self.solve().
+        """
+        return self._rss ** 0.5
+
+class EchelonBasis(object):
+    """
+    A basis of the span of rows that come one at a time, the way
+    constraints are added to a tableau. The basis is kept in reduced
+    row echelon form: 1 in the pivot column of each row and 0 in the
+    other pivot columns. So a new row is reduced in O(rank * cols),
+    and insert() tells at once whether it was independent of the
+    rows so far. Only the independent rows are kept.
+
+    Entries are converted by field, if given, an int field is taken
+    as Rat since the rows are divided by their pivots. Floats count
+    as 0 below tol times the largest entry of the inserted row, and
+    pivot on the largest entry. Other values are compared exactly,
+    and pivot on the first nonzero entry, so the basis of exact rows
+    is their unique reduced row echelon form.
+
+    >>> b = EchelonBasis(3, field=int)
+    >>> b.insert([1, 2, 3]), b.insert([2, 4, 6]), b.insert([0, 1, 1])
+    (True, False, True)
+    >>> b.rank, [1, 3, 4] in b, [0, 0, 1] in b
+    (2, True, False)
+    >>> b.express([1, 3, 4])
+    [1, 1]
+    >>> b.solve([6, 2])
+    [2, 2, 0]
+    >>> b.basis()
+    1 0 1
+    0 1 1
+    """
+    def __init__(self, cols, field=None, tol=1e-12):
+        if field == int:
+            field = rational.Rat
+        self._cols = cols
+        self.field_type = field
+        self.tol = tol
+        # [pivot column, reduced row, coefficients over the kept rows]
+        self._basis = []
+        self._kept = []
+        self.rank = 0
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def _convert(self, row):
+        row = [self._field(x) for x in row]
+        if len(row) != self._cols:
+            raise ValueError('Expecting a row of %d entries.' % self._cols)
+        return row
+
+    def _reduce(self, row):
+        """
+        Returns row minus its part in the span of the basis, and the
+        multiples of the basis rows taken off, see _combine().
+        """
+        taken = []
+        for entry in self._basis:
+            f = row[entry[0]]
+            if f != 0:
+                row = [x - f * y for x, y in zip(row, entry[1])]
+                taken.append((f, entry[2]))
+        return row, taken
+
+    def _combine(self, taken):
+        """
+        Returns the coefficients over the kept rows of the multiples
+        of basis rows taken by _reduce(). Only done when asked for, a
+        dependent row costs half as much.
+        """
+        comb = [self._field(0)] * self.rank
+        for f, c in taken:
+            comb = [x + f * y for x, y in zip(comb, c)]
+        return comb
+
+    def _pivot(self, row, big):
+        """
+        Returns the pivot column of the reduced row, or None if the row
+        is 0.
+        """
+        floats = [j for j, x in enumerate(row)
+                  if isinstance(x, (float, complex))]
+        if floats:
+            cut = self.tol * big
+            for j in floats:
+                if abs(row[j]) <= cut:
+                    row[j] = 0
+            col = max(range(self._cols), key=lambda j: abs(row[j]),
+                      default=None)
+            return None if col == None or row[col] == 0 else col
+        for j, x in enumerate(row):
+            if x != 0:
+                return j
+        return None
+
+    def insert(self, row):
+        """
+        -> bool
+
+        Adds row to the basis and returns True if it is independent of
+        the rows so far, else leaves the basis as it was and returns
+        False.
+        """
+        row = self._convert(row)
+        big = max((abs(x) for x in row), default=0)
+        v, taken = self._reduce(row)
+        col = self._pivot(v, big)
+        if col == None:
+            return False
+        comb = self._combine(taken)
+
+        # v = row - comb * kept, scaled to 1 at col
+        p = v[col]
+        zero, one = p - p, p / p
+        v = [x / p for x in v]
+        v[col] = one
+        comb = [-x / p for x in comb] + [one / p]
+        # clear col from the other rows, keeping them reduced
+        for entry in self._basis:
+            c, r, rc = entry
+            rc.append(zero)
+            f = r[col]
+            if f != 0:
+                entry[1] = [x - f * y for x, y in zip(r, v)]
+                entry[1][col] = zero
+                entry[2] = [x - f * y for x, y in zip(rc, comb)]
+        self._basis.append([col, v, comb])
+        self._kept.append(row)
+        self.rank += 1
+        return True
+
+    def reduce(self, row):
+        """
+        -> list
+
+        Returns row minus its part in the span of the basis, which is
+        all 0 if row is in the span.
+        """
+        return self._reduce(self._convert(row))[0]
+
+    def __contains__(self, row):
+        row = self._convert(row)
+        big = max((abs(x) for x in row), default=0)
+        return self._pivot(self._reduce(row)[0], big) == None
+
+    def express(self, row):
+        """
+        -> list or None
+
+        Returns the coefficients c with row == sum(c[i] * kept[i])
+        over the kept rows, in order of insertion, or None if row is
+        not in the span.
+        """
+        if row not in self:
+            return None
+        return self._combine(self._reduce(self._convert(row))[1])
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x with kept[i] * x == b[i] for each kept row, in order
+        of insertion. The kept rows are independent, so there always
+        is one: the columns without a pivot are set to 0.
+        """
+        if len(b) != self.rank:
+            raise ValueError('Expecting %d right-hand sides.' % self.rank)
+        b = [self._field(y) for y in b]
+        x = [self._field(0)] * self._cols
+        for col, r, c in self._basis:
+            x[col] = sum(y * z for y, z in zip(c, b))
+        return x
+
+    def basis(self):
+        """
+        -> Mat
+
+        Returns the reduced basis rows, in order of pivot columns.
+        """
+        if self.rank == 0:
+            return Mat('')
+        rows = sorted(self._basis, key=lambda entry: entry[0])
+        return Mat([list(r) for col, r, c in rows], field=self.field_type)
+
+    def rows(self):
+        """
+        -> Mat
+
+        Returns the kept rows, in order of insertion.
+        """
+        if self.rank == 0:
+            return Mat('')
+        return Mat([list(row) for row in self._kept], field=self.field_type)
+
+def _log_abs(x):
+    """
+    Returns log(abs(x)), also for Rats beyond the range of floats.
+    """
+    from math import log
+    if isinstance(x, rational.Rat):
+        return log(abs(x.num)) - log(x.den)
+    return log(abs(x))
+
+def _lower(mat):
+    """
+    Returns the rows of the lower triangle of the square mat, in
+    its field, the upper triangle is never read.
+    """
+    if not mat.is_square():
+        raise ValueError('Expecting a square matrix.')
+    return [[mat.field(x) for x in row[:i+1]] for i, row in enumerate(mat)]
+
+class Cholesky(object):
+    """
+    Cholesky factorization of a symmetric positive definite matrix,
+    A = L * D * L^T with L unit lower triangular, which is
+    L * L^T after moving sqrt(D) into L. Without the square roots
+    it is exact for Rat. Only the lower triangle of A is read, and
+    L is kept as its rows below the diagonal.
+
+    >>> a = rMat('''
+    ... 4 2 2
+    ... 2 5 3
+    ... 2 3 6''')
+    >>> f = a.cholesky()
+    >>> f.det(), f.solve([8, 10, 11])
+    (64, [1, 1, 1])
+    >>> from math import log
+    >>> abs(f.logdet() - log(64)) < 1e-12
+    True
+    >>> f.l()
+    2.0 0.0 0.0
+    1.0 2.0 0.0
+    1.0 1.0 2.0
+    """
+    def __init__(self, mat):
+        self.field_type = mat._field
+        a = _lower(mat)
+        n = len(a)
+        low, d = [], []
+        for i in range(n):
+            row = a[i]
+            # l[i][j] = (a[i][j] - sum l[i][k] * d[k] * l[j][k]) / d[j]
+            li = []
+            ld = []
+            for j in range(i):
+                lj = low[j]
+                s = row[j] - sum(p * q for p, q in zip(ld, lj))
+                li.append(s / d[j])
+                ld.append(s)
+            di = row[i] - sum(p * q for p, q in zip(li, ld))
+            if not di > 0:
+                raise ValueError('This matrix is not positive definite.')
+            low.append(li)
+            d.append(di)
+        self._low = low
+        self._d = d
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def size(self):
+        return len(self._d)
+
+    def det(self):
+        """
+        -> self.field_type
+
+        Returns determinant of the factorized matrix.
+        """
+        ret = self._field(1)
+        for x in self._d:
+            ret *= x
+        return ret
+
+    def logdet(self):
+        """
+        -> float
+
+        Returns log(det), without the overflow of det.
+        """
+        return sum(_log_abs(x) for x in self._d)
+
+    def l(self):
+        """
+        -> Mat
+
+        Returns the lower triangular L with L * L^T == A, in floats.
+        """
+        n = len(self._d)
+        roots = [float(x) ** 0.5 for x in self._d]
+        return Mat(lambda i, j: roots[j] if i == j else
+                   float(self._low[i][j]) * roots[j] if j < i else 0.0,
+                   n, n)
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which A * x == b.
+        """
+        n = len(self._d)
+        if len(b) != n:
+            raise ValueError('Expecting a vector of length %d.' % n)
+        y = [self._field(v) for v in b]
+        for i, li in enumerate(self._low):
+            y[i] -= sum(p * q for p, q in zip(li, y))
+        for i in range(n):
+            y[i] /= self._d[i]
+        for i in range(n-1, -1, -1):
+            yi = y[i]
+            if yi != 0:
+                for j, l in enumerate(self._low[i]):
+                    y[j] -= l * yi
+        return y
+
+    def update(self, u, v=None):
+        """
+        -> Woodbury
+
+        Returns the factorization of A + u * v^T, see Woodbury.
+        """
+        return Woodbury(self, u, v)
+
+class LDL(object):
+    """
+    LDL^T factorization of a symmetric matrix, positive definite or
+    not: P * A * P^T = L * D * L^T with L unit lower triangular and
+    D made of 1x1 and 2x2 blocks, picked by Bunch-Kaufman pivoting.
+    It is exact for Rat, only the lower triangle of A is read, and
+    L is kept as its rows below the diagonal.
+
+    >>> a = rMat('''
+    ... 0 1 2
+    ... 1 0 3
+    ... 2 3 0''')
+    >>> f = a.ldl()
+    >>> f.det(), f.inertia()
+    (12, (1, 2, 0))
+    >>> f.solve([3, 4, 5])
+    [1, 1, 1]
+    """
+    # growth bound of Bunch-Kaufman, (1 + sqrt(17)) / 8
+    ALPHA = 0.6403882032022076
+
+    def __init__(self, mat):
+        self.field_type = mat._field
+        low = _lower(mat)
+        n = len(low)
+        perm = list(range(n))
+        # off[k] is D[k+1][k] for a 2x2 block starting at k
+        off = {}
+        alpha = self.ALPHA
+
+        def get(i, j):
+            return low[i][j] if j <= i else low[j][i]
+
+        def swap(p, q):
+            # symmetric swap of rows and columns p < q
+            if p == q:
+                return
+            for j in range(p):
+                low[p][j], low[q][j] = low[q][j], low[p][j]
+            low[p][p], low[q][q] = low[q][q], low[p][p]
+            for j in range(p+1, q):
+                low[j][p], low[q][j] = low[q][j], low[j][p]
+            for j in range(q+1, n):
+                low[j][p], low[j][q] = low[j][q], low[j][p]
+            perm[p], perm[q] = perm[q], perm[p]
+
+        k = 0
+        while k < n:
+            akk = abs(low[k][k])
+            lam, r = 0, k
+            for i in range(k+1, n):
+                if abs(low[i][k]) > lam:
+                    lam, r = abs(low[i][k]), i
+            size = 1
+            if max(akk, lam) == 0:
+                # the column is already eliminated
+                k += 1
+                continue
+            if akk < alpha * lam:
+                sigma = max(abs(get(r, j)) for j in range(k, n) if j != r)
+                if akk * sigma >= alpha * lam * lam:
+                    pass
+                elif abs(low[r][r]) >= alpha * sigma:
+                    swap(k, r)
+                else:
+                    swap(k+1, r)
+                    size = 2
+
+            if size == 1:
+                d = low[k][k]
+                col = [low[i][k] for i in range(k+1, n)]
+                mult = [x / d for x in col]
+                for t, i in enumerate(range(k+1, n)):
+                    m = mult[t]
+                    if m != 0:
+                        row = low[i]
+                        for s, j in enumerate(range(k+1, i+1)):
+                            row[j] -= m * col[s]
+                    low[i][k] = m
+            else:
+                a, b, c = low[k][k], low[k+1][k], low[k+1][k+1]
+                det = a * c - b * b
+                xs = [low[i][k] for i in range(k+2, n)]
+                ys = [low[i][k+1] for i in range(k+2, n)]
+                m1 = [(x * c - y * b) / det for x, y in zip(xs, ys)]
+                m2 = [(y * a - x * b) / det for x, y in zip(xs, ys)]
+                for t, i in enumerate(range(k+2, n)):
+                    row = low[i]
+                    for s, j in enumerate(range(k+2, i+1)):
+                        row[j] -= m1[t] * xs[s] + m2[t] * ys[s]
+                    row[k], row[k+1] = m1[t], m2[t]
+                off[k] = b
+            k += size
+
+        self._d = [low[i][i] for i in range(n)]
+        self._low = [row[:i] for i, row in enumerate(low)]
+        for k in off:
+            # L is 0 inside a 2x2 block, D holds the entry
+            self._low[k+1][k] = self._field(0)
+        self._off = off
+        self._perm = perm
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def size(self):
+        return len(self._d)
+
+    def _blocks(self):
+        """
+        Yields (k, size) for the blocks of D.
+        """
+        k = 0
+        while k < len(self._d):
+            size = 2 if k in self._off else 1
+            yield k, size
+            k += size
+
+    def _block_dets(self):
+        d = self._d
+        return [d[k] if size == 1 else d[k] * d[k+1] - self._off[k] ** 2
+                for k, size in self._blocks()]
+
+    def det(self):
+        """
+        -> self.field_type
+
+        Returns determinant of the factorized matrix.
+        """
+        ret = self._field(1)
+        for x in self._block_dets():
+            ret *= x
+        return ret
+
+    def logdet(self):
+        """
+        -> float
+
+        Returns log(abs(det)), the sign is in inertia(). Raises
+        ValueError if the matrix is singular.
+        """
+        dets = self._block_dets()
+        if any(x == 0 for x in dets):
+            raise ValueError('This matrix is singular.')
+        return sum(_log_abs(x) for x in dets)
+
+    def inertia(self):
+        """
+        -> (int, int, int)
+
+        Returns the numbers of positive, negative and zero
+        eigenvalues of the factorized matrix (Sylvester).
+        """
+        pos = neg = zero = 0
+        for (k, size), x in zip(self._blocks(), self._block_dets()):
+            if size == 2:
+                # a 2x2 block with det < 0 has one eigenvalue of each
+                # sign, Bunch-Kaufman never picks one with det >= 0
+                pos += 1
+                neg += 1
+            elif x > 0:
+                pos += 1
+            elif x < 0:
+                neg += 1
+            else:
+                zero += 1
+        return pos, neg, zero
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which A * x == b.
+        """
+        n = len(self._d)
+        if len(b) != n:
+            raise ValueError('Expecting a vector of length %d.' % n)
+        y = [self._field(b[p]) for p in self._perm]
+        for i, li in enumerate(self._low):
+            y[i] -= sum(p * q for p, q in zip(li, y))
+        d = self._d
+        for k, size in self._blocks():
+            if size == 1:
+                if d[k] == 0:
+                    raise ValueError("This matrix is irreversible!")
+                y[k] /= d[k]
+            else:
+                a, b, c = d[k], self._off[k], d[k+1]
+                det = a * c - b * b
+                y[k], y[k+1] = (c * y[k] - b * y[k+1]) / det,\
+                        (a * y[k+1] - b * y[k]) / det
+        for i in range(n-1, -1, -1):
+            yi = y[i]
+            if yi != 0:
+                for j, l in enumerate(self._low[i]):
+                    y[j] -= l * yi
+        x = [None] * n
+        for i, p in enumerate(self._perm):
+            x[p] = y[i]
+        return x
+
+    def update(self, u, v=None):
+        """
+        -> Woodbury
+
+        Returns the factorization of A + u * v^T, see Woodbury.
+        """
+        return Woodbury(self, u, v)
+
+class Woodbury(object):
+    """
+    The factorization of A + U * V^T, from a factorization base of A
+    (LU, Cholesky, LDL, ...) and the Sherman-Morrison-Woodbury formula
+
+    (A + U V^T)^-1 = A^-1 - A^-1 U (I + V^T A^-1 U)^-1 V^T A^-1
+
+    U and V are n x k, so building it takes k solves with base,
+    O(k * n**2), instead of a new O(n**3) factorization, and each
+    solve is one solve with base plus O(k * n). det follows from the
+    matrix determinant lemma. It is exact for Rat. The updated matrix
+    is singular when the k x k capacitance I + V^T A^-1 U is; for
+    floats, when a pivot of it is below the rounding of its terms.
+
+    A row, column or entry of A changed by delta is a rank one
+    update, see update_row(), update_col() and update_entry(). Later
+    updates are added to U and V, so they keep the solves with base
+    done so far.
+
+    >>> a = rMat('''
+    ... 2 1 1
+    ... 4 -6 0
+    ... -2 7 2''')
+    >>> f = a.lu().update(e(3, 1), [0, 6, 2])
+    >>> f.det(), f.solve([4, 6, 7])
+    (-12, [1, 1, 1])
+    >>> g = f.update_entry(2, 2, -3)
+    >>> g.singular, g.det()
+    (True, 0)
+    """
+    def __init__(self, base, u=None, v=None):
+        self._base = base
+        self.field_type = base.field_type
+        if base.det() == 0:
+            raise ValueError("This matrix is irreversible!")
+        self._u = self._v = self._z = []
+        self._add(u, v)
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def _columns(self, u):
+        """
+        Returns the columns of the Mat u, or [u] for a vector.
+        """
+        if isinstance(u, Mat):
+            return [[self._field(row[j]) for row in u]
+                    for j in range(u.cols())]
+        if u == None:
+            return []
+        return [[self._field(x) for x in u]]
+
+    def _add(self, u, v):
+        """
+        Append the columns of u and v to U and V, and factorize the
+        new capacitance I + V^T Z, Z = A^-1 U.
+        """
+        n = self.size()
+        u = self._columns(u)
+        v = self._columns(v) if v != None else u
+        if len(u) != len(v) or any(len(x) != n for x in u + v):
+            raise ValueError('Expecting U and V of %d rows and as many '
+                             'columns.' % n)
+        self._u = self._u + u
+        self._v = self._v + v
+        self._z = self._z + [self._base.solve(x) for x in u]
+
+        from operator import mul
+        k = len(self._u)
+        c = []
+        # bounds the sum of abs of the terms of an entry of c, its
+        # rounding tells a zero pivot of floats
+        big = 1
+        for i, v in enumerate(self._v):
+            row = []
+            for j, z in enumerate(self._z):
+                terms = list(map(mul, v, z))
+                row.append(sum(terms) + (i == j))
+                if isinstance(row[-1], float):
+                    big = max(big, sum(map(abs, terms)))
+            c.append(row)
+        self._c = LU(Mat(c, field=self.field_type)) if k else None
+        self.singular = k > 0 and self._c.singular
+        if k and not self.singular and isinstance(self._c._a[0][0], float):
+            cut = max(n, k) * 2.2e-16 * big
+            self.singular = any(abs(self._c._a[i][i]) <= cut
+                                for i in range(k))
+
+    def size(self):
+        return self._base.size()
+
+    def rank(self):
+        """
+        -> int
+
+        Returns k, the number of columns of U.
+        """
+        return len(self._u)
+
+    def det(self):
+        """
+        -> field
+
+        Returns determinant of A + U * V^T.
+        """
+        if self.singular:
+            return self._field(0)
+        ret = self._base.det()
+        return ret * self._c.det() if self._c != None else ret
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which (A + U * V^T) * x == b.
+        """
+        from operator import mul
+        if self.singular:
+            raise ValueError("This matrix is irreversible!")
+        y = self._base.solve(b)
+        if self._c == None:
+            return y
+        # x = y - Z * (I + V^T Z)^-1 * V^T y
+        w = self._c.solve([sum(map(mul, v, y)) for v in self._v])
+        for z, t in zip(self._z, w):
+            if t != 0:
+                y = [p - t * q for p, q in zip(y, z)]
+        return y
+
+    def solve_many(self, B):
+        """
+        -> Mat
+
+        Returns X for which (A + U * V^T) * X == B.
+        """
+        cols = [self.solve([row[j] for row in B]) for j in range(B.cols())]
+        return Mat(lambda i,j: cols[j][i], self.size(), B.cols(),
+                   field=self.field_type)
+
+    def inv(self):
+        """
+        -> Mat
+
+        Returns inverse of A + U * V^T.
+        """
+        return self.solve_many(E(self.size(), field=self.field_type))
+
+    def update(self, u, v=None):
+        """
+        -> Woodbury
+
+        Returns the factorization of A + U * V^T + u * v^T, u and v
+        are vectors or Mats of the same columns, v is u by default.
+        Only the new columns are solved with base.
+        """
+        from copy import copy
+        ret = copy(self)
+        ret._add(u, v)
+        return ret
+
+    def update_row(self, i, delta):
+        """
+        -> Woodbury
+
+        Returns the factorization after adding delta to row i.
+        """
+        return self.update(e(self.size(), i, self.field_type), delta)
+
+    def update_col(self, j, delta):
+        """
+        -> Woodbury
+
+        Returns the factorization after adding delta to column j.
+        """
+        return self.update(delta, e(self.size(), j, self.field_type))
+
+    def update_entry(self, i, j, delta):
+        """
+        -> Woodbury
+
+        Returns the factorization after adding delta to A[i][j].
+        """
+        n = self.size()
+        u = [delta if r == i else 0 for r in range(n)]
+        return self.update(u, e(n, j, self.field_type))
+
+# eigenvalues-------------------------------------------------
+
+def _float_rows(mat):
+    if not mat.is_square():
+        raise ValueError('Expecting a square matrix.')
+    return [[float(mat.field(x)) for x in row] for row in mat]
+
+def _balance(a):
+    """
+    Scale rows and columns of a by powers of 2 in place, so that
+    their norms are close, which keeps the eigenvalues and makes
+    them more accurate.
+    """
+    n = len(a)
+    done = False
+    while not done:
+        done = True
+        for i in range(n):
+            c = sum(abs(a[j][i]) for j in range(n) if j != i)
+            r = sum(abs(a[i][j]) for j in range(n) if j != i)
+            if c == 0 or r == 0:
+                continue
+            f, s = 1.0, c + r
+            while c < r / 2:
+                f, c = f * 2, c * 4
+            while c > r * 2:
+                f, c = f / 2, c / 4
+            if (c + r) / f < 0.95 * s:
+                done = False
+                a[i] = [x / f for x in a[i]]
+                for row in a:
+                    row[i] *= f
+
+def _hessenberg(a, vectors=False):
+    """
+    Reduce a to upper Hessenberg form H in place by Householder
+    reflections, A = Z * H * Z^T. A symmetric a becomes tridiagonal.
+    Returns the rows of Z if vectors, else None.
+    """
+    n = len(a)
+    z = [[float(i == j) for j in range(n)] for i in range(n)]\
+            if vectors else None
+    for k in range(n-2):
+        v, tau, beta = _householder([row[k] for row in a[k+1:]])
+        if tau == 0:
+            continue
+        _reflect(a[k+1:], v, tau, k, n)
+        for row in a if z == None else a + z:
+            s = tau * sum(p * q for p, q in zip(v, row[k+1:]))
+            row[k+1:] = [q - s * p for p, q in zip(v, row[k+1:])]
+        for row in a[k+2:]:
+            row[k] = 0.0
+    return z
+
+def _hqr(a):
+    """
+    Returns the eigenvalues of the upper Hessenberg a by the Francis
+    implicit double-shift QR iteration, deflating as subdiagonal
+    entries vanish. a is destroyed.
+    """
+    n = len(a)
+    values = [None] * n
+    norm = sum(abs(a[i][j]) for i in range(n) for j in range(max(i-1, 0), n))
+    nn = n - 1
+    t = 0.0
+    its = 0
+    while nn >= 0:
+        # look for a single small subdiagonal entry
+        l = nn
+        while l >= 1:
+            s = abs(a[l-1][l-1]) + abs(a[l][l]) or norm
+            if abs(a[l][l-1]) + s == s:
+                a[l][l-1] = 0.0
+                break
+            l -= 1
+        x = a[nn][nn]
+        if l == nn:
+            # one root
+            values[nn] = x + t
+            nn -= 1
+            its = 0
+            continue
+        y = a[nn-1][nn-1]
+        w = a[nn][nn-1] * a[nn-1][nn]
+        if l == nn - 1:
+            # two roots
+            p = (y - x) / 2
+            q = p * p + w
+            z = abs(q) ** 0.5
+            x += t
+            if q >= 0:
+                z = p + (z if p >= 0 else -z)
+                values[nn-1] = values[nn] = x + z
+                if z:
+                    values[nn] = x - w / z
+            else:
+                values[nn-1] = complex(x + p, z)
+                values[nn] = complex(x + p, -z)
+            nn -= 2
+            its = 0
+            continue
+
+        if its == 60:
+            raise ValueError('The QR iteration does not converge.')
+        if its in (10, 20, 40):
+            # exceptional shift
+            t += x
+            for i in range(nn+1):
+                a[i][i] -= x
+            s = abs(a[nn][nn-1]) + abs(a[nn-1][nn-2])
+            x = y = 0.75 * s
+            w = -0.4375 * s * s
+        its += 1
+
+        # two consecutive small subdiagonal entries
+        m = nn - 2
+        while m >= l:
+            z = a[m][m]
+            r, s = x - z, y - z
+            p = (r * s - w) / a[m+1][m] + a[m][m+1]
+            q = a[m+1][m+1] - z - r - s
+            r = a[m+2][m+1]
+            s = abs(p) + abs(q) + abs(r)
+            p, q, r = p / s, q / s, r / s
+            if m == l:
+                break
+            u = abs(a[m][m-1]) * (abs(q) + abs(r))
+            v = abs(p) * (abs(a[m-1][m-1]) + abs(z) + abs(a[m+1][m+1]))
+            if u + v == v:
+                break
+            m -= 1
+        for i in range(m+2, nn+1):
+            a[i][i-2] = 0.0
+            if i != m + 2:
+                a[i][i-3] = 0.0
+
+        # the double QR step on rows l..nn and columns m..nn
+        for k in range(m, nn):
+            if k != m:
+                p, q = a[k][k-1], a[k+1][k-1]
+                r = a[k+2][k-1] if k != nn - 1 else 0.0
+                x = abs(p) + abs(q) + abs(r)
+                if x != 0:
+                    p, q, r = p / x, q / x, r / x
+            s = (p * p + q * q + r * r) ** 0.5
+            if p < 0:
+                s = -s
+            if s == 0:
+                continue
+            if k == m:
+                if l != m:
+                    a[k][k-1] = -a[k][k-1]
+            else:
+                a[k][k-1] = -s * x
+            p += s
+            x, y, z = p / s, q / s, r / s
+            q, r = q / p, r / p
+            for j in range(k, nn+1):
+                p = a[k][j] + q * a[k+1][j]
+                if k != nn - 1:
+                    p += r * a[k+2][j]
+                    a[k+2][j] -= p * z
+                a[k+1][j] -= p * y
+                a[k][j] -= p * x
+            for i in range(l, min(nn, k+3) + 1):
+                p = x * a[i][k] + y * a[i][k+1]
+                if k != nn - 1:
+                    p += z * a[i][k+2]
+                    a[i][k+2] -= p * r
+                a[i][k+1] -= p * q
+                a[i][k] -= p
+    return values
+
+def _tql(d, e, z=None):
+    """
+    Eigenvalues of the symmetric tridiagonal matrix with diagonal d
+    and subdiagonal e (e[i] = T[i+1][i]) by the implicit QL
+    iteration, in place in d. The rotations are applied to the
+    columns of the rows z, which turn into eigenvectors.
+    """
+    from math import hypot
+    n = len(d)
+    e = list(e) + [0.0]
+    for l in range(n):
+        its = 0
+        while True:
+            m = l
+            while m < n - 1:
+                dd = abs(d[m]) + abs(d[m+1])
+                if abs(e[m]) + dd == dd:
+                    break
+                m += 1
+            if m == l:
+                break
+            if its == 60:
+                raise ValueError('The QL iteration does not converge.')
+            its += 1
+            g = (d[l+1] - d[l]) / (2 * e[l])
+            r = hypot(g, 1.0)
+            g = d[m] - d[l] + e[l] / (g + (r if g >= 0 else -r))
+            s = c = 1.0
+            p = 0.0
+            for i in range(m-1, l-1, -1):
+                f, b = s * e[i], c * e[i]
+                r = hypot(f, g)
+                e[i+1] = r
+                if r == 0:
+                    d[i+1] -= p
+                    e[m] = 0.0
+                    break
+                s, c = f / r, g / r
+                g = d[i+1] - p
+                r = (d[i] - g) * s + 2 * c * b
+                p = s * r
+                d[i+1] = g + p
+                g = c * r - b
+                if z != None:
+                    for row in z:
+                        f = row[i+1]
+                        row[i+1] = s * row[i] + c * f
+                        row[i] = c * row[i] - s * f
+            else:
+                d[l] -= p
+                e[l] = g
+                e[m] = 0.0
+
+def _sorted_pairs(values, vectors=None):
+    """
+    Sort values (and the columns of the rows vectors) by decreasing
+    real part, then imaginary part. Returns values, or (values, Mat).
+    """
+    order = sorted(range(len(values)),
+                   key=lambda i: (-values[i].real, -values[i].imag))
+    values = [values[i] for i in order]
+    if vectors == None:
+        return values
+    return values, Mat([[row[i] for i in order] for row in vectors])
+
+def _unit(x):
+    """
+    Returns x scaled to norm 1, its largest entry real and positive.
+    """
+    big = max(x, key=abs)
+    x = [v / big for v in x]
+    norm = sum(abs(v) ** 2 for v in x) ** 0.5
+    return [v / norm for v in x]
+
+def _inverse_iteration(a, value):
+    """
+    Returns an eigenvector of the rows a for the computed eigenvalue
+    value, by two steps of inverse iteration on a shift next to it.
+    """
+    n = len(a)
+    norm = max(sum(abs(x) for x in row) for row in a) or 1.0
+    shift = value + 1e-10 * norm * (1 + 1j if isinstance(value, complex)
+                                    else 1)
+    m = Mat([[x - (shift if i == j else 0) for j, x in enumerate(row)]
+             for i, row in enumerate(a)])
+    f = LU(m)
+    x = [1.0 + 0.1 * i / n for i in range(n)]
+    for step in range(2):
+        x = _unit(f.solve(x))
+    if not isinstance(value, complex):
+        x = [v.real for v in x]
+    return x
+
+def _symmetric_eig(mat, vectors):
+    a = _float_rows(mat)
+    n = len(a)
+    z = _hessenberg(a, vectors)
+    d = [a[i][i] for i in range(n)]
+    e = [a[i+1][i] for i in range(n-1)]
+    _tql(d, e, z)
+    if not vectors:
+        return sorted(d, reverse=True)
+    cols = [_unit([row[j] for row in z]) for j in range(n)]
+    return _sorted_pairs(d, [list(row) for row in zip(*cols)])
+
+def lanczos(a, k, tol=1e-10, maxiter=None):
+    """
+    lanczos(A, k) -> (list, Mat)
+
+    Returns the k largest eigenvalues of the symmetric A, largest
+    first, and a Mat of the eigenvectors as columns. A is a Mat or
+    anything with matvec(x) and rows(), like SparseMat, so only
+    products with A are needed. The Lanczos vectors are fully
+    reorthogonalized, maxiter bounds their number. One run only sees
+    one copy of a repeated eigenvalue, so the runs are repeated
+    orthogonally to the vectors found until no larger one shows up.
+
+    >>> values, vectors = lanczos(tridiag(-1, 2, -1, 50), 2)
+    >>> [round(x, 10) for x in values]
+    [3.9962066575, 3.9848410193]
+    """
+    import random
+    matvec = _operator(a)
+    n = a.rows()
+    if not 0 < k <= n:
+        raise ValueError('k should be in 1..%d.' % n)
+    rand = random.Random(0)
+
+    def orthogonalize(w, basis):
+        for step in range(2):
+            for u in basis:
+                c = _dot(w, u)
+                w = [p - c * q for p, q in zip(w, u)]
+        return w
+
+    def fresh(basis):
+        # a random unit vector orthogonal to basis
+        w = orthogonalize([rand.random() - 0.5 for i in range(n)], basis)
+        norm = _norm(w)
+        return [p / norm for p in w] if norm > 1e-12 else None
+
+    def run(k, locked):
+        # the k largest Ritz pairs orthogonal to locked
+        limit = n - len(locked)
+        if maxiter != None:
+            limit = min(max(maxiter, k), limit)
+        basis = [fresh(locked)]
+        alphas, betas = [], []
+        check = max(2 * k, 10)
+        while True:
+            v = basis[-1]
+            w = matvec(v)
+            alpha = _dot(w, v)
+            alphas.append(alpha)
+            w = orthogonalize(w, locked + basis)
+            beta = _norm(w)
+
+            m = len(basis)
+            if m >= k and (m % check == 0 and beta >= tol or m == limit):
+                d = list(alphas)
+                s = [[float(i == j) for j in range(m)] for i in range(m)]
+                _tql(d, betas, s)
+                top = sorted(range(m), key=lambda i: -d[i])[:k]
+                scale = max(abs(x) for x in d) or 1.0
+                if m == limit or all(abs(beta * s[m-1][i]) <= tol * scale
+                                     for i in top):
+                    return [(d[i], _unit([sum(s[j][i] * basis[j][t]
+                                              for j in range(m))
+                                          for t in range(n)]))
+                            for i in top]
+
+            if beta < tol:
+                # an invariant subspace, carry on in a new direction
+                w = fresh(locked + basis)
+                if w == None:
+                    raise ValueError('The Lanczos vectors lost '
+                                     'orthogonality.')
+                betas.append(0.0)
+            else:
+                betas.append(beta)
+                w = [p / beta for p in w]
+            basis.append(w)
+
+    pairs = run(k, [])
+    scale = max(abs(x) for x, v in pairs) or 1.0
+    while len(pairs) < n:
+        more = run(min(k, n - len(pairs)), [v for x, v in pairs])
+        if more[0][0] <= pairs[-1][0] + tol * scale:
+            break
+        pairs = sorted(pairs + more, key=lambda p: -p[0])[:k]
+    values = [x for x, v in pairs]
+    return values, Mat([list(row) for row in zip(*(v for x, v in pairs))])
+
+# banded matrices---------------------------------------------
+
+class BandMat(object):
+    """
+    A square matrix whose entries are zero out of 'lower' diagonals
+    below and 'upper' diagonals above the main one. Only the band is
+    kept, _band[i][j-i+lower] is the entry (i, j). A cyclic BandMat
+    is tridiagonal with two more entries, (0, n-1) and (n-1, 0), as
+    in periodic splines.
+
+    Solving costs O(n * lower * (lower+upper)) instead of O(n**3).
+
+    >>> a = tridiag(1, 4, 1, 5, field=rational.Rat)
+    >>> a
+    4 1 0 0 0
+    1 4 1 0 0
+    0 1 4 1 0
+    0 0 1 4 1
+    0 0 0 1 4
+    >>> a.solve([5, 6, 6, 6, 5])
+    [1, 1, 1, 1, 1]
+    >>> a.det()
+    780
+    >>> a[0][4] = 1
+    Traceback (most recent call last):
+        ...
+    IndexError: Entry (0, 4) is out of the band.
+    >>> c = tridiag(1, 4, 1, 5, field=rational.Rat, cyclic=True)
+    >>> c[0]
+    [4, 1, 0, 0, 1]
+    >>> c.solve([6, 6, 6, 6, 6])
+    [1, 1, 1, 1, 1]
+    >>> c.det() == Mat(c).det()
+    True
+    """
+    def __init__(self, n, lower=1, upper=1, field=None, cyclic=False):
+        if cyclic and (lower != 1 or upper != 1 or n < 3):
+            raise ValueError('A cyclic BandMat must be tridiagonal and '
+                             'at least 3x3.')
+        self._n = n
+        self._lower = lower
+        self._upper = upper
+        self._field = field
+        self._cyclic = cyclic
+        self._band = [[self.field(0)] * (lower+upper+1) for i in range(n)]
+        # (0, n-1) and (n-1, 0) of a cyclic BandMat
+        self._corners = [self.field(0), self.field(0)]
+        self._cache = {}
+
+    def __str__(self):
+        return str(Mat(self))
+
+    __repr__ = __str__
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError('Row index out of range.')
+        return _BandRow(self, index)
+
+    def __iter__(self):
+        return (self[i] for i in range(self._n))
+
+    def field(self, x):
+        return self._field(x) if self._field != None else x
+
+    def rows(self):
+        return self._n
+
+    cols = rows
+
+    def size(self):
+        return self._n, self._n
+
+    def is_square(self):
+        return True
+
+    def is_empty(self):
+        return self._n == 0
+
+    def bandwidth(self):
+        """
+        -> (int, int)
+
+        Returns the numbers of diagonals below and above the main one.
+        """
+        return self._lower, self._upper
+
+    def _corner(self, i, j):
+        """
+        Returns the index of (i, j) in _corners, or None.
+        """
+        if self._cyclic:
+            if (i, j) == (0, self._n-1):
+                return 0
+            if (i, j) == (self._n-1, 0):
+                return 1
+        return None
+
+    def get(self, i, j):
+        """
+        Returns self[i][j].
+        """
+        if -self._lower <= j - i <= self._upper:
+            return self._band[i][j-i+self._lower]
+        c = self._corner(i, j)
+        return self._corners[c] if c != None else self.field(0)
+
+    def set(self, i, j, value):
+        """
+        self[i][j] = value, (i, j) has to be in the band. Like
+        Mat.__setitem__(), value is converted to the field only when
+        computing.
+        """
+        if not (0 <= i < self._n and 0 <= j < self._n):
+            raise IndexError('Entry (%d, %d) out of range.' % (i, j))
+        self._cache.clear()
+        if -self._lower <= j - i <= self._upper:
+            self._band[i][j-i+self._lower] = value
+            return
+        c = self._corner(i, j)
+        if c == None:
+            raise IndexError('Entry (%d, %d) is out of the band.' % (i, j))
+        self._corners[c] = value
+
+    def to_rows(self):
+        """
+        -> list
+
+        Returns the dense rows of self.
+        """
+        return [[self.get(i, j) for j in range(self._n)]
+                for i in range(self._n)]
+
+    def matvec(self, x):
+        """
+        -> list
+
+        Returns self * x.
+        """
+        ret = []
+        for i, row in enumerate(self._band):
+            lo = max(0, i - self._lower)
+            hi = min(self._n, i + self._upper + 1)
+            ret.append(sum(row[j-i+self._lower] * x[j]
+                           for j in range(lo, hi)))
+        if self._cyclic:
+            ret[0] += self._corners[0] * x[-1]
+            ret[-1] += self._corners[1] * x[0]
+        return ret
+
+    def lu(self):
+        """
+        -> BandLU
+
+        Returns the banded LU factorization of self, kept until self
+        is changed. A cyclic BandMat is factorized without its corners,
+        solve() and det() put them back.
+        """
+        if 'lu' not in self._cache:
+            self._cache['lu'] = BandLU(self)
+        return self._cache['lu']
+
+    def _cyclic_setup(self):
+        """
+        Returns (B, u, v) with self == B + u * v^T, B tridiagonal,
+        by Sherman-Morrison.
+        """
+        if 'cyclic' not in self._cache:
+            n = self._n
+            beta, alpha = (self.field(v) for v in self._corners)
+            b = BandMat(n, field=self._field)
+            b._band = [[self.field(v) for v in row] for row in self._band]
+            gamma = -b._band[0][1] if b._band[0][1] != 0\
+                    else self.field(1)
+            b._band[0][1] -= gamma
+            b._band[-1][1] -= alpha * beta / gamma
+            u = [self.field(0)] * n
+            u[0], u[-1] = gamma, alpha
+            v = [self.field(0)] * n
+            v[0], v[-1] = self.field(1), beta / gamma
+            self._cache['cyclic'] = (b.lu(), u, v)
+        return self._cache['cyclic']
+
+    def det(self):
+        """
+        -> field
+
+        Returns determinant of self.
+        """
+        if not self._cyclic:
+            return self.lu().det()
+        f, u, v = self._cyclic_setup()
+        if f.singular:
+            return Mat(self).det()
+        z = f.solve(u)
+        return f.det() * (1 + inner_product(v, z))
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which self * x == b. Unlike Mat.solve() and
+        SparseMat.solve(), which solve an augmented matrix, b is given
+        apart as a vector, the way the LU factors take it.
+        """
+        if not self._cyclic:
+            return self.lu().solve(b)
+        f, u, v = self._cyclic_setup()
+        if f.singular:
+            return Mat(self).lu().solve(b)
+        y = f.solve(b)
+        z = f.solve(u)
+        s = 1 + inner_product(v, z)
+        if s == 0:
+            raise ValueError("This matrix is irreversible!")
+        t = inner_product(v, y) / s
+        return [yi - t * zi for yi, zi in zip(y, z)]
+
+class _BandRow(object):
+    """
+    A row of a BandMat, so that m[i][j] reads and writes it.
+    """
+    __slots__ = ('_mat', '_row')
+
+    def __init__(self, mat, row):
+        self._mat = mat
+        self._row = row
+
+    def __len__(self):
+        return self._mat._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.copy()[index]
+        if index < 0:
+            index += self._mat._n
+        return self._mat.get(self._row, index)
+
+    def __setitem__(self, index, value):
+        if index < 0:
+            index += self._mat._n
+        self._mat.set(self._row, index, value)
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __eq__(self, other):
+        try:
+            return self.copy() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        return [self._mat.get(self._row, j) for j in range(self._mat._n)]
+
+    def __str__(self):
+        return str(self.copy())
+
+    __repr__ = __str__
+
+class BandLU(object):
+    """
+    LU factorization of a BandMat with partial pivoting inside the
+    band. A row swap widens U to lower+upper diagonals above the main
+    one. _rows[k] is (first column, entries) of row k of U, _steps[k]
+    is (pivot row, multipliers of the rows below).
+    """
+    def __init__(self, mat):
+        self.field_type = mat._field
+        n, kl, ku = mat._n, mat._lower, mat._upper
+        rows = []
+        for i, row in enumerate(mat._band):
+            lo = max(0, i - kl)
+            hi = min(n, i + ku + 1)
+            rows.append((lo, [mat.field(v) for v in row[lo-i+kl:hi-i+kl]]))
+
+        def entry(row, j):
+            lo, values = row
+            return values[j-lo] if lo <= j < lo + len(values) else 0
+
+        steps = []
+        sign = 1
+        singular = False
+        for k in range(n):
+            last = min(n, k + kl + 1)
+            p = max(range(k, last), key=lambda r: abs(entry(rows[r], k)))
+            pivot = entry(rows[p], k)
+            if pivot == 0:
+                singular = True
+                break
+            if p != k:
+                rows[p], rows[k] = rows[k], rows[p]
+                sign = -sign
+
+            lo, values = rows[k]
+            end = lo + len(values)
+            mults = []
+            for i in range(k+1, last):
+                a = entry(rows[i], k)
+                f = a / pivot
+                mults.append(f)
+                hi = max(end, rows[i][0] + len(rows[i][1]))
+                if a == 0:
+                    rows[i] = (k+1, [entry(rows[i], j)
+                                     for j in range(k+1, hi)])
+                else:
+                    rows[i] = (k+1, [entry(rows[i], j) -
+                                     f * entry(rows[k], j)
+                                     for j in range(k+1, hi)])
+            steps.append((p, mults))
+
+        self._rows = rows
+        self._steps = steps
+        self._sign = sign
+        self._n = n
+        self.singular = singular
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def size(self):
+        return self._n
+
+    def det(self):
+        """
+        -> field
+
+        Returns determinant of the factorized matrix.
+        """
+        if self.singular:
+            return self._field(0)
+        ret = self._field(self._sign)
+        for k, (lo, values) in enumerate(self._rows):
+            ret *= values[k-lo]
+        return ret
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which A * x == b.
+        """
+        if self.singular:
+            raise ValueError("This matrix is irreversible!")
+        if len(b) != self._n:
+            raise ValueError('Expecting a vector of length %d.' % self._n)
+        y = [self._field(v) for v in b]
+        for k, (p, mults) in enumerate(self._steps):
+            if p != k:
+                y[p], y[k] = y[k], y[p]
+            yk = y[k]
+            if yk != 0:
+                for i, f in enumerate(mults, k+1):
+                    y[i] -= f * yk
+        x = [None] * self._n
+        for k in range(self._n-1, -1, -1):
+            lo, values = self._rows[k]
+            s = y[k]
+            for j in range(k+1, lo + len(values)):
+                s -= values[j-lo] * x[j]
+            x[k] = s / values[k-lo]
+        return x
+
+# iterative solvers-------------------------------------------
+
+# The solvers take a Mat, or anything with matvec(x) -> list (a
+# SparseMat, a BandMat, an operator never stored as a matrix), and
+# stop once norm(b - A * x) <= tol * norm(b). They compute in floats.
+# precond is a Jacobi or an ILU0 of A, or anything with solve(r)
+# approximating A^(-1) * r. callback(k, x, residual) is called after
+# every iteration k with the norm of the residual.
+
+def _operator(a):
+    if not hasattr(a, 'matvec'):
+        raise TypeError('Expecting a Mat or an object with matvec().')
+    return a.matvec
+
+def _dot(x, y):
+    return sum(p * q for p, q in zip(x, y))
+
+def _norm(x):
+    return _dot(x, x) ** 0.5
+
+def _start(a, b, x0, maxiter):
+    """
+    Returns (matvec, b, x, maxiter, bnorm) in floats.
+    """
+    matvec = _operator(a)
+    b = [float(v) for v in b]
+    x = [0.0] * len(b) if x0 == None else [float(v) for v in x0]
+    if len(x) != len(b):
+        raise ValueError('x0 and b should have the same length.')
+    if maxiter == None:
+        maxiter = 10 * len(b)
+    return matvec, b, x, maxiter, _norm(b) or 1.0
+
+def _identity(r):
+    return r
+
+def _gmres_update(x, h, g, basis, msolve):
+    """
+    Returns x + M^(-1) * V * y, where H * y = g over the columns of
+    H built so far and V is the Krylov basis.
+    """
+    m = len(h)
+    y = [0.0] * m
+    for i in range(m-1, -1, -1):
+        y[i] = (g[i] - sum(h[j][i] * y[j] for j in range(i+1, m)))\
+                / h[i][i]
+    u = [sum(y[i] * basis[i][t] for i in range(m)) for t in range(len(x))]
+    return [p + q for p, q in zip(x, msolve(u))]
+
+def _not_converged(name, k, residual):
+    return ValueError('%s did not converge in %d iterations, the '
+                      'residual is %g.' % (name, k, residual))
+
+def _entries(a):
+    """
+    Returns the non-zero entries of a as a list of [(col, value)]
+    rows, without going through a dense matrix for a SparseMat or a
+    BandMat.
+    """
+    if hasattr(a, 'tocsr'):
+        a = a.tocsr()
+        return [list(zip(*a._line(i))) for i in range(a.rows())]
+    if isinstance(a, BandMat):
+        n = a.rows()
+        ret = []
+        for i in range(n):
+            lo, hi = max(0, i - a._lower), min(n, i + a._upper + 1)
+            cols = list(range(lo, hi))
+            if a._cyclic and i in (0, n-1):
+                cols = sorted(set(cols) | {n-1-i})
+            ret.append([(j, a.field(a.get(i, j))) for j in cols
+                        if a.get(i, j) != 0])
+        return ret
+    if isinstance(a, Mat):
+        return [[(j, a.field(x)) for j, x in enumerate(row) if x != 0]
+                for row in a]
+    raise TypeError('Expecting a Mat, a SparseMat or a BandMat.')
+
+class Jacobi(object):
+    """
+    The Jacobi preconditioner: the inverse of the diagonal of A.
+
+    >>> Jacobi(Mat('2 1\\n1 4')).solve([1, 1])
+    [0.5, 0.25]
+    """
+    def __init__(self, a):
+        self._inv = []
+        for i, row in enumerate(_entries(a)):
+            d = dict(row).get(i, 0)
+            if d == 0:
+                raise ValueError('Jacobi needs a diagonal without zeros.')
+            self._inv.append(1 / float(d))
+
+    def solve(self, r):
+        return [p * q for p, q in zip(self._inv, r)]
+
+class ILU0(object):
+    """
+    The incomplete LU factorization with no fill-in: L * U has the
+    entries of A where A has non-zeros, L is unit lower triangular
+    and both keep the sparsity pattern of A.
+
+    >>> f = ILU0(Mat('4 1 0\\n1 4 1\\n0 1 4'))
+    >>> [round(v, 12) for v in f.solve([5, 6, 5])]
+    [1.0, 1.0, 1.0]
+    """
+    def __init__(self, a):
+        lower, upper, diag = [], [], []
+        for i, row in enumerate(_entries(a)):
+            row = {j: float(v) for j, v in row}
+            for k in sorted(j for j in row if j < i):
+                row[k] /= diag[k]
+                f = row[k]
+                for j, u in upper[k]:
+                    if j in row:
+                        row[j] -= f * u
+            if row.get(i, 0) == 0:
+                raise ValueError('ILU0 met a zero pivot in row %d.' % i)
+            diag.append(row[i])
+            lower.append(sorted((j, v) for j, v in row.items() if j < i))
+            upper.append(sorted((j, v) for j, v in row.items() if j > i))
+        # rows of (columns, values), for the substitutions
+        self._lower = [_split(row) for row in lower]
+        self._upper = [_split(row) for row in upper]
+        self._diag = diag
+
+    def solve(self, r):
+        from operator import mul
+        n = len(self._diag)
+        y = [float(v) for v in r]
+        get = y.__getitem__
+        for i, (cols, values) in enumerate(self._lower):
+            if cols:
+                y[i] -= sum(map(mul, values, map(get, cols)))
+        for i in range(n-1, -1, -1):
+            cols, values = self._upper[i]
+            if cols:
+                y[i] -= sum(map(mul, values, map(get, cols)))
+            y[i] /= self._diag[i]
+        return y
+
+def _split(pairs):
+    return [j for j, v in pairs], [v for j, v in pairs]
+
+def cg(a, b, x0=None, tol=1e-10, maxiter=None, precond=None,
+       callback=None):
+    """
+    cg(A, b) -> list
+
+    Conjugate gradients, for a symmetric positive definite A.
+
+    >>> a = tridiag(-1, 4, -1, 5)
+    >>> [round(v, 8) for v in cg(a, [3, 2, 2, 2, 3])]
+    [1.0, 1.0, 1.0, 1.0, 1.0]
+    >>> res = []
+    >>> x = cg(a, [3, 2, 2, 2, 3], precond=Jacobi(a),
+    ...        callback=lambda k, x, r: res.append(r))
+    >>> len(res) <= 5 and res[-1] < 1e-9
+    True
+    """
+    matvec, b, x, maxiter, bnorm = _start(a, b, x0, maxiter)
+    msolve = precond.solve if precond != None else _identity
+    r = [p - q for p, q in zip(b, matvec(x))]
+    z = msolve(r)
+    p = list(z)
+    rz = _dot(r, z)
+    residual = _norm(r)
+    for k in range(1, maxiter+1):
+        if residual <= tol * bnorm:
+            return x
+        q = matvec(p)
+        alpha = rz / _dot(p, q)
+        x = [u + alpha * v for u, v in zip(x, p)]
+        r = [u - alpha * v for u, v in zip(r, q)]
+        residual = _norm(r)
+        if callback != None:
+            callback(k, x, residual)
+        z = msolve(r)
+        rz, rz_old = _dot(r, z), rz
+        p = [u + rz / rz_old * v for u, v in zip(z, p)]
+    if residual <= tol * bnorm:
+        return x
+    raise _not_converged('cg', maxiter, residual)
+
+def bicgstab(a, b, x0=None, tol=1e-10, maxiter=None, precond=None,
+             callback=None):
+    """
+    bicgstab(A, b) -> list
+
+    Stabilized biconjugate gradients, for any non-singular A.
+
+    >>> a = Mat('4 1 0\\n-2 5 1\\n0 -1 3')
+    >>> [round(v, 8) for v in bicgstab(a, [5, 4, 2], precond=ILU0(a))]
+    [1.0, 1.0, 1.0]
+    """
+    matvec, b, x, maxiter, bnorm = _start(a, b, x0, maxiter)
+    msolve = precond.solve if precond != None else _identity
+    r = [p - q for p, q in zip(b, matvec(x))]
+    r0 = list(r)
+    rho = alpha = omega = 1.0
+    v = p = [0.0] * len(b)
+    residual = _norm(r)
+    for k in range(1, maxiter+1):
+        if residual <= tol * bnorm:
+            return x
+        rho, rho_old = _dot(r0, r), rho
+        if rho == 0:
+            raise ValueError('bicgstab broke down, try another x0.')
+        beta = rho / rho_old * alpha / omega
+        p = [u + beta * (w - omega * y) for u, w, y in zip(r, p, v)]
+        ph = msolve(p)
+        v = matvec(ph)
+        alpha = rho / _dot(r0, v)
+        s = [u - alpha * w for u, w in zip(r, v)]
+        if _norm(s) <= tol * bnorm:
+            x = [u + alpha * w for u, w in zip(x, ph)]
+            residual = _norm(s)
+            if callback != None:
+                callback(k, x, residual)
+            return x
+        sh = msolve(s)
+        t = matvec(sh)
+        omega = _dot(t, s) / _dot(t, t)
+        x = [u + alpha * w + omega * y for u, w, y in zip(x, ph, sh)]
+        r = [u - omega * w for u, w in zip(s, t)]
+        residual = _norm(r)
+        if callback != None:
+            callback(k, x, residual)
+        if omega == 0:
+            break
+    if residual <= tol * bnorm:
+        return x
+    raise _not_converged('bicgstab', maxiter, residual)
+
+def gmres(a, b, x0=None, tol=1e-10, maxiter=None, precond=None,
+          callback=None, restart=30):
+    """
+    gmres(A, b) -> list
+
+    Generalized minimal residuals, restarted every restart
+    iterations, for any non-singular A. precond is applied on the
+    right, so the residual checked is the one of A * x == b. The
+    iterate given to callback is formed only for it, at the cost of
+    a small triangular solve and a precond.solve() per iteration.
+
+    >>> a = Mat('1 2 0\\n0 1 2\\n2 0 1')
+    >>> [round(v, 8) for v in gmres(a, [3, 3, 3])]
+    [1.0, 1.0, 1.0]
+    """
+    matvec, b, x, maxiter, bnorm = _start(a, b, x0, maxiter)
+    msolve = precond.solve if precond != None else _identity
+    n = len(b)
+    k = 0
+    while True:
+        r = [p - q for p, q in zip(b, matvec(x))]
+        residual = _norm(r)
+        if residual <= tol * bnorm:
+            return x
+        if k >= maxiter:
+            raise _not_converged('gmres', k, residual)
+        # Arnoldi on the Krylov space of r, the columns of H are
+        # turned upper triangular by the rotations (cs, sn)
+        basis = [[v / residual for v in r]]
+        h, cs, sn = [], [], []
+        g = [residual]
+        for j in range(min(restart, maxiter - k, n)):
+            w = matvec(msolve(basis[j]))
+            col = []
+            for v in basis:
+                c = _dot(w, v)
+                w = [p - c * q for p, q in zip(w, v)]
+                col.append(c)
+            wnorm = _norm(w)
+            for i in range(j):
+                col[i], col[i+1] = cs[i] * col[i] + sn[i] * col[i+1],\
+                        -sn[i] * col[i] + cs[i] * col[i+1]
+            d = (col[j] * col[j] + wnorm * wnorm) ** 0.5
+            if d == 0:
+                raise ValueError("This matrix is irreversible!")
+            cs.append(col[j] / d)
+            sn.append(wnorm / d)
+            col[j] = d
+            g.append(-sn[j] * g[j])
+            g[j] *= cs[j]
+            h.append(col)
+            k += 1
+            if callback != None:
+                callback(k, _gmres_update(x, h, g[:j+1], basis, msolve),
+                         abs(g[j+1]))
+            if abs(g[j+1]) <= tol * bnorm or wnorm == 0:
+                break
+            basis.append([v / wnorm for v in w])
+        x = _gmres_update(x, h, g, basis, msolve)
+
+def gauss_seidel(a, b, x0=None, tol=1e-10, maxiter=None, callback=None,
+                 omega=1.0):
+    """
+    gauss_seidel(A, b) -> list
+
+    Gauss-Seidel sweeps, successive over-relaxation with omega != 1.
+    A has to give its entries (Mat, SparseMat or BandMat); it
+    converges for diagonally dominant or positive definite A.
+
+    >>> a = tridiag(-1, 4, -1, 5)
+    >>> [round(v, 8) for v in gauss_seidel(a, [3, 2, 2, 2, 3])]
+    [1.0, 1.0, 1.0, 1.0, 1.0]
+    """
+    rows = _entries(a)
+    n = len(rows)
+    b = [float(v) for v in b]
+    x = [0.0] * n if x0 == None else [float(v) for v in x0]
+    if maxiter == None:
+        maxiter = 10 * n
+    bnorm = _norm(b) or 1.0
+    diag = []
+    for i, row in enumerate(rows):
+        d = dict(row).get(i, 0)
+        if d == 0:
+            raise ValueError('gauss_seidel needs a diagonal without '
+                             'zeros.')
+        diag.append(float(d))
+        rows[i] = [(j, float(v)) for j, v in row if j != i]
+    residual = None
+    for k in range(1, maxiter+1):
+        for i, row in enumerate(rows):
+            s = (b[i] - sum(v * x[j] for j, v in row)) / diag[i]
+            x[i] += omega * (s - x[i])
+        residual = _norm([b[i] - diag[i] * x[i] -
+                          sum(v * x[j] for j, v in row)
+                          for i, row in enumerate(rows)])
+        if callback != None:
+            callback(k, x, residual)
+        if residual <= tol * bnorm:
+            return x
+    raise _not_converged('gauss_seidel', maxiter, residual)
+
+def diag(*values, rows=None, cols=None, loop=True, fill=0, field=None):
+    """
+    -> Mat
+
+    Returns a diagonal matrix with its main diagonal filled
+    with 'values'. The values loop if loop == True, otherwise
+    fill them with 'fill', which by default is 0.
+    """
+    sz = len(values)
+    if rows == None:
+        rows = sz
+    if cols == None:
+        cols = rows
+
+    if loop:
+        return Mat(lambda i,j: values[i % sz] if i == j else fill, rows,\
+                cols, field=field)
+    else:
+        return Mat(lambda i,j: values[i] if i == j and i<sz else fill,\
+                rows, cols, field=field)
+
+def tridiag(sub, main, sup, n=None, field=None, cyclic=False):
+    """
+    -> BandMat
+
+    Returns a tridiagonal BandMat. Each of sub, main, sup is a list
+    of the entries below, on and above the main diagonal, or a single
+    value repeated on the diagonal. If cyclic, sub[0] and sup[-1] are
+    the corners (0, n-1) and (n-1, 0), so all three lists have n
+    entries.
+    """
+    from collections.abc import Iterable
+    if n == None:
+        n = len(main)
+    sub, main, sup = ([v] * n if not isinstance(v, Iterable) else list(v)
+                      for v in (sub, main, sup))
+    ret = BandMat(n, field=field, cyclic=cyclic)
+    shift = 0 if cyclic else 1
+    for i in range(n):
+        ret.set(i, i, main[i])
+        if i > 0:
+            ret.set(i, i-1, sub[i-shift])
+        if i < n-1:
+            ret.set(i, i+1, sup[i])
+    if cyclic:
+        ret.set(0, n-1, sub[0])
+        ret.set(n-1, 0, sup[-1])
+    return ret
+
+def O(rows, cols=None, fill=0, field=None):
+    """
+    -> Mat
+
+    Returns a matrix filled with 'fill', which by default is 0.
+    """
+    if cols == None:
+        cols = rows
+    return Mat(lambda i,j: 0, rows, cols, field=field)
+
+def E(size, field=None):
+    """
+    -> Mat
+
+    Returns a unit matrix.
+    """
+    return diag(1, rows=size, field=field)
+
+def Kronecker(i, j, field=None):
+    """
+    -> int
+
+    Kronecker delta = 1, if i == j
+                      0, if i != j
+    """
+    if field == None:
+        return 1 if i == j else 0
+    return field(1) if i == j else field(0)
+
+def e(size, i, field=None):
+    """
+    -> list of self._field
+
+    Returns a list, which is the ith column of E.
+    """
+    return [Kronecker(i, j, field=field) for j in range(size)]
+
+def trans(mat):
+    """
+    -> Mat
+
+    Returns the transpose of mat.
+    """
+    return mat.trans()
+
+def augment(*mats):
+    """
+    -> MatView
+
+    Returns the Mats side by side, [A | B | ...], without copying
+    them. They must have the same rows.
+    """
+    if len(set(m.rows() for m in mats)) != 1:
+        raise ValueError('They should have the same rows.')
+    field = mats[0]._field
+    if any(m._field != field for m in mats):
+        field = None
+    return MatView(_AugStorage(mats), field)
+
+def trace(mat):
+    """
+    -> self._field
+
+    Returns trace of mat, mat should be square.
+    """
+    return mat.trace()
+
+def det(mat):
+    """
+    -> self._field
+
+    Returns determinant of mat, mat should be square.
+    """
+    return mat.det()
+
+def inv(mat):
     """
     -> Mat
 
@@ -949,6 +6368,14 @@ def inv(mat):
     """
     return mat.inv()
 
+def lu(mat):
+    """
+    -> LU
+
+    Returns LU factorization of mat, mat should be square.
+    """
+    return mat.lu()
+
 def resize(L, size, fill=0):
     """
     -> None
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Integers modulo a prime, and the tools for multi-modular computing:
+word-sized primes, Chinese remainder and rational reconstruction.
+
+>>> F = GF(7)
+>>> F(3) + 5
+1
+>>> F(3) / 5
+2
+>>> F('1/2') * 2
+1
+>>> -F(1) == 6
+True
+>>> crt([2, 3, 2], [3, 5, 7])
+23
+>>> rational_reconstruction(crt([1, 1], [101, 103]) * 4 % (101*103), 101*103)
+(4, 1)
+>>> rational_reconstruction(pow(3, -1, 10007) * 2 % 10007, 10007)
+(2, 3)
+"""
+
+__author__ = 'Clarence Zhuo'
+
+import rational
+
+class Mod(object):
+    """
+    An integer modulo the prime p. Don't use Mod itself, but the
+    types returned by GF(p), which can be given to Mat as field.
+    """
+    __slots__ = ('v',)
+    p = None
+
+    def __init__(self, v=0):
+        p = self.p
+        if isinstance(v, Mod):
+            if v.p != p:
+                raise ValueError('Cannot convert GF(%d) to GF(%d).'
+                                 % (v.p, p))
+            v = v.v
+        elif isinstance(v, str):
+            try:
+                v = int(v)
+            except ValueError:
+                v = rational.Rat(v)
+        elif isinstance(v, float):
+            v = rational.Rat(v)
+
+        if isinstance(v, rational.Rat):
+            v = v.num * _inverse(v.den % p, p)
+        elif not isinstance(v, int):
+            raise TypeError("Couldn't convert %s to GF(%d)." % (type(v), p))
+        self.v = v % p
+
+    def _value(self, other):
+        """helper function for arithmetic methods"""
+        if isinstance(other, Mod):
+            if other.p != self.p:
+                raise ValueError('Cannot mix GF(%d) with GF(%d).'
+                                 % (self.p, other.p))
+            return other.v
+        if isinstance(other, int):
+            return other
+        if isinstance(other, rational.Rat):
+            return type(self)(other).v
+        return None
+
+    def __str__(self):
+        return str(self.v)
+
+    __repr__ = __str__
+
+    def __int__(self):
+        return self.v
+
+    def __abs__(self):
+        # no order in GF(p), the representative in [0, p) is used
+        # when a pivot has to be picked
+        return self.v
+
+    def __bool__(self):
+        return self.v != 0
+
+    def __hash__(self):
+        return hash(self.v)
+
+    def __eq__(self, other):
+        v = self._value(other)
+        return v != None and (self.v - v) % self.p == 0
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __pos__(self):
+        return self
+
+    def __neg__(self):
+        return type(self)(-self.v)
+
+    def __add__(self, other):
+        v = self._value(other)
+        return NotImplemented if v == None else type(self)(self.v + v)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        v = self._value(other)
+        return NotImplemented if v == None else type(self)(self.v - v)
+
+    def __rsub__(self, other):
+        v = self._value(other)
+        return NotImplemented if v == None else type(self)(v - self.v)
+
+    def __mul__(self, other):
+        v = self._value(other)
+        return NotImplemented if v == None else type(self)(self.v * v)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        v = self._value(other)
+        if v == None:
+            return NotImplemented
+        return type(self)(self.v * _inverse(v % self.p, self.p))
+
+    def __rtruediv__(self, other):
+        v = self._value(other)
+        if v == None:
+            return NotImplemented
+        return type(self)(v * _inverse(self.v, self.p))
+
+    def __pow__(self, other):
+        if other < 0:
+            return type(self)(pow(_inverse(self.v, self.p), -other, self.p))
+        return type(self)(pow(self.v, other, self.p))
+
+_fields = {}
+
+def GF(p):
+    """
+    GF(p) -> type
+
+    Returns the type of integers modulo the prime p, it can be used
+    as the field of a Mat: Mat('1 2\\n3 4', field=GF(7)).
+    """
+    if p not in _fields:
+        _fields[p] = type('GF%d' % p, (Mod,), {'p': p, '__slots__': ()})
+    return _fields[p]
+
+def _inverse(v, p):
+    if v == 0:
+        raise ZeroDivisionError('0 has no inverse modulo %d.' % p)
+    return pow(v, p-2, p)
+
+def is_prime(n):
+    """
+    is_prime(int n) -> bool
+
+    Miller-Rabin test, deterministic for n < 3215031751.
+    """
+    if n < 2:
+        return False
+    for q in (2, 3, 5, 7):
+        if n % q == 0:
+            return n == q
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in (2, 3, 5, 7):
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for i in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+_primes = []
+
+def primes(count):
+    """
+    primes(int count) -> list
+
+    Returns the count largest primes below 2**31.
+    """
+    n = _primes[-1] - 2 if _primes else 2**31 - 1
+    while len(_primes) < count:
+        if is_prime(n):
+            _primes.append(n)
+        n -= 2
+    return _primes[:count]
+
+def primes_above(bound):
+    """
+    primes_above(int bound) -> list
+
+    Returns as few primes as possible whose product is larger
+    than bound.
+    """
+    ret = []
+    prod = 1
+    while prod <= bound:
+        ret = primes(len(ret) + 1)
+        prod *= ret[-1]
+    return ret
+
+def hadamard_bound(rows):
+    """
+    hadamard_bound(list of int rows) -> int
+
+    Returns a bound of abs(det) of every square submatrix of rows:
+    the product of the Euclidean norms of the rows.
+    """
+    from math import isqrt
+    ret = 1
+    for row in rows:
+        ret *= max(isqrt(sum(x * x for x in row)) + 1, 1)
+    return ret
+
+def crt(residues, moduli):
+    """
+    crt(list residues, list moduli) -> int
+
+    Chinese remainder theorem. Returns x with x % m == r for every
+    r, m, and abs(x) <= prod(moduli) / 2.
+    """
+    x, m = 0, 1
+    for r, p in zip(residues, moduli):
+        t = (r - x) * _inverse(m % p, p) % p
+        x += m * t
+        m *= p
+    if x > m // 2:
+        x -= m
+    return x
+
+def rational_reconstruction(a, m):
+    """
+    rational_reconstruction(int a, int m) -> (int, int) or None
+
+    Returns (n, d) with n == a * d modulo m, abs(n) and d both
+    below sqrt(m/2), or None if there is no such fraction.
+    """
+    from math import gcd, isqrt
+    bound = isqrt(m // 2)
+    r0, r1 = m, a % m
+    s0, s1 = 0, 1
+    while r1 > bound:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        s0, s1 = s1, s0 - q * s1
+    if s1 == 0 or abs(s1) > bound or gcd(r1, abs(s1)) != 1:
+        return None
+    if s1 < 0:
+        return -r1, -s1
+    return r1, s1
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
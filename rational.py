@@ -327,11 +327,9 @@ def _check(value, *, key):
                             type(value))
 
     elif key == 'den':
-        msg = 'Denominator must be positive int, %s given' % value
         if not isinstance(value, int) or value <= 0:
-            raise TypeError(msg)
-        elif value <= 0:
-            raise ValueError(msg)
+            raise TypeError('Denominator must be positive int, %s given'
+                            % value)
 
 
     elif key == 'Rat' or key == 'float':
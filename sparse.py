@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Sparse matrices in CSR/CSC layout."""
+
+__author__ = 'Clarence Zhuo'
+
+from bisect import bisect_left
+import heapq
+
+import matrix
+import rational
+
+class SparseMat(object):
+    """
+    A matrix keeping only its non-zero entries, row by row (layout
+    'csr') or column by column (layout 'csc'). _ptr[i]:_ptr[i+1] is
+    the slice of _idx and _val for row (or column) i, _idx is sorted
+    within each slice.
+
+    It reads and writes like a Mat: m[i][j], m.rows(), insert(),
+    pop(), solve()...; Mat(m) and m.to_mat() give the dense matrix.
+
+    Doctest:
+
+    >>> s = SparseMat(matrix.Mat(\'\'\'
+    ... 4 0 0 1
+    ... 0 3 0 0
+    ... 0 0 2 0
+    ... 1 0 0 5\'\'\'))
+    >>> s.nnz()
+    6
+    >>> s[3][0], s[0][2]
+    (1, 0)
+    >>> s
+    4 0 0 1
+    0 3 0 0
+    0 0 2 0
+    1 0 0 5
+    >>> s.tocsc()[0][3]
+    1
+    >>> (s * s.trans())[0]
+    [17, 0, 0, 9]
+    >>> s * matrix.Mat('1\\n1\\n1\\n1')
+    5
+    3
+    2
+    6
+    >>> s.det()
+    114.0
+    >>> s.lu().solve([5, 3, 2, 6])
+    [1.0, 1.0, 1.0, 1.0]
+    >>> s[1][2] = 7
+    >>> s[1]
+    [0, 3, 7, 0]
+    >>> s.nnz()
+    7
+    """
+    def __init__(self, arg=None, rows=0, cols=0, field=None, layout='csr'):
+        if layout not in ('csr', 'csc'):
+            raise ValueError("layout must be 'csr' or 'csc', %s given."
+                             % layout)
+        self._field = field
+        self._layout = layout
+        self._cache = {}
+
+        if isinstance(arg, SparseMat):
+            if self._field == None:
+                self._field = arg._field
+            rows, cols = arg.size()
+            triplets = arg._triplets()
+        elif isinstance(arg, dict):
+            triplets = ((i, j, v) for (i, j), v in arg.items())
+        elif arg != None:
+            if not isinstance(arg, matrix.Mat):
+                arg = matrix.Mat(arg)
+            if self._field == None:
+                self._field = arg._field
+            rows, cols = arg.size()
+            triplets = ((i, j, v) for i, row in enumerate(arg)
+                        for j, v in enumerate(row))
+        else:
+            triplets = ()
+        self._build(rows, cols, triplets)
+
+    def _build(self, rows, cols, triplets):
+        """
+        Fill the arrays from (i, j, value) triplets, zeros are skipped
+        and later duplicates win.
+        """
+        entries = {}
+        for i, j, v in triplets:
+            if not (0 <= i < rows and 0 <= j < cols):
+                raise IndexError('Entry (%d, %d) out of a %dx%d matrix.'
+                                 % (i, j, rows, cols))
+            if v != 0:
+                entries[(i, j) if self._layout == 'csr' else (j, i)] =\
+                        self.field(v)
+            else:
+                entries.pop((i, j) if self._layout == 'csr' else (j, i),
+                            None)
+        self._shape = (rows, cols)
+        major = rows if self._layout == 'csr' else cols
+        self._ptr = [0] * (major + 1)
+        self._idx = []
+        self._val = []
+        for (a, b) in sorted(entries):
+            self._ptr[a+1] += 1
+            self._idx.append(b)
+            self._val.append(entries[(a, b)])
+        for a in range(major):
+            self._ptr[a+1] += self._ptr[a]
+        self._modified()
+
+    def _triplets(self):
+        """
+        Yields (i, j, value) of the non-zero entries.
+        """
+        for a in range(len(self._ptr) - 1):
+            for k in range(self._ptr[a], self._ptr[a+1]):
+                if self._layout == 'csr':
+                    yield a, self._idx[k], self._val[k]
+                else:
+                    yield self._idx[k], a, self._val[k]
+
+    def _line(self, a):
+        """
+        Returns the (indices, values) of row a in CSR, column a in CSC.
+        """
+        lo, hi = self._ptr[a], self._ptr[a+1]
+        return self._idx[lo:hi], self._val[lo:hi]
+
+    def _modified(self):
+        self._cache.clear()
+
+    # specials-------------------------------------------------
+
+    def __str__(self):
+        return str(self.to_mat())
+
+    __repr__ = __str__
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.rows()
+        if not 0 <= index < self.rows():
+            raise IndexError('Row index out of range.')
+        return _SparseRow(self, index)
+
+    def __setitem__(self, index, values):
+        row = self[index]
+        for j, v in enumerate(values):
+            row[j] = v
+
+    def __iter__(self):
+        return (self[i] for i in range(self.rows()))
+
+    def __contains__(self, key):
+        if key == 0:
+            return self.nnz() < self.rows() * self.cols()
+        return key in self._val
+
+    def __eq__(self, other):
+        if isinstance(other, SparseMat):
+            return self.size() == other.size() and\
+                    sorted(self._triplets()) == sorted(other._triplets())
+        return self.to_mat() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __neg__(self):
+        ret = SparseMat(self)
+        ret._val = [-v for v in ret._val]
+        return ret
+
+    def __add__(self, other):
+        if self.size() != other.size():
+            raise ValueError('Matrixes for adding must have same size.')
+        if not isinstance(other, SparseMat):
+            return self.to_mat() + other
+        entries = {}
+        for i, j, v in self._triplets():
+            entries[(i, j)] = v
+        for i, j, v in other._triplets():
+            entries[(i, j)] = entries.get((i, j), 0) + v
+        return SparseMat(entries, *self.size(), field=self._same_field(other))
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __mul__(self, other):
+        if self.cols() != other.rows():
+            raise ValueError('cols of the first Mat must '
+                             'equals to rows of the second '
+                             'Mat when doing mul.')
+        a = self.tocsr()
+        if isinstance(other, SparseMat):
+            # Gustavson: row i of a*b is a sum of rows of b
+            b = other.tocsr()
+            entries = {}
+            for i in range(a.rows()):
+                acc = {}
+                for k, v in zip(*a._line(i)):
+                    for j, w in zip(*b._line(k)):
+                        acc[j] = acc.get(j, 0) + v * w
+                for j, v in acc.items():
+                    entries[(i, j)] = v
+            return SparseMat(entries, self.rows(), other.cols(),
+                             field=self._same_field(other))
+
+        m = other.cols()
+        rows = []
+        for i in range(a.rows()):
+            out = [0] * m
+            for k, v in zip(*a._line(i)):
+                out = [x + v * y for x, y in zip(out, other[k])]
+            rows.append(out)
+        return matrix.Mat(rows, field=self._same_field(other))\
+                if rows else matrix.O(0, m)
+
+    def __rmul__(self, other):
+        # other is dense, row i of other*self is a sum of rows of self
+        if other.cols() != self.rows():
+            raise ValueError('cols of the first Mat must '
+                             'equals to rows of the second '
+                             'Mat when doing mul.')
+        b = self.tocsr()
+        rows = []
+        for dense_row in other:
+            out = [0] * self.cols()
+            for k, v in enumerate(dense_row):
+                if v != 0:
+                    for j, w in zip(*b._line(k)):
+                        out[j] += v * w
+            rows.append(out)
+        return matrix.Mat(rows, field=self._same_field(other))
+
+    # Other Methods--------------------------------------------
+
+    def field(self, x):
+        return self._field(x) if self._field != None else x
+
+    def _same_field(self, other):
+        return self._field if self._field == other._field else None
+
+    def size(self, index=None):
+        """
+        -> (int, int)
+
+        Returns rows and cols of self.
+        """
+        return self._shape if index == None else self._shape[index]
+
+    def rows(self):
+        return self._shape[0]
+
+    def cols(self):
+        return self._shape[1]
+
+    def is_square(self):
+        return self.rows() == self.cols()
+
+    def is_empty(self):
+        return self.rows() == 0 or self.cols() == 0
+
+    def nnz(self):
+        """
+        -> int
+
+        Returns the number of entries kept.
+        """
+        return len(self._val)
+
+    def layout(self):
+        return self._layout
+
+    def copy(self):
+        return SparseMat(self, layout=self._layout)
+
+    def tocsr(self):
+        """
+        -> SparseMat
+
+        Returns self in CSR layout, self itself if it already is.
+        """
+        return self if self._layout == 'csr' else self._flip()
+
+    def tocsc(self):
+        """
+        -> SparseMat
+
+        Returns self in CSC layout, self itself if it already is.
+        """
+        return self if self._layout == 'csc' else self._flip()
+
+    def _flip(self):
+        """
+        Returns a copy of self in the other layout, by a counting sort
+        of the entries on their minor index.
+        """
+        ret = SparseMat(rows=0, cols=0, field=self._field,
+                        layout='csc' if self._layout == 'csr' else 'csr')
+        ret._shape = self._shape
+        ret._ptr, ret._idx, ret._val = _transpose(self._ptr, self._idx,
+                self._val, self.cols() if self._layout == 'csr'
+                else self.rows())
+        return ret
+
+    def trans(self):
+        """
+        -> SparseMat
+
+        Returns the transpose of self. The CSR arrays of self are the
+        CSC arrays of the transpose, so only they are copied.
+        """
+        ret = SparseMat(rows=0, cols=0, field=self._field,
+                        layout='csc' if self._layout == 'csr' else 'csr')
+        ret._shape = (self.cols(), self.rows())
+        ret._ptr, ret._idx, ret._val =\
+                list(self._ptr), list(self._idx), list(self._val)
+        return ret
+
+    def to_rows(self):
+        """
+        -> list
+
+        Returns the dense rows of self.
+        """
+        rows = [[self.field(0)] * self.cols() for i in range(self.rows())]
+        for i, j, v in self._triplets():
+            rows[i][j] = v
+        return rows
+
+    def to_mat(self):
+        """
+        -> Mat
+
+        Returns self as a dense Mat.
+        """
+        if self.is_empty():
+            return matrix.Mat('')
+        return matrix.Mat(self.to_rows(), field=self._field)
+
+    def matvec(self, x):
+        """
+        -> list
+
+        Returns self * x, x is a sequence of self.cols() numbers.
+        """
+        from operator import mul
+        a = self.tocsr()
+        if len(x) != self.cols():
+            raise ValueError('Expecting a vector of length %d.'
+                             % self.cols())
+        # all the products at once, then a sum per row
+        prods = list(map(mul, a._val, map(x.__getitem__, a._idx)))
+        ptr = a._ptr
+        return [sum(prods[ptr[i]:ptr[i+1]]) for i in range(self.rows())]
+
+    def get(self, i, j):
+        """
+        Returns self[i][j].
+        """
+        a, b = (i, j) if self._layout == 'csr' else (j, i)
+        lo, hi = self._ptr[a], self._ptr[a+1]
+        k = bisect_left(self._idx, b, lo, hi)
+        if k < hi and self._idx[k] == b:
+            return self._val[k]
+        return self.field(0)
+
+    def set(self, i, j, value):
+        """
+        self[i][j] = value, zeros are not kept.
+        """
+        if not (0 <= i < self.rows() and 0 <= j < self.cols()):
+            raise IndexError('Entry (%d, %d) out of a %dx%d matrix.'
+                             % (i, j, self.rows(), self.cols()))
+        self._modified()
+        a, b = (i, j) if self._layout == 'csr' else (j, i)
+        lo, hi = self._ptr[a], self._ptr[a+1]
+        k = bisect_left(self._idx, b, lo, hi)
+        if k < hi and self._idx[k] == b:
+            if value != 0:
+                self._val[k] = self.field(value)
+                return
+            del self._idx[k]
+            del self._val[k]
+            step = -1
+        elif value != 0:
+            self._idx.insert(k, b)
+            self._val.insert(k, self.field(value))
+            step = 1
+        else:
+            return
+        for c in range(a+1, len(self._ptr)):
+            self._ptr[c] += step
+
+    def insert(self, iterable, *, row=None, col=None):
+        """
+        -> None
+
+        Insert a copy of the iterable as a row or a column of self,
+        like Mat.insert().
+        """
+        rows, cols = self.size()
+        if row != None and col == None:
+            index, count = row, rows
+        elif col != None and row == None:
+            index, count = col, cols
+        else:
+            raise ValueError("One and only one of 'row' and 'col' is "
+                             "required.")
+        if index < 0:
+            index += count
+        index = min(max(index, 0), count)
+        values = list(iterable)
+        matrix.resize(values, cols if row != None else rows)
+
+        triplets = []
+        for i, j, v in self._triplets():
+            if row != None:
+                triplets.append((i + (i >= index), j, v))
+            else:
+                triplets.append((i, j + (j >= index), v))
+        for k, v in enumerate(values):
+            triplets.append((index, k, v) if row != None else (k, index, v))
+        if row != None:
+            self._build(rows + 1, cols, triplets)
+        else:
+            self._build(rows, cols + 1, triplets)
+
+    def pop(self, *, row=None, col=None):
+        """
+        -> None
+
+        Remove a row/column of self.
+        """
+        rows, cols = self.size()
+        if row != None and col == None:
+            index = row + rows if row < 0 else row
+            triplets = [(i - (i > index), j, v)
+                        for i, j, v in self._triplets() if i != index]
+            self._build(rows - 1, cols, triplets)
+        elif col != None and row == None:
+            index = col + cols if col < 0 else col
+            triplets = [(i, j - (j > index), v)
+                        for i, j, v in self._triplets() if j != index]
+            self._build(rows, cols - 1, triplets)
+        else:
+            raise ValueError("One and only one of 'row' and 'col' is "
+                             "required.")
+
+    def lu(self, threshold=0.1):
+        """
+        -> SparseLU
+
+        Returns the sparse LU factorization of self, kept until self
+        is changed.
+        """
+        if 'lu' not in self._cache:
+            self._cache['lu'] = SparseLU(self, threshold)
+        return self._cache['lu']
+
+    def det(self):
+        """
+        -> self._field
+
+        Returns determinant of self, self should be square.
+        """
+        return self.lu().det()
+
+    def inv(self):
+        """
+        -> Mat
+
+        Returns inverse of self as a dense Mat.
+        """
+        return self.lu().inv()
+
+    def rank(self, *args, **kw):
+        return self.to_mat().rank(*args, **kw)
+
+    def solve(self, *args, **kw):
+        """
+        -> Mat or str
+
+        Same as Mat.solve(). A square system goes through the sparse
+        LU, the others through the dense Mat.
+        """
+        if self.cols() == self.rows() + 1 and not args and not kw:
+            n = self.rows()
+            a = self.tocsc()
+            coef = SparseMat(rows=0, cols=0, field=self._field, layout='csc')
+            coef._shape = (n, n)
+            coef._ptr = a._ptr[:n+1]
+            coef._idx = a._idx[:coef._ptr[-1]]
+            coef._val = a._val[:coef._ptr[-1]]
+            lu = coef.lu()
+            if not lu.singular:
+                b = [self.field(0)] * n
+                for i, v in zip(*a._line(n)):
+                    b[i] = v
+                return matrix.Mat([[x] for x in lu.solve(b)],
+                                  field=self._field, title=('X0',))
+        return self.to_mat().solve(*args, **kw)
+
+# class ends---------------------------------------------------
+
+class _SparseRow(object):
+    """
+    A row of a SparseMat, so that m[i][j] reads and writes it.
+    """
+    __slots__ = ('_mat', '_row')
+
+    def __init__(self, mat, row):
+        self._mat = mat
+        self._row = row
+
+    def __len__(self):
+        return self._mat.cols()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.copy()[index]
+        if index < 0:
+            index += self._mat.cols()
+        return self._mat.get(self._row, index)
+
+    def __setitem__(self, index, value):
+        if index < 0:
+            index += self._mat.cols()
+        self._mat.set(self._row, index, value)
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __eq__(self, other):
+        try:
+            return self.copy() == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        mat = self._mat
+        if mat._layout == 'csr':
+            ret = [mat.field(0)] * mat.cols()
+            for j, v in zip(*mat._line(self._row)):
+                ret[j] = v
+            return ret
+        return [mat.get(self._row, j) for j in range(mat.cols())]
+
+    def __str__(self):
+        return str(self.copy())
+
+    __repr__ = __str__
+
+def _transpose(ptr, idx, val, minor):
+    """
+    Returns the (ptr, idx, val) arrays of the other layout.
+    """
+    new_ptr = [0] * (minor + 1)
+    for j in idx:
+        new_ptr[j+1] += 1
+    for j in range(minor):
+        new_ptr[j+1] += new_ptr[j]
+    nxt = new_ptr[:-1]
+    new_idx = [0] * len(idx)
+    new_val = [None] * len(val)
+    for a in range(len(ptr) - 1):
+        for k in range(ptr[a], ptr[a+1]):
+            j = idx[k]
+            new_idx[nxt[j]] = a
+            new_val[nxt[j]] = val[k]
+            nxt[j] += 1
+    return new_ptr, new_idx, new_val
+
+def _perm_sign(perm):
+    """
+    Returns the sign of a permutation of range(len(perm)).
+    """
+    sign = 1
+    seen = [False] * len(perm)
+    for i in range(len(perm)):
+        if not seen[i]:
+            j = i
+            length = 0
+            while not seen[j]:
+                seen[j] = True
+                j = perm[j]
+                length += 1
+            if length % 2 == 0:
+                sign = -sign
+    return sign
+
+class SparseLU(object):
+    """
+    Sparse LU factorization with Markowitz ordering: at each step the
+    pivot is taken from the column with the fewest entries left, in
+    the row with the fewest entries, which keeps the fill-in small.
+    For floats, a pivot must be at least threshold times the largest
+    entry of its column.
+
+    >>> a = SparseMat(matrix.rMat(\'\'\'
+    ... 2 1 0 0
+    ... 1 2 1 0
+    ... 0 1 2 1
+    ... 0 0 1 2\'\'\'))
+    >>> f = a.lu()
+    >>> f.det()
+    5
+    >>> f.solve([3, 4, 4, 3])
+    [1, 1, 1, 1]
+    """
+    def __init__(self, mat, threshold=0.1):
+        if not mat.is_square():
+            raise ValueError('Expecting a square matrix.')
+        n = mat.rows()
+        self.field_type = mat._field
+        rows = [{} for i in range(n)]
+        cols = [set() for j in range(n)]
+        for i, j, v in mat._triplets():
+            rows[i][j] = v
+            cols[j].add(i)
+        exact = not any(isinstance(v, (float, complex)) for v in mat._val)
+
+        heap = [(len(cols[j]), j) for j in range(n)]
+        heapq.heapify(heap)
+        done = [False] * n
+        steps = []
+        self.singular = False
+        while len(steps) < n:
+            # the active column with the fewest entries
+            while True:
+                count, q = heapq.heappop(heap)
+                if not done[q] and count == len(cols[q]):
+                    break
+            if count == 0:
+                self.singular = True
+                break
+
+            candidates = cols[q]
+            if not exact:
+                big = max(abs(rows[i][q]) for i in candidates)
+                candidates = [i for i in candidates
+                              if abs(rows[i][q]) >= threshold * big]
+            p = min(candidates, key=lambda i: (len(rows[i]), i))
+            pivot_row = rows[p]
+            pivot = pivot_row.pop(q)
+            for j in pivot_row:
+                cols[j].discard(p)
+            cols[q].discard(p)
+
+            mults = []
+            for i in cols[q]:
+                row = rows[i]
+                f = row.pop(q) / pivot
+                mults.append((i, f))
+                for j, v in pivot_row.items():
+                    x = row.get(j, 0) - f * v
+                    if x != 0:
+                        if j not in row:
+                            cols[j].add(i)
+                        row[j] = x
+                    elif j in row:
+                        del row[j]
+                        cols[j].discard(i)
+            cols[q] = set()
+            done[q] = True
+            for j in pivot_row:
+                heapq.heappush(heap, (len(cols[j]), j))
+            steps.append((p, q, pivot, pivot_row, mults))
+
+        self._steps = steps
+        self._n = n
+
+    def _field(self, x):
+        return self.field_type(x) if self.field_type != None else x
+
+    def fill_in(self):
+        """
+        -> int
+
+        Returns the number of entries in L and U together.
+        """
+        return sum(1 + len(urow) + len(mults)
+                   for p, q, pivot, urow, mults in self._steps)
+
+    def det(self):
+        """
+        -> field
+
+        Returns determinant of the factorized matrix.
+        """
+        if self.singular:
+            return self._field(0)
+        ret = self._field(_perm_sign([s[0] for s in self._steps]) *
+                          _perm_sign([s[1] for s in self._steps]))
+        for step in self._steps:
+            ret *= step[2]
+        return ret
+
+    def solve(self, b):
+        """
+        -> list
+
+        Returns x for which A * x == b.
+        """
+        if self.singular:
+            raise ValueError("This matrix is irreversible!")
+        if len(b) != self._n:
+            raise ValueError('Expecting a vector of length %d.' % self._n)
+        y = [self._field(v) for v in b]
+        for p, q, pivot, urow, mults in self._steps:
+            if y[p] != 0:
+                for i, f in mults:
+                    y[i] -= f * y[p]
+        x = [None] * self._n
+        for p, q, pivot, urow, mults in reversed(self._steps):
+            x[q] = (y[p] - sum(v * x[j] for j, v in urow.items())) / pivot
+        return x
+
+    def solve_many(self, B):
+        """
+        -> Mat
+
+        Returns X for which A * X == B.
+        """
+        cols = [self.solve([row[j] for row in B]) for j in range(B.cols())]
+        return matrix.Mat(lambda i,j: cols[j][i], self._n, B.cols(),
+                          field=self.field_type)
+
+    def inv(self):
+        """
+        -> Mat
+
+        Returns inverse of the factorized matrix, as a dense Mat.
+        """
+        return self.solve_many(matrix.E(self._n, field=self.field_type))
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()